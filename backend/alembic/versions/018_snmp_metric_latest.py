@@ -0,0 +1,39 @@
+"""snmp_metric_latest: última leitura por série SNMP
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '018'
+down_revision = '017'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'snmp_metric_latest',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('router_id', sa.Integer(), sa.ForeignKey('routers.id'), nullable=False),
+        sa.Column('metric_type', sa.String(32), nullable=False),
+        sa.Column('interface_name', sa.String(64), nullable=False, server_default=''),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('unit', sa.String(32), nullable=False),
+        sa.Column('collected_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.UniqueConstraint('router_id', 'metric_type', 'interface_name', name='uq_snmp_metric_latest_series'),
+    )
+    # Popula a partir do histórico existente (uma linha por série)
+    op.execute("""
+        INSERT INTO snmp_metric_latest (router_id, metric_type, interface_name, value, unit, collected_at)
+        SELECT DISTINCT ON (router_id, metric_type, COALESCE(interface_name, ''))
+               router_id, metric_type, COALESCE(interface_name, ''), value, unit, collected_at
+        FROM snmp_metrics
+        ORDER BY router_id, metric_type, COALESCE(interface_name, ''), collected_at DESC
+    """)
+
+
+def downgrade():
+    op.drop_table('snmp_metric_latest')
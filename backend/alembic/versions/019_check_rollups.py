@@ -0,0 +1,62 @@
+"""check_rollups (agregado horário) e último resultado em health_checks
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '019'
+down_revision = '018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('health_checks', sa.Column('last_status', sa.String(), nullable=True))
+    op.add_column('health_checks', sa.Column('last_latency_ms', sa.Integer(), nullable=True))
+    op.add_column('health_checks', sa.Column('last_message', sa.String(), nullable=True))
+    op.execute("""
+        UPDATE health_checks hc
+        SET last_status = cr.status, last_latency_ms = cr.latency_ms, last_message = cr.message
+        FROM (
+            SELECT DISTINCT ON (check_id) check_id, status, latency_ms, message
+            FROM check_results
+            ORDER BY check_id, checked_at DESC
+        ) cr
+        WHERE cr.check_id = hc.id
+    """)
+
+    op.create_table(
+        'check_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('check_id', sa.Integer(), sa.ForeignKey('health_checks.id'), nullable=False),
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('ok_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('latency_sum', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('latency_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.UniqueConstraint('check_id', 'bucket_start', name='uq_check_rollups_check_bucket'),
+    )
+    op.create_index('ix_check_rollups_company_bucket', 'check_rollups', ['company_id', 'bucket_start'])
+    op.execute("""
+        INSERT INTO check_rollups (check_id, company_id, bucket_start, ok_count, total_count, latency_sum, latency_count)
+        SELECT cr.check_id, hc.company_id, date_trunc('hour', cr.checked_at),
+               COUNT(*) FILTER (WHERE cr.status = 'OK'),
+               COUNT(*),
+               COALESCE(SUM(cr.latency_ms), 0),
+               COUNT(cr.latency_ms)
+        FROM check_results cr
+        JOIN health_checks hc ON hc.id = cr.check_id
+        GROUP BY cr.check_id, hc.company_id, date_trunc('hour', cr.checked_at)
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_check_rollups_company_bucket', 'check_rollups')
+    op.drop_table('check_rollups')
+    op.drop_column('health_checks', 'last_message')
+    op.drop_column('health_checks', 'last_latency_ms')
+    op.drop_column('health_checks', 'last_status')
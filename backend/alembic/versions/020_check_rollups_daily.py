@@ -0,0 +1,50 @@
+"""check_rollups: período (HOUR/DAY), downtime e histograma de latência
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '020'
+down_revision = '019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('check_rollups', sa.Column('period', sa.String(8), nullable=False, server_default='HOUR'))
+    op.add_column('check_rollups', sa.Column('downtime_sec', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('check_rollups', sa.Column('latency_hist', postgresql.JSONB(), nullable=True))
+    op.drop_constraint('uq_check_rollups_check_bucket', 'check_rollups', type_='unique')
+    op.create_unique_constraint('uq_check_rollups_check_period_bucket', 'check_rollups', ['check_id', 'period', 'bucket_start'])
+    op.drop_index('ix_check_rollups_company_bucket', 'check_rollups')
+    op.create_index('ix_check_rollups_company_period_bucket', 'check_rollups', ['company_id', 'period', 'bucket_start'])
+    # Downtime aproximado dos buckets existentes: cada falha vale um intervalo do check
+    op.execute("""
+        UPDATE check_rollups ru
+        SET downtime_sec = (ru.total_count - ru.ok_count) * hc.interval_sec
+        FROM health_checks hc
+        WHERE hc.id = ru.check_id
+    """)
+    op.execute("""
+        INSERT INTO check_rollups (check_id, company_id, period, bucket_start, ok_count, total_count, downtime_sec, latency_sum, latency_count)
+        SELECT check_id, company_id, 'DAY', date_trunc('day', bucket_start),
+               SUM(ok_count), SUM(total_count), SUM(downtime_sec), SUM(latency_sum), SUM(latency_count)
+        FROM check_rollups
+        WHERE period = 'HOUR'
+        GROUP BY check_id, company_id, date_trunc('day', bucket_start)
+    """)
+
+
+def downgrade():
+    op.execute("DELETE FROM check_rollups WHERE period <> 'HOUR'")
+    op.drop_index('ix_check_rollups_company_period_bucket', 'check_rollups')
+    op.create_index('ix_check_rollups_company_bucket', 'check_rollups', ['company_id', 'bucket_start'])
+    op.drop_constraint('uq_check_rollups_check_period_bucket', 'check_rollups', type_='unique')
+    op.create_unique_constraint('uq_check_rollups_check_bucket', 'check_rollups', ['check_id', 'bucket_start'])
+    op.drop_column('check_rollups', 'latency_hist')
+    op.drop_column('check_rollups', 'downtime_sec')
+    op.drop_column('check_rollups', 'period')
@@ -0,0 +1,21 @@
+"""check_rollups.latency_max
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '021'
+down_revision = '020'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('check_rollups', sa.Column('latency_max', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('check_rollups', 'latency_max')
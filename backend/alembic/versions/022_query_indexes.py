@@ -0,0 +1,46 @@
+"""índices para keyset pagination, dashboard e limpeza diária
+
+Revision ID: 022
+Revises: 021
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '022'
+down_revision = '021'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Histórico de resultados: keyset em (check_id, checked_at, id); substitui o índice sem id
+    op.create_index('ix_check_results_check_checked_id', 'check_results', ['check_id', 'checked_at', 'id'])
+    op.drop_index('ix_check_results_check_checked', 'check_results')
+    # Limpeza diária (cleanup_old_results) filtra só por data
+    op.create_index('ix_check_results_checked_at', 'check_results', ['checked_at'])
+    op.create_index('ix_snmp_metrics_collected_at', 'snmp_metrics', ['collected_at'])
+    # Listagens/dashboard por empresa: só linhas ativas
+    op.create_index('ix_health_checks_company_active', 'health_checks', ['company_id'], postgresql_where=sa.text('active'))
+    op.create_index('ix_servers_company_active_id', 'servers', ['company_id', 'id'], postgresql_where=sa.text('active'))
+    op.create_index('ix_routers_company_active_id', 'routers', ['company_id', 'id'], postgresql_where=sa.text('active'))
+    # Avaliação de alertas por check
+    op.create_index('ix_alert_rules_check_active', 'alert_rules', ['check_id'], postgresql_where=sa.text('active'))
+    # Topologia e sync Docker
+    op.create_index('ix_network_interfaces_server', 'network_interfaces', ['server_id'])
+    op.create_index('ix_network_interfaces_router', 'network_interfaces', ['router_id'])
+    op.create_index('ix_docker_snapshots_server_container', 'docker_snapshots', ['server_id', 'container_id'])
+
+
+def downgrade():
+    op.drop_index('ix_docker_snapshots_server_container', 'docker_snapshots')
+    op.drop_index('ix_network_interfaces_router', 'network_interfaces')
+    op.drop_index('ix_network_interfaces_server', 'network_interfaces')
+    op.drop_index('ix_alert_rules_check_active', 'alert_rules')
+    op.drop_index('ix_routers_company_active_id', 'routers')
+    op.drop_index('ix_servers_company_active_id', 'servers')
+    op.drop_index('ix_health_checks_company_active', 'health_checks')
+    op.drop_index('ix_snmp_metrics_collected_at', 'snmp_metrics')
+    op.drop_index('ix_check_results_checked_at', 'check_results')
+    op.create_index('ix_check_results_check_checked', 'check_results', ['check_id', 'checked_at'])
+    op.drop_index('ix_check_results_check_checked_id', 'check_results')
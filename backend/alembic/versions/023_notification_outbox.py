@@ -0,0 +1,40 @@
+"""notification_outbox: fila persistente de notificações
+
+Revision ID: 023
+Revises: 022
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '023'
+down_revision = '022'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), nullable=False),
+        sa.Column('channel_id', sa.Integer(), sa.ForeignKey('notification_channels.id'), nullable=False),
+        sa.Column('channel_type', sa.String(), nullable=False),
+        sa.Column('check_id', sa.Integer(), sa.ForeignKey('health_checks.id'), nullable=True),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('message', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='PENDING'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_notification_outbox_due', 'notification_outbox', ['next_attempt_at'], postgresql_where=sa.text("status = 'PENDING'"))
+    op.create_index('ix_notification_outbox_company_created', 'notification_outbox', ['company_id', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_notification_outbox_company_created', 'notification_outbox')
+    op.drop_index('ix_notification_outbox_due', 'notification_outbox')
+    op.drop_table('notification_outbox')
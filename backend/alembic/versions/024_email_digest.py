@@ -0,0 +1,21 @@
+"""company_settings.email_digest_sec: janela de digest de alertas por e-mail
+
+Revision ID: 024
+Revises: 023
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '024'
+down_revision = '023'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('company_settings', sa.Column('email_digest_sec', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('company_settings', 'email_digest_sec')
@@ -0,0 +1,37 @@
+"""incidents: agrupamento de falhas por dependência da topologia
+
+Revision ID: 025
+Revises: 024
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision = '025'
+down_revision = '024'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'incidents',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), nullable=False),
+        sa.Column('root_node', sa.String(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='OPEN'),
+        sa.Column('affected_check_ids', JSONB(), nullable=False, server_default='[]'),
+        sa.Column('notified_channel_ids', JSONB(), nullable=False, server_default='[]'),
+        sa.Column('opened_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('resolved_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_incidents_company_opened', 'incidents', ['company_id', 'opened_at'])
+    op.add_column('notification_outbox', sa.Column('incident_id', sa.Integer(), sa.ForeignKey('incidents.id'), nullable=True))
+
+
+def downgrade():
+    op.drop_column('notification_outbox', 'incident_id')
+    op.drop_index('ix_incidents_company_opened', 'incidents')
+    op.drop_table('incidents')
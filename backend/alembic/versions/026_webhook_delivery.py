@@ -0,0 +1,26 @@
+"""webhooks: segredo HMAC, janela de lote e payload estruturado na outbox
+
+Revision ID: 026
+Revises: 025
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision = '026'
+down_revision = '025'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('notification_channels', sa.Column('secret', sa.String(), nullable=True))
+    op.add_column('notification_channels', sa.Column('batch_sec', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('notification_outbox', sa.Column('payload', JSONB(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('notification_outbox', 'payload')
+    op.drop_column('notification_channels', 'batch_sec')
+    op.drop_column('notification_channels', 'secret')
@@ -0,0 +1,25 @@
+"""servers: estado da sincronização Docker (último sucesso e último erro)
+
+Revision ID: 027
+Revises: 026
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '027'
+down_revision = '026'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('servers', sa.Column('docker_last_sync_at', sa.DateTime(), nullable=True))
+    op.add_column('servers', sa.Column('docker_last_error', sa.String(), nullable=True))
+    op.add_column('servers', sa.Column('docker_last_error_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('servers', 'docker_last_error_at')
+    op.drop_column('servers', 'docker_last_error')
+    op.drop_column('servers', 'docker_last_sync_at')
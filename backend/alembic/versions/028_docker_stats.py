@@ -0,0 +1,53 @@
+"""docker_stats (amostras de CPU/memória por container) e docker_stat_rollups
+
+Revision ID: 028
+Revises: 027
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '028'
+down_revision = '027'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'docker_stats',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('server_id', sa.Integer(), sa.ForeignKey('servers.id'), nullable=False),
+        sa.Column('container_id', sa.String(64), nullable=False),
+        sa.Column('cpu_percent', sa.Float(), nullable=True),
+        sa.Column('mem_percent', sa.Float(), nullable=True),
+        sa.Column('mem_usage_mb', sa.Float(), nullable=True),
+        sa.Column('collected_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+    )
+    op.create_index('ix_docker_stats_server_container_at', 'docker_stats', ['server_id', 'container_id', 'collected_at'])
+    op.create_index('ix_docker_stats_collected_at', 'docker_stats', ['collected_at'])
+
+    op.create_table(
+        'docker_stat_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('server_id', sa.Integer(), sa.ForeignKey('servers.id'), nullable=False),
+        sa.Column('container_id', sa.String(64), nullable=False),
+        sa.Column('period', sa.String(), nullable=False, server_default='HOUR'),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cpu_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cpu_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('cpu_max', sa.Float(), nullable=True),
+        sa.Column('mem_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('mem_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('mem_max', sa.Float(), nullable=True),
+        sa.Column('mem_usage_mb_max', sa.Float(), nullable=True),
+        sa.UniqueConstraint('server_id', 'container_id', 'period', 'bucket_start', name='uq_docker_stat_rollups_container_period_bucket'),
+    )
+
+
+def downgrade():
+    op.drop_table('docker_stat_rollups')
+    op.drop_index('ix_docker_stats_collected_at', 'docker_stats')
+    op.drop_index('ix_docker_stats_server_container_at', 'docker_stats')
+    op.drop_table('docker_stats')
@@ -0,0 +1,27 @@
+"""docker_snapshots: (server_id, container_id) único
+
+Revision ID: 029
+Revises: 028
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = '029'
+down_revision = '028'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Duplicatas criadas por syncs concorrentes: fica a linha mais recente
+    op.execute(
+        'DELETE FROM docker_snapshots a USING docker_snapshots b '
+        'WHERE a.server_id = b.server_id AND a.container_id = b.container_id AND a.id < b.id'
+    )
+    op.drop_index('ix_docker_snapshots_server_container', 'docker_snapshots')
+    op.create_unique_constraint('uq_docker_snapshots_server_container', 'docker_snapshots', ['server_id', 'container_id'])
+
+
+def downgrade():
+    op.drop_constraint('uq_docker_snapshots_server_container', 'docker_snapshots', type_='unique')
+    op.create_index('ix_docker_snapshots_server_container', 'docker_snapshots', ['server_id', 'container_id'])
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -5,17 +6,25 @@ from app.database import create_db_and_tables
 from app.seed import run_seed
 from app.scheduler import start_scheduler
 from app.config import settings
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services import camera_hub, docker_events, docker_pool, event_bus, notification_dispatcher
 from app.routers import auth, companies, users, servers, routers_api, license
 from app.routers import network, topology, checks, notifications, company_settings
-from app.routers import docker_api, health, dashboard, ws, backup
+from app.routers import docker_api, health, dashboard, ws, backup, sla, incidents
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     run_seed()
+    event_bus.attach(asyncio.get_running_loop())
     start_scheduler()
+    notification_dispatcher.start()
     yield
+    event_bus.detach()
+    docker_events.stop_all()
+    camera_hub.stop_all()
+    docker_pool.close_all()
 
 
 app = FastAPI(title="ServerWatch API", lifespan=lifespan)
@@ -26,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(health.router, prefix="/api")
@@ -43,4 +53,6 @@ app.include_router(company_settings.router, prefix="/api")
 app.include_router(backup.router, prefix="/api")
 app.include_router(docker_api.router, prefix="/api")
 app.include_router(dashboard.router, prefix="/api")
+app.include_router(sla.router, prefix="/api")
+app.include_router(incidents.router, prefix="/api")
 app.include_router(ws.router, prefix="/api")
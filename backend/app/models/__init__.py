@@ -8,9 +8,13 @@ from app.models.node_position import NodePosition
 from app.models.docker_snapshot import DockerSnapshot
 from app.models.health_check import HealthCheck, CheckResult
 from app.models.company_settings import CompanySettings
-from app.models.notification import NotificationChannel, AlertRule
+from app.models.notification import NotificationChannel, AlertRule, NotificationOutbox
 from app.models.audit_log import AuditLog
 from app.models.snmp_metric import SnmpMetric
 from app.models.snmp_monitor import SnmpMonitor
 from app.models.generic_device import GenericDevice
 from app.models.wifi_network import WifiNetwork
+from app.models.snmp_metric_latest import SnmpMetricLatest
+from app.models.check_rollup import CheckRollup
+from app.models.incident import Incident
+from app.models.docker_stat import DockerStat, DockerStatRollup
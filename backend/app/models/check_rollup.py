@@ -0,0 +1,27 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import BigInteger, Index, JSON, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+from typing import Optional
+
+
+class CheckRollup(SQLModel, table=True):
+    """Agregado (hora ou dia) dos resultados de um check, atualizado a cada resultado gravado."""
+    __tablename__ = "check_rollups"
+    __table_args__ = (
+        UniqueConstraint("check_id", "period", "bucket_start", name="uq_check_rollups_check_period_bucket"),
+        Index("ix_check_rollups_company_period_bucket", "company_id", "period", "bucket_start"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    check_id: int = Field(foreign_key="health_checks.id")
+    company_id: int = Field(foreign_key="companies.id")
+    period: str = Field(default="HOUR")  # HOUR, DAY
+    bucket_start: datetime
+    ok_count: int = Field(default=0)
+    total_count: int = Field(default=0)
+    downtime_sec: int = Field(default=0)
+    latency_sum: int = Field(default=0, sa_type=BigInteger)
+    latency_count: int = Field(default=0)
+    latency_max: Optional[int] = None
+    # Histograma esparso de latência: {índice do bucket: contagem} (ver services/latency_histogram.py)
+    latency_hist: Optional[dict] = Field(default=None, sa_type=JSON().with_variant(JSONB, "postgresql"))
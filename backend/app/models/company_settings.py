@@ -12,6 +12,8 @@ class CompanySettings(SQLModel, table=True):
     smtp_password: Optional[str] = None
     smtp_from: Optional[str] = None
     smtp_tls: bool = Field(default=True)
+    # Janela (s) para juntar alertas por e-mail ao mesmo destinatário num digest; 0 = desligado
+    email_digest_sec: int = Field(default=0)
     zapi_instance_id: Optional[str] = None
     zapi_token: Optional[str] = None
     zapi_client_token: Optional[str] = None
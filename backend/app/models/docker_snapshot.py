@@ -1,10 +1,12 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import UniqueConstraint
 from datetime import datetime
 from typing import Optional
 
 
 class DockerSnapshot(SQLModel, table=True):
     __tablename__ = "docker_snapshots"
+    __table_args__ = (UniqueConstraint("server_id", "container_id", name="uq_docker_snapshots_server_container"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     server_id: int = Field(foreign_key="servers.id")
     container_id: str = Field(max_length=64)
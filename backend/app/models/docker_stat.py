@@ -0,0 +1,41 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, UniqueConstraint
+from datetime import datetime
+from typing import Optional
+
+
+class DockerStat(SQLModel, table=True):
+    """Amostra de CPU/memória de um container (ver services/docker_stats.py)."""
+    __tablename__ = "docker_stats"
+    __table_args__ = (
+        Index("ix_docker_stats_server_container_at", "server_id", "container_id", "collected_at"),
+        Index("ix_docker_stats_collected_at", "collected_at"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    server_id: int = Field(foreign_key="servers.id")
+    container_id: str = Field(max_length=64)
+    cpu_percent: Optional[float] = None
+    mem_percent: Optional[float] = None
+    mem_usage_mb: Optional[float] = None
+    collected_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class DockerStatRollup(SQLModel, table=True):
+    """Agregado (hora ou dia) das amostras de um container, atualizado a cada coleta."""
+    __tablename__ = "docker_stat_rollups"
+    __table_args__ = (
+        UniqueConstraint("server_id", "container_id", "period", "bucket_start", name="uq_docker_stat_rollups_container_period_bucket"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    server_id: int = Field(foreign_key="servers.id")
+    container_id: str = Field(max_length=64)
+    period: str = Field(default="HOUR")  # HOUR, DAY
+    bucket_start: datetime
+    sample_count: int = Field(default=0)
+    cpu_count: int = Field(default=0)
+    cpu_sum: float = Field(default=0)
+    cpu_max: Optional[float] = None
+    mem_count: int = Field(default=0)
+    mem_sum: float = Field(default=0)
+    mem_max: Optional[float] = None
+    mem_usage_mb_max: Optional[float] = None
@@ -1,11 +1,12 @@
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Index
+from sqlalchemy import Index, text
 from datetime import datetime
 from typing import Optional
 
 
 class HealthCheck(SQLModel, table=True):
     __tablename__ = "health_checks"
+    __table_args__ = (Index("ix_health_checks_company_active", "company_id", postgresql_where=text("active")),)
     id: Optional[int] = Field(default=None, primary_key=True)
     company_id: int = Field(foreign_key="companies.id")
     server_id: Optional[int] = Field(default=None, foreign_key="servers.id")
@@ -19,11 +20,18 @@ class HealthCheck(SQLModel, table=True):
     use_ssh: bool = Field(default=False)
     active: bool = Field(default=True)
     last_checked_at: Optional[datetime] = None
+    # Último resultado (desnormalizado para dashboard/listagens)
+    last_status: Optional[str] = None
+    last_latency_ms: Optional[int] = None
+    last_message: Optional[str] = None
 
 
 class CheckResult(SQLModel, table=True):
     __tablename__ = "check_results"
-    __table_args__ = (Index("ix_check_results_check_checked", "check_id", "checked_at"),)
+    __table_args__ = (
+        Index("ix_check_results_check_checked_id", "check_id", "checked_at", "id"),
+        Index("ix_check_results_checked_at", "checked_at"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     check_id: int = Field(foreign_key="health_checks.id")
     status: str
@@ -0,0 +1,23 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+from typing import Optional
+
+
+class Incident(SQLModel, table=True):
+    """Falha agrupada por dependência: um nó pai (roteador) fora do ar e os checks afetados."""
+    __tablename__ = "incidents"
+    __table_args__ = (Index("ix_incidents_company_opened", "company_id", "opened_at"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    company_id: int = Field(foreign_key="companies.id")
+    # Nó da topologia causador (ex.: "R-3")
+    root_node: str
+    title: str
+    # OPEN, RESOLVED
+    status: str = Field(default="OPEN")
+    affected_check_ids: list = Field(default_factory=list, sa_type=JSON().with_variant(JSONB, "postgresql"))
+    # Canais que já receberam a notificação de causa raiz
+    notified_channel_ids: list = Field(default_factory=list, sa_type=JSON().with_variant(JSONB, "postgresql"))
+    opened_at: datetime = Field(default_factory=datetime.utcnow)
+    resolved_at: Optional[datetime] = None
@@ -1,9 +1,14 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
 
 
 class NetworkInterface(SQLModel, table=True):
     __tablename__ = "network_interfaces"
+    __table_args__ = (
+        Index("ix_network_interfaces_server", "server_id"),
+        Index("ix_network_interfaces_router", "router_id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     server_id: Optional[int] = Field(default=None, foreign_key="servers.id")
     router_id: Optional[int] = Field(default=None, foreign_key="routers.id")
@@ -1,4 +1,6 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, JSON, text
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 from typing import Optional
 
@@ -11,11 +13,15 @@ class NotificationChannel(SQLModel, table=True):
     channel_type: str
     target: str
     active: bool = Field(default=True)
+    # WEBHOOK: segredo do HMAC (X-ServerWatch-Signature) e janela para agrupar eventos num POST
+    secret: Optional[str] = None
+    batch_sec: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class AlertRule(SQLModel, table=True):
     __tablename__ = "alert_rules"
+    __table_args__ = (Index("ix_alert_rules_check_active", "check_id", postgresql_where=text("active")),)
     id: Optional[int] = Field(default=None, primary_key=True)
     company_id: int = Field(foreign_key="companies.id")
     check_id: int = Field(foreign_key="health_checks.id")
@@ -24,3 +30,30 @@ class AlertRule(SQLModel, table=True):
     active: bool = Field(default=True)
     last_notified_at: Optional[datetime] = None
     consecutive_failures: int = Field(default=0)
+
+
+class NotificationOutbox(SQLModel, table=True):
+    """Fila persistente de notificações a entregar (ver notification_dispatcher)."""
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_due", "next_attempt_at", postgresql_where=text("status = 'PENDING'")),
+        Index("ix_notification_outbox_company_created", "company_id", "created_at"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    company_id: int = Field(foreign_key="companies.id")
+    channel_id: int = Field(foreign_key="notification_channels.id")
+    channel_type: str
+    check_id: Optional[int] = Field(default=None, foreign_key="health_checks.id")
+    # Preenchido quando o alerta foi absorvido por um incidente (ver incident_service)
+    incident_id: Optional[int] = Field(default=None, foreign_key="incidents.id")
+    subject: str
+    message: str
+    # Evento estruturado (check, resultado, incidente) enviado aos webhooks
+    payload: Optional[dict] = Field(default=None, sa_type=JSON().with_variant(JSONB, "postgresql"))
+    # PENDING, SENDING, SENT, FAILED, SUPPRESSED
+    status: str = Field(default="PENDING")
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
@@ -1,9 +1,11 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, text
 from typing import Optional
 
 
 class Router(SQLModel, table=True):
     __tablename__ = "routers"
+    __table_args__ = (Index("ix_routers_company_active_id", "company_id", "id", postgresql_where=text("active")),)
     id: Optional[int] = Field(default=None, primary_key=True)
     company_id: int = Field(foreign_key="companies.id")
     name: str = Field(max_length=100)
@@ -1,10 +1,12 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, text
 from datetime import datetime
 from typing import Optional
 
 
 class Server(SQLModel, table=True):
     __tablename__ = "servers"
+    __table_args__ = (Index("ix_servers_company_active_id", "company_id", "id", postgresql_where=text("active")),)
     id: Optional[int] = Field(default=None, primary_key=True)
     company_id: int = Field(foreign_key="companies.id")
     name: str = Field(max_length=100)
@@ -23,4 +25,8 @@ class Server(SQLModel, table=True):
     location: Optional[str] = None
     description: Optional[str] = None
     active: bool = Field(default=True)
+    # Estado da sincronização Docker (scheduler e sync manual)
+    docker_last_sync_at: Optional[datetime] = None
+    docker_last_error: Optional[str] = None
+    docker_last_error_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,17 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import UniqueConstraint
+from datetime import datetime
+from typing import Optional
+
+
+class SnmpMetricLatest(SQLModel, table=True):
+    """Última leitura de cada série SNMP (roteador, tipo, interface), atualizada a cada coleta."""
+    __tablename__ = "snmp_metric_latest"
+    __table_args__ = (UniqueConstraint("router_id", "metric_type", "interface_name", name="uq_snmp_metric_latest_series"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    router_id: int = Field(foreign_key="routers.id")
+    metric_type: str
+    interface_name: str = Field(default="")  # "" quando a métrica não é por interface
+    value: float
+    unit: str
+    collected_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import tuple_
 from sqlmodel import Session, select
 from app.deps import get_session, get_company_id, require_role
 from app.models.health_check import HealthCheck, CheckResult
-from app.models.notification import AlertRule
+from app.models.check_rollup import CheckRollup
+from app.models.notification import AlertRule, NotificationOutbox
+from app.services import alert_rule_cache, incident_service
+from app.services.checker import flap_detector
 from app.services.checker.base import execute_check
+from app.services.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter(prefix="/checks", tags=["checks"])
 
@@ -17,8 +23,7 @@ def list_checks(
     checks = session.exec(select(HealthCheck).where(HealthCheck.company_id == company_id)).all()
     result = []
     for c in checks:
-        last = session.exec(select(CheckResult).where(CheckResult.check_id == c.id).order_by(CheckResult.checked_at.desc()).limit(1)).first()
-        d = {"id": c.id, "name": c.name, "check_type": c.check_type, "target": c.target, "interval_sec": c.interval_sec, "timeout_sec": c.timeout_sec, "server_id": c.server_id, "router_id": c.router_id, "use_ssh": getattr(c, "use_ssh", False), "active": c.active, "last_checked_at": c.last_checked_at, "last_status": last.status if last else None, "last_message": last.message if last else None}
+        d = {"id": c.id, "name": c.name, "check_type": c.check_type, "target": c.target, "interval_sec": c.interval_sec, "timeout_sec": c.timeout_sec, "server_id": c.server_id, "router_id": c.router_id, "use_ssh": getattr(c, "use_ssh", False), "active": c.active, "last_checked_at": c.last_checked_at, "last_status": c.last_status, "last_message": c.last_message, "flapping": flap_detector.is_flapping(c.id), "flap_pct": flap_detector.change_pct(c.id)}
         result.append(d)
     return result
 
@@ -71,6 +76,7 @@ def update_check(
             setattr(check, k, data[k])
     session.add(check)
     session.commit()
+    incident_service.invalidate(company_id)
     session.refresh(check)
     return check
 
@@ -87,17 +93,26 @@ def delete_check(
         raise HTTPException(404)
     for r in session.exec(select(CheckResult).where(CheckResult.check_id == check_id)).all():
         session.delete(r)
+    for ru in session.exec(select(CheckRollup).where(CheckRollup.check_id == check_id)).all():
+        session.delete(ru)
     for ar in session.exec(select(AlertRule).where(AlertRule.check_id == check_id)).all():
         session.delete(ar)
+    for ob in session.exec(select(NotificationOutbox).where(NotificationOutbox.check_id == check_id)).all():
+        session.delete(ob)
     session.delete(check)
     session.commit()
+    alert_rule_cache.invalidate(company_id)
+    incident_service.invalidate(company_id)
+    flap_detector.forget(check_id)
     return {"ok": True}
 
 
 @router.get("/{check_id}/results")
 def get_results(
     check_id: int,
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: str | None = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
     company_id: int = Depends(get_company_id),
     user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
     session: Session = Depends(get_session),
@@ -105,9 +120,14 @@ def get_results(
     check = session.get(HealthCheck, check_id)
     if not check or check.company_id != company_id:
         raise HTTPException(404)
-    return session.exec(
-        select(CheckResult).where(CheckResult.check_id == check_id).order_by(CheckResult.checked_at.desc()).limit(limit)
-    ).all()
+    # Keyset em (check_id, checked_at, id): usa ix_check_results_check_checked_id, sem OFFSET
+    q = select(CheckResult).where(CheckResult.check_id == check_id)
+    if cursor:
+        before_at, before_id = decode_cursor(cursor, datetime, int)
+        q = q.where(tuple_(CheckResult.checked_at, CheckResult.id) < tuple_(before_at, before_id))
+    items = session.exec(q.order_by(CheckResult.checked_at.desc(), CheckResult.id.desc()).limit(limit)).all()
+    set_next_cursor(response, items, limit, lambda r: (r.checked_at, r.id))
+    return items
 
 
 @router.post("/{check_id}/run")
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from app.deps import get_session, get_company_id, require_role
 from app.models.company_settings import CompanySettings
+from app.services import alert_rule_cache, smtp_pool
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -33,10 +34,12 @@ def update_settings(
         s = CompanySettings(company_id=company_id)
         session.add(s)
         session.flush()
-    for k in ["smtp_host", "smtp_port", "smtp_user", "smtp_password", "smtp_from", "smtp_tls", "zapi_instance_id", "zapi_token", "zapi_client_token"]:
+    for k in ["smtp_host", "smtp_port", "smtp_user", "smtp_password", "smtp_from", "smtp_tls", "email_digest_sec", "zapi_instance_id", "zapi_token", "zapi_client_token"]:
         if k in data:
             setattr(s, k, data[k])
     session.add(s)
     session.commit()
+    alert_rule_cache.invalidate(company_id)
+    smtp_pool.close_company(company_id)
     session.refresh(s)
     return s
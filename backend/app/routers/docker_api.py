@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
 from app.deps import get_session, get_company_id, require_role
 from app.models.server import Server
 from app.models.docker_snapshot import DockerSnapshot
-from app.services.docker_service import _sync_server, get_docker_client, _close_client
+from app.services.docker_service import SyncInProgress, sync_exclusive
+from app.services.docker_pool import docker_client
+from app.services import docker_stats
 
 router = APIRouter(prefix="/docker", tags=["docker"])
 
@@ -26,6 +29,21 @@ def list_containers(
     return session.exec(select(DockerSnapshot).where(DockerSnapshot.server_id == server_id)).all()
 
 
+@router.get("/servers/{server_id}/stats")
+def container_stats(
+    server_id: int,
+    hours: int = Query(1, ge=1, le=24 * 30),
+    container_id: str | None = None,
+    company_id: int = Depends(get_company_id),
+    user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
+    session: Session = Depends(get_session),
+):
+    """Série de CPU/memória por container: amostras brutas até 6h, médias horárias acima disso."""
+    _get_server(session, server_id, company_id)
+    since = datetime.utcnow() - timedelta(hours=hours)
+    return docker_stats.series(session, server_id, since, container_id, hourly=hours > 6)
+
+
 @router.post("/servers/{server_id}/sync")
 def sync_containers(
     server_id: int,
@@ -35,9 +53,10 @@ def sync_containers(
 ):
     srv = _get_server(session, server_id, company_id)
     try:
-        _sync_server(srv, session)
-        session.commit()
+        sync_exclusive(srv, session)
         return {"ok": True}
+    except SyncInProgress as e:
+        raise HTTPException(409, str(e))
     except Exception as e:
         raise HTTPException(503, str(e) or "Erro ao conectar ao Docker")
 
@@ -51,13 +70,9 @@ def start_container(
     session: Session = Depends(get_session),
 ):
     srv = _get_server(session, server_id, company_id)
-    client = get_docker_client(srv)
-    try:
-        c = client.containers.get(container_id)
-        c.start()
-        return {"ok": True}
-    finally:
-        _close_client(client)
+    with docker_client(srv) as client:
+        client.containers.get(container_id).start()
+    return {"ok": True}
 
 
 @router.post("/servers/{server_id}/containers/{container_id}/stop")
@@ -69,13 +84,9 @@ def stop_container(
     session: Session = Depends(get_session),
 ):
     srv = _get_server(session, server_id, company_id)
-    client = get_docker_client(srv)
-    try:
-        c = client.containers.get(container_id)
-        c.stop()
-        return {"ok": True}
-    finally:
-        _close_client(client)
+    with docker_client(srv) as client:
+        client.containers.get(container_id).stop()
+    return {"ok": True}
 
 
 @router.post("/servers/{server_id}/containers/{container_id}/restart")
@@ -87,13 +98,9 @@ def restart_container(
     session: Session = Depends(get_session),
 ):
     srv = _get_server(session, server_id, company_id)
-    client = get_docker_client(srv)
-    try:
-        c = client.containers.get(container_id)
-        c.restart()
-        return {"ok": True}
-    finally:
-        _close_client(client)
+    with docker_client(srv) as client:
+        client.containers.get(container_id).restart()
+    return {"ok": True}
 
 
 @router.delete("/servers/{server_id}/containers/{container_id}")
@@ -106,13 +113,9 @@ def remove_container(
     session: Session = Depends(get_session),
 ):
     srv = _get_server(session, server_id, company_id)
-    client = get_docker_client(srv)
-    try:
-        c = client.containers.get(container_id)
-        c.remove(force=force)
-        for snap in session.exec(select(DockerSnapshot).where(DockerSnapshot.server_id == server_id, DockerSnapshot.container_id == container_id)).all():
-            session.delete(snap)
-        session.commit()
-        return {"ok": True}
-    finally:
-        _close_client(client)
+    with docker_client(srv) as client:
+        client.containers.get(container_id).remove(force=force)
+    for snap in session.exec(select(DockerSnapshot).where(DockerSnapshot.server_id == server_id, DockerSnapshot.container_id == container_id)).all():
+        session.delete(snap)
+    session.commit()
+    return {"ok": True}
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select
+from app.deps import get_session, get_company_id, require_role
+from app.models.health_check import HealthCheck
+from app.models.incident import Incident
+from app.models.notification import NotificationOutbox
+
+router = APIRouter(prefix="/incidents", tags=["incidents"])
+
+
+@router.get("")
+def list_incidents(
+    status: str | None = Query(None, description="OPEN ou RESOLVED"),
+    limit: int = Query(50, ge=1, le=500),
+    company_id: int = Depends(get_company_id),
+    user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
+    session: Session = Depends(get_session),
+):
+    q = select(Incident).where(Incident.company_id == company_id)
+    if status:
+        q = q.where(Incident.status == status.upper())
+    return session.exec(q.order_by(Incident.opened_at.desc(), Incident.id.desc()).limit(limit)).all()
+
+
+@router.get("/{incident_id}")
+def get_incident(
+    incident_id: int,
+    company_id: int = Depends(get_company_id),
+    user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
+    session: Session = Depends(get_session),
+):
+    incident = session.get(Incident, incident_id)
+    if not incident or incident.company_id != company_id:
+        raise HTTPException(404)
+    checks = session.exec(select(HealthCheck).where(HealthCheck.id.in_(incident.affected_check_ids or []))).all()
+    notifications = session.exec(
+        select(NotificationOutbox).where(NotificationOutbox.incident_id == incident_id).order_by(NotificationOutbox.id)
+    ).all()
+    return {
+        **incident.model_dump(),
+        "affected_checks": [
+            {"id": c.id, "name": c.name, "last_status": c.last_status, "last_message": c.last_message} for c in checks
+        ],
+        "notifications": notifications,
+    }
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
 from app.deps import get_session, get_company_id, require_role
-from app.models.notification import NotificationChannel, AlertRule
+from app.models.notification import NotificationChannel, AlertRule, NotificationOutbox
+from app.services import alert_rule_cache, notification_dispatcher
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+CHANNEL_FIELDS = ["name", "channel_type", "target", "active", "batch_sec"]
+
+
+def _channel_out(ch: NotificationChannel) -> dict:
+    # O segredo do webhook não volta para o cliente
+    return ch.model_dump(exclude={"secret"}) | {"has_secret": bool(ch.secret)}
+
 
 @router.get("/channels")
 def list_channels(
@@ -12,7 +20,7 @@ def list_channels(
     user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
     session: Session = Depends(get_session),
 ):
-    return session.exec(select(NotificationChannel).where(NotificationChannel.company_id == company_id)).all()
+    return [_channel_out(ch) for ch in session.exec(select(NotificationChannel).where(NotificationChannel.company_id == company_id)).all()]
 
 
 @router.post("/channels")
@@ -22,11 +30,12 @@ def create_channel(
     user=Depends(require_role("ADMIN")),
     session: Session = Depends(get_session),
 ):
-    ch = NotificationChannel(company_id=company_id, **{k: data.get(k) for k in ["name", "channel_type", "target", "active"] if data.get(k) is not None})
+    ch = NotificationChannel(company_id=company_id, **{k: data.get(k) for k in CHANNEL_FIELDS + ["secret"] if data.get(k) is not None})
     session.add(ch)
     session.commit()
+    alert_rule_cache.invalidate(company_id)
     session.refresh(ch)
-    return ch
+    return _channel_out(ch)
 
 
 @router.put("/channels/{ch_id}")
@@ -40,13 +49,17 @@ def update_channel(
     ch = session.get(NotificationChannel, ch_id)
     if not ch or ch.company_id != company_id:
         raise HTTPException(404)
-    for k in ["name", "channel_type", "target", "active"]:
+    for k in CHANNEL_FIELDS:
         if k in data:
             setattr(ch, k, data[k])
+    # Segredo vazio/ausente mantém o atual; null remove
+    if "secret" in data and data["secret"] != "":
+        ch.secret = data["secret"]
     session.add(ch)
     session.commit()
+    alert_rule_cache.invalidate(company_id)
     session.refresh(ch)
-    return ch
+    return _channel_out(ch)
 
 
 @router.get("/rules")
@@ -68,6 +81,7 @@ def create_rule(
     r = AlertRule(company_id=company_id, **{k: data.get(k) for k in ["check_id", "channel_id", "fail_threshold", "active"] if data.get(k) is not None})
     session.add(r)
     session.commit()
+    alert_rule_cache.invalidate(company_id)
     session.refresh(r)
     return r
 
@@ -88,6 +102,7 @@ def update_rule(
             setattr(r, k, data[k])
     session.add(r)
     session.commit()
+    alert_rule_cache.invalidate(company_id)
     session.refresh(r)
     return r
 
@@ -104,8 +119,11 @@ def delete_channel(
         raise HTTPException(404)
     for r in session.exec(select(AlertRule).where(AlertRule.channel_id == ch_id)).all():
         session.delete(r)
+    for ob in session.exec(select(NotificationOutbox).where(NotificationOutbox.channel_id == ch_id)).all():
+        session.delete(ob)
     session.delete(ch)
     session.commit()
+    alert_rule_cache.invalidate(company_id)
     return {"ok": True}
 
 
@@ -121,4 +139,44 @@ def delete_rule(
         raise HTTPException(404)
     session.delete(r)
     session.commit()
+    alert_rule_cache.invalidate(company_id)
     return {"ok": True}
+
+
+@router.get("/deliveries")
+def list_deliveries(
+    status: str | None = Query(None, description="PENDING, SENDING, SENT ou FAILED"),
+    channel_id: int | None = None,
+    check_id: int | None = None,
+    limit: int = Query(100, ge=1, le=500),
+    company_id: int = Depends(get_company_id),
+    user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
+    session: Session = Depends(get_session),
+):
+    q = select(NotificationOutbox).where(NotificationOutbox.company_id == company_id)
+    if status:
+        q = q.where(NotificationOutbox.status == status.upper())
+    if channel_id is not None:
+        q = q.where(NotificationOutbox.channel_id == channel_id)
+    if check_id is not None:
+        q = q.where(NotificationOutbox.check_id == check_id)
+    return session.exec(q.order_by(NotificationOutbox.created_at.desc(), NotificationOutbox.id.desc()).limit(limit)).all()
+
+
+@router.post("/deliveries/{delivery_id}/retry")
+def retry_delivery(
+    delivery_id: int,
+    company_id: int = Depends(get_company_id),
+    user=Depends(require_role("ADMIN", "OPERATOR")),
+    session: Session = Depends(get_session),
+):
+    item = session.get(NotificationOutbox, delivery_id)
+    if not item or item.company_id != company_id:
+        raise HTTPException(404)
+    if item.status != notification_dispatcher.FAILED:
+        raise HTTPException(400, "Só entregas com falha podem ser reenviadas")
+    notification_dispatcher.retry(session, item)
+    session.commit()
+    session.refresh(item)
+    notification_dispatcher.wake()
+    return item
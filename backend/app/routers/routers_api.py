@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlmodel import Session, select
 from app.deps import get_session, get_company_id, require_role
 from app.models.router import Router
@@ -6,6 +6,7 @@ from app.models.network_interface import NetworkInterface
 from app.schemas.router import RouterCreate, RouterUpdate, RouterRead
 from app.schemas.server import NetworkInterfaceCreate
 from app.services.audit_service import log
+from app.services.pagination import decode_cursor, set_next_cursor
 from app.services.snmp_service import get_info as snmp_get_info
 
 router = APIRouter(prefix="/routers", tags=["routers"])
@@ -13,13 +14,22 @@ router = APIRouter(prefix="/routers", tags=["routers"])
 
 @router.get("", response_model=list[RouterRead])
 def list_routers(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
     company_id: int = Depends(get_company_id),
     user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
     session: Session = Depends(get_session),
 ):
-    items = session.exec(select(Router).where(Router.company_id == company_id, Router.active == True).offset(skip).limit(limit)).all()
+    q = select(Router).where(Router.company_id == company_id, Router.active == True).order_by(Router.id)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        q = q.where(Router.id > after_id)
+    elif skip:
+        q = q.offset(skip)
+    items = session.exec(q.limit(limit)).all()
+    set_next_cursor(response, items, limit, lambda r: (r.id,))
     return items
 
 
@@ -326,14 +336,11 @@ def snmp_latest(
     r = session.get(Router, id)
     if not r or r.company_id != company_id:
         raise HTTPException(404)
-    from app.models.snmp_metric import SnmpMetric
-    metrics = session.exec(select(SnmpMetric).where(SnmpMetric.router_id == id)).all()
-    latest: dict[str, dict] = {}
-    for m in metrics:
-        key = f"{m.metric_type}:{m.interface_name or ''}"
-        if key not in latest or m.collected_at > latest[key]["collected_at"]:
-            latest[key] = {"metric_type": m.metric_type, "interface_name": m.interface_name, "value": m.value, "unit": m.unit, "collected_at": m.collected_at}
-    return list(latest.values())
+    from app.services import snmp_latest
+    return [
+        {k: m[k] for k in ("metric_type", "interface_name", "value", "unit", "collected_at")}
+        for m in snmp_latest.get_latest(session, [id])
+    ]
 
 
 @router.get("/{id}/snmp-metrics")
@@ -385,7 +392,7 @@ def snmp_collect_now(
         raise HTTPException(400, "Nenhum IP configurado")
     community = (r.snmp_community or "public").strip() or "public"
     for m in monitors:
-        _collect_monitor(m, host, community, r.snmp_port or 161, session)
+        _collect_monitor(m, host, community, r.snmp_port or 161, session, company_id=r.company_id)
     return {"ok": True, "collected": len(monitors)}
 
 
@@ -1,23 +1,34 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from sqlmodel import Session, select
 from app.deps import get_session, get_company_id, require_role
 from app.models.server import Server
 from app.models.network_interface import NetworkInterface
 from app.schemas.server import ServerCreate, ServerUpdate, ServerRead, NetworkInterfaceCreate
 from app.services.audit_service import log
+from app.services import docker_pool
+from app.services.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter(prefix="/servers", tags=["servers"])
 
 
 @router.get("", response_model=list[ServerRead])
 def list_servers(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
     company_id: int = Depends(get_company_id),
     user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
     session: Session = Depends(get_session),
 ):
-    items = session.exec(select(Server).where(Server.company_id == company_id, Server.active == True).offset(skip).limit(limit)).all()
+    q = select(Server).where(Server.company_id == company_id, Server.active == True).order_by(Server.id)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        q = q.where(Server.id > after_id)
+    elif skip:
+        q = q.offset(skip)
+    items = session.exec(q.limit(limit)).all()
+    set_next_cursor(response, items, limit, lambda s: (s.id,))
     return items
 
 
@@ -65,6 +76,7 @@ def update_server(
     log(session, user.id, "UPDATE", company_id, "SERVER", id)
     session.commit()
     session.refresh(s)
+    docker_pool.close_server(id)
     return s
 
 
@@ -81,6 +93,7 @@ def delete_server(
     s.active = False
     log(session, user.id, "DELETE", company_id, "SERVER", id)
     session.commit()
+    docker_pool.close_server(id)
     return {"ok": True}
 
 
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session
+from app.deps import get_session, get_company_id, require_role
+from app.models.health_check import HealthCheck
+from app.models.server import Server
+from app.services import rollup_service
+
+router = APIRouter(prefix="/sla", tags=["sla"])
+
+
+def _naive_utc(dt: datetime | None) -> datetime | None:
+    """Datas com fuso (offset ou Z na query) viram UTC naive, como as colunas do banco."""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _window(days: int, since: datetime | None, until: datetime | None) -> tuple[datetime, datetime]:
+    """Período do SLA: `since`/`until` explícitos ou os últimos `days` dias."""
+    since, until = _naive_utc(since), _naive_utc(until)
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=days)
+    if since >= until:
+        raise HTTPException(400, "Período inválido")
+    return since, until
+
+
+@router.get("/checks/{check_id}")
+def check_sla(
+    check_id: int,
+    days: int = Query(30, ge=1, le=400),
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    company_id: int = Depends(get_company_id),
+    user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
+    session: Session = Depends(get_session),
+):
+    check = session.get(HealthCheck, check_id)
+    if not check or check.company_id != company_id:
+        raise HTTPException(404)
+    since, until = _window(days, since, until)
+    return rollup_service.sla(session, company_id, since, until, check_id=check_id)
+
+
+@router.get("/servers/{server_id}")
+def server_sla(
+    server_id: int,
+    days: int = Query(30, ge=1, le=400),
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    company_id: int = Depends(get_company_id),
+    user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
+    session: Session = Depends(get_session),
+):
+    srv = session.get(Server, server_id)
+    if not srv or srv.company_id != company_id:
+        raise HTTPException(404)
+    since, until = _window(days, since, until)
+    return rollup_service.sla(session, company_id, since, until, server_id=server_id)
+
+
+@router.get("/company")
+def company_sla(
+    days: int = Query(30, ge=1, le=400),
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    company_id: int = Depends(get_company_id),
+    user=Depends(require_role("ADMIN", "OPERATOR", "VIEWER")),
+    session: Session = Depends(get_session),
+):
+    since, until = _window(days, since, until)
+    return rollup_service.sla(session, company_id, since, until)
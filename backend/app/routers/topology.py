@@ -1,5 +1,4 @@
-import subprocess
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 from jose import jwt, JWTError
@@ -8,6 +7,7 @@ from app.models.network_link import NetworkLink
 from app.models.node_position import NodePosition
 from app.models.generic_device import GenericDevice
 from app.models.user import User, UserCompanyRole
+from app.services import camera_hub, dependency_service
 from app.services.topology_service import get_graph
 from app.config import settings
 
@@ -38,6 +38,7 @@ def create_link(
     link = NetworkLink(company_id=company_id, **{k: data.get(k) for k in allowed if data.get(k) is not None})
     session.add(link)
     session.commit()
+    dependency_service.invalidate(company_id)
     session.refresh(link)
     return link
 
@@ -54,6 +55,7 @@ def delete_link(
         raise HTTPException(404)
     session.delete(link)
     session.commit()
+    dependency_service.invalidate(company_id)
     return {"ok": True}
 
 
@@ -172,48 +174,8 @@ def _build_rtsp_url(dev: GenericDevice) -> str:
     return f"rtsp://{auth}{dev.ip_address}:{port}/cam/realmonitor?channel={channel}&subtype={subtype}"
 
 
-def _mjpeg_generator(rtsp_url: str):
-    """Converte RTSP para MJPEG usando ffmpeg."""
-    cmd = [
-        "ffmpeg", "-loglevel", "quiet",
-        "-rtsp_transport", "tcp",
-        "-i", rtsp_url,
-        "-vf", "scale=640:-1",
-        "-f", "image2pipe",
-        "-vcodec", "mjpeg",
-        "-q:v", "5",
-        "-r", "10",
-        "pipe:1",
-    ]
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-    boundary = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
-    buf = b""
-    try:
-        while True:
-            chunk = proc.stdout.read(4096)
-            if not chunk:
-                break
-            buf += chunk
-            start = buf.find(b"\xff\xd8")
-            end = buf.find(b"\xff\xd9")
-            while start != -1 and end != -1 and end > start:
-                frame = buf[start:end + 2]
-                buf = buf[end + 2:]
-                yield boundary + frame + b"\r\n"
-                start = buf.find(b"\xff\xd8")
-                end = buf.find(b"\xff\xd9")
-    finally:
-        proc.kill()
-
-
-@router.get("/devices/{dev_id}/stream")
-def camera_stream(
-    dev_id: int,
-    token: str = Query(...),
-    company_id: int = Query(..., alias="cid"),
-    session: Session = Depends(get_session),
-):
-    """Endpoint de stream MJPEG — autenticação via query param (necessário para tag <img>)."""
+def _camera_for_query_token(session: Session, dev_id: int, token: str, company_id: int) -> GenericDevice:
+    """Valida o token da query string (tags <img> não mandam headers) e devolve a câmera."""
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
         if payload.get("type") != "access":
@@ -237,8 +199,49 @@ def camera_stream(
         raise HTTPException(404)
     if not dev.ip_address:
         raise HTTPException(400, "IP não configurado")
+    return dev
+
+
+@router.get("/devices/{dev_id}/stream")
+def camera_stream(
+    dev_id: int,
+    token: str = Query(...),
+    company_id: int = Query(..., alias="cid"),
+    profile: str = Query(camera_hub.DEFAULT_PROFILE),
+    session: Session = Depends(get_session),
+):
+    """Endpoint de stream MJPEG — autenticação via query param (necessário para tag <img>)."""
+    if profile not in camera_hub.PROFILES:
+        raise HTTPException(400, "Perfil inválido")
+    dev = _camera_for_query_token(session, dev_id, token, company_id)
     rtsp_url = _build_rtsp_url(dev)
+    # Um ffmpeg por câmera e perfil, compartilhado entre os espectadores (ver services/camera_hub.py)
     return StreamingResponse(
-        _mjpeg_generator(rtsp_url),
+        camera_hub.mjpeg_stream((dev.id, rtsp_url), rtsp_url, profile),
         media_type="multipart/x-mixed-replace; boundary=frame",
     )
+
+
+@router.get("/devices/{dev_id}/snapshot")
+def camera_snapshot(
+    dev_id: int,
+    request: Request,
+    token: str = Query(...),
+    company_id: int = Query(..., alias="cid"),
+    session: Session = Depends(get_session),
+):
+    """
+    Miniatura JPEG em cache (renovada em background a cada SNAPSHOT_REFRESH_SEC), com
+    ETag/304. Não espera a câmera: sem imagem ainda, 503 com Retry-After.
+    """
+    dev = _camera_for_query_token(session, dev_id, token, company_id)
+    rtsp_url = _build_rtsp_url(dev)
+    session.close()
+    snap = camera_hub.snapshot((dev.id, rtsp_url), rtsp_url)
+    if snap is None:
+        raise HTTPException(503, "Câmera indisponível", headers={"Retry-After": "3"})
+    jpeg, etag = snap
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={camera_hub.SNAPSHOT_REFRESH_SEC}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
@@ -1,25 +1,42 @@
-import asyncio
-import queue
-import threading
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from sqlmodel import Session, select
 
 from app.database import engine
 from app.models.server import Server
 from app.services.ssh_terminal_service import _verify_ws_token, run_ssh_bridge
-from app.services.ws_manager import connect, disconnect
+from app.services.ws_manager import connect, disconnect, DEFAULT_INTERVAL_MS, MODE_BATCHED, MODE_EVENTS
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
 
 @router.websocket("/events")
 async def websocket_events(ws: WebSocket):
-    await connect(ws)
+    await ws.accept()
+    token = ws.query_params.get("token")
+    try:
+        company_id = int(ws.query_params.get("company_id") or "")
+    except ValueError:
+        company_id = None
+    if not token or company_id is None or not _verify_ws_token(token, company_id):
+        await ws.close(code=1008)
+        return
+    mode = ws.query_params.get("mode") or MODE_EVENTS
+    if mode not in (MODE_EVENTS, MODE_BATCHED):
+        await ws.close(code=1008)
+        return
+    try:
+        interval_ms = int(ws.query_params.get("interval_ms") or DEFAULT_INTERVAL_MS)
+    except ValueError:
+        interval_ms = DEFAULT_INTERVAL_MS
+    interval_ms = min(max(interval_ms, 50), 5000)
+    client = await connect(ws, company_id, mode, interval_ms, ws.query_params.get("resume"))
     try:
         while True:
             await ws.receive_text()
     except WebSocketDisconnect:
-        disconnect(ws)
+        pass
+    finally:
+        disconnect(client)
 
 
 @router.websocket("/ssh/{server_id}")
@@ -53,57 +70,4 @@ async def websocket_ssh(ws: WebSocket, server_id: int):
             await ws.close()
             return
 
-    in_queue = queue.Queue()
-    out_queue = queue.Queue()
-    closed = threading.Event()
-    loop = asyncio.get_event_loop()
-    output_queue = asyncio.Queue()
-
-    def forward_output():
-        while True:
-            try:
-                data = out_queue.get()
-                if data is None:
-                    loop.call_soon_threadsafe(output_queue.put_nowait, None)
-                    return
-                loop.call_soon_threadsafe(output_queue.put_nowait, data)
-            except Exception:
-                return
-
-    bridge_thread = threading.Thread(target=run_ssh_bridge, args=(server, out_queue, in_queue, closed))
-    fwd_thread = threading.Thread(target=forward_output)
-    bridge_thread.start()
-    fwd_thread.start()
-
-    async def send_output():
-        while True:
-            data = await output_queue.get()
-            if data is None:
-                break
-            try:
-                await ws.send_text(data)
-            except Exception:
-                break
-
-    async def receive_input():
-        try:
-            while True:
-                msg = await ws.receive_text()
-                try:
-                    obj = __import__("json").loads(msg)
-                    if obj.get("type") == "input":
-                        in_queue.put(obj.get("data", ""))
-                except (ValueError, TypeError):
-                    in_queue.put(msg)
-        except WebSocketDisconnect:
-            closed.set()
-
-    try:
-        await asyncio.gather(send_output(), receive_input())
-    except WebSocketDisconnect:
-        closed.set()
-    finally:
-        closed.set()
-        in_queue.put(None)
-        bridge_thread.join(timeout=3)
-        fwd_thread.join(timeout=1)
+    await run_ssh_bridge(ws, server)
@@ -6,6 +6,12 @@ def cleanup_old_results():
     from app.database import engine
     from app.models.health_check import CheckResult
     from app.models.snmp_metric import SnmpMetric
+    from app.models.check_rollup import CheckRollup
+    from app.models.notification import NotificationOutbox
+    from app.models.incident import Incident
+    from app.models.docker_stat import DockerStat, DockerStatRollup
+    from app.services import docker_stats
+    from app.services import rollup_service
     from datetime import datetime, timedelta
     with Session(engine) as session:
         # Check results: mantém 30 dias
@@ -14,16 +20,29 @@ def cleanup_old_results():
         # SNMP raw (coletados a cada 30s): mantém 7 dias
         snmp_cutoff = datetime.utcnow() - timedelta(days=7)
         session.exec(delete(SnmpMetric).where(SnmpMetric.collected_at < snmp_cutoff))
+        # Amostras de containers (a cada 60s): mantém 7 dias; agregados como os de SLA
+        session.exec(delete(DockerStat).where(DockerStat.collected_at < datetime.utcnow() - timedelta(days=docker_stats.RAW_RETENTION_DAYS)))
+        for period, retention in ((rollup_service.HOUR, rollup_service.HOURLY_RETENTION), (rollup_service.DAY, rollup_service.DAILY_RETENTION)):
+            session.exec(delete(DockerStatRollup).where(DockerStatRollup.period == period, DockerStatRollup.bucket_start < datetime.utcnow() - retention))
+        # Agregados de SLA: horários 35 dias, diários 400 dias
+        for period, retention in ((rollup_service.HOUR, rollup_service.HOURLY_RETENTION), (rollup_service.DAY, rollup_service.DAILY_RETENTION)):
+            session.exec(delete(CheckRollup).where(CheckRollup.period == period, CheckRollup.bucket_start < datetime.utcnow() - retention))
+        # Outbox de notificações: mantém 30 dias de histórico de entregas
+        session.exec(delete(NotificationOutbox).where(NotificationOutbox.created_at < cutoff, NotificationOutbox.status.in_(["SENT", "FAILED", "SUPPRESSED"])))
+        # Incidentes resolvidos: mantém 90 dias
+        session.exec(delete(Incident).where(Incident.status == "RESOLVED", Incident.resolved_at < datetime.utcnow() - timedelta(days=90)))
         session.commit()
 
 
 def start_scheduler():
     from app.services.checker.base import run_due_checks
     from app.services.docker_service import sync_all_docker
+    from app.services.docker_stats import collect_all_stats
     from app.services.snmp_service import run_snmp_collection
     scheduler = BackgroundScheduler()
     scheduler.add_job(run_due_checks, "interval", seconds=15, id="health_checks")
     scheduler.add_job(sync_all_docker, "interval", seconds=30, id="docker_sync")
+    scheduler.add_job(collect_all_stats, "interval", seconds=60, id="docker_stats")
     scheduler.add_job(run_snmp_collection, "interval", seconds=30, id="snmp_collection")
     scheduler.add_job(cleanup_old_results, "cron", hour=0, id="cleanup")
     scheduler.start()
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional, List
+from datetime import datetime
 
 
 class NetworkInterfaceCreate(BaseModel):
@@ -58,3 +59,6 @@ class ServerRead(ServerCreate):
     id: int
     company_id: int
     active: bool
+    docker_last_sync_at: Optional[datetime] = None
+    docker_last_error: Optional[str] = None
+    docker_last_error_at: Optional[datetime] = None
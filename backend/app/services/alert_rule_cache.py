@@ -0,0 +1,70 @@
+"""
+Cache em memória das regras de alerta, canais e configurações por empresa.
+
+Carregado de uma vez por empresa (3 queries) e indexado por check_id, para que
+`evaluate_alerts` não consulte o banco a cada resultado. O estado da regra
+(`consecutive_failures`, `last_notified_at`) vive no cache e só é gravado quando
+muda. Os routers de notificações, configurações, checks e o restore de backup
+chamam `invalidate` ao alterar esses dados; a próxima leitura recarrega do banco.
+"""
+import threading
+from sqlmodel import Session, select
+from app.models.company_settings import CompanySettings
+from app.models.notification import AlertRule, NotificationChannel
+
+_lock = threading.Lock()
+# company_id -> {"rules": {check_id: [estado]}, "channels": {id: canal}, "settings": CompanySettings | None}
+_cache: dict[int, dict] = {}
+
+
+def _load(session: Session, company_id: int) -> dict:
+    rules: dict[int, list[dict]] = {}
+    for r in session.exec(
+        select(AlertRule).where(AlertRule.company_id == company_id, AlertRule.active == True)
+    ).all():
+        rules.setdefault(r.check_id, []).append({
+            "id": r.id,
+            "channel_id": r.channel_id,
+            "fail_threshold": r.fail_threshold,
+            "consecutive_failures": r.consecutive_failures or 0,
+            "last_notified_at": r.last_notified_at,
+        })
+    channels = {
+        ch.id: NotificationChannel.model_validate(ch)
+        for ch in session.exec(select(NotificationChannel).where(NotificationChannel.company_id == company_id)).all()
+    }
+    settings = session.exec(select(CompanySettings).where(CompanySettings.company_id == company_id)).first()
+    return {
+        "rules": rules,
+        "channels": channels,
+        "settings": CompanySettings.model_validate(settings) if settings else None,
+    }
+
+
+def _entry(session: Session, company_id: int) -> dict:
+    with _lock:
+        entry = _cache.get(company_id)
+    if entry is not None:
+        return entry
+    entry = _load(session, company_id)
+    with _lock:
+        # Se outra thread carregou antes, fica com a dela (mesmo estado das regras)
+        return _cache.setdefault(company_id, entry)
+
+
+def rules_for_check(session: Session, company_id: int, check_id: int) -> list[dict]:
+    """Regras ativas do check. Os dicts são o estado vivo: quem altera grava a mudança no banco."""
+    return _entry(session, company_id)["rules"].get(check_id, [])
+
+
+def get_channel(session: Session, company_id: int, channel_id: int) -> NotificationChannel | None:
+    return _entry(session, company_id)["channels"].get(channel_id)
+
+
+def get_settings(session: Session, company_id: int) -> CompanySettings | None:
+    return _entry(session, company_id)["settings"]
+
+
+def invalidate(company_id: int):
+    with _lock:
+        _cache.pop(company_id, None)
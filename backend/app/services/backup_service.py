@@ -7,8 +7,10 @@ from app.models.network_interface import NetworkInterface
 from app.models.network_link import NetworkLink
 from app.models.node_position import NodePosition
 from app.models.health_check import HealthCheck
-from app.models.notification import NotificationChannel, AlertRule
+from app.models.notification import NotificationChannel, AlertRule, NotificationOutbox
+from app.models.incident import Incident
 from app.models.user import User, UserCompanyRole
+from app.services import alert_rule_cache, incident_service
 
 
 def _dict_exclude(obj, *keys):
@@ -54,7 +56,7 @@ def export_company_backup(session: Session, company_id: int) -> dict:
         "version": 1,
         "company": {"name": company.name, "slug": company.slug},
         "company_settings": _dict_exclude(settings, "id", "company_id") if settings else {},
-        "servers": [_dict_exclude(s, "id", "company_id", "created_at") | {"_id": s.id} for s in servers],
+        "servers": [_dict_exclude(s, "id", "company_id", "created_at", "docker_last_sync_at", "docker_last_error", "docker_last_error_at") | {"_id": s.id} for s in servers],
         "routers": [_dict_exclude(r, "id", "company_id") | {"_id": r.id} for r in routers],
         "network_interfaces": interfaces,
         "network_links": [
@@ -62,7 +64,7 @@ def export_company_backup(session: Session, company_id: int) -> dict:
             for l in links
         ],
         "node_positions": [{"node_type": p.node_type, "node_id": p.node_id, "position_x": p.position_x, "position_y": p.position_y} for p in positions],
-        "health_checks": [_dict_exclude(c, "id", "company_id", "last_checked_at") | {"_id": c.id, "last_checked_at": None} for c in checks],
+        "health_checks": [_dict_exclude(c, "id", "company_id", "last_checked_at", "last_status", "last_latency_ms", "last_message") | {"_id": c.id, "last_checked_at": None} for c in checks],
         "notification_channels": [_dict_exclude(ch, "id", "company_id", "created_at") | {"_id": ch.id} for ch in channels],
         "alert_rules": [_dict_exclude(r, "id", "company_id", "last_notified_at", "consecutive_failures") | {"last_notified_at": None, "consecutive_failures": 0} for r in rules],
         "users": users_with_roles,
@@ -181,20 +183,29 @@ def import_company_backup(session: Session, company_id: int, data: dict, replace
             s = CompanySettings(company_id=company_id)
             session.add(s)
             session.flush()
-        for k in ["smtp_host", "smtp_port", "smtp_user", "smtp_password", "smtp_from", "smtp_tls", "zapi_instance_id", "zapi_token", "zapi_client_token"]:
+        for k in ["smtp_host", "smtp_port", "smtp_user", "smtp_password", "smtp_from", "smtp_tls", "email_digest_sec", "zapi_instance_id", "zapi_token", "zapi_client_token"]:
             if k in settings_data and settings_data[k] is not None:
                 setattr(s, k, settings_data[k])
 
     session.commit()
+    alert_rule_cache.invalidate(company_id)
+    incident_service.invalidate(company_id)
 
 
 def _clear_company_data(session: Session, company_id: int):
     from app.models.health_check import CheckResult
+    from app.models.check_rollup import CheckRollup
     for r in session.exec(select(AlertRule).where(AlertRule.company_id == company_id)).all():
         session.delete(r)
+    for ob in session.exec(select(NotificationOutbox).where(NotificationOutbox.company_id == company_id)).all():
+        session.delete(ob)
+    for inc in session.exec(select(Incident).where(Incident.company_id == company_id)).all():
+        session.delete(inc)
     for c in session.exec(select(HealthCheck).where(HealthCheck.company_id == company_id)).all():
         for cr in session.exec(select(CheckResult).where(CheckResult.check_id == c.id)).all():
             session.delete(cr)
+        for ru in session.exec(select(CheckRollup).where(CheckRollup.check_id == c.id)).all():
+            session.delete(ru)
         session.delete(c)
     for ch in session.exec(select(NotificationChannel).where(NotificationChannel.company_id == company_id)).all():
         session.delete(ch)
@@ -0,0 +1,342 @@
+"""
+Hub de stream por câmera: um ffmpeg (RTSP → MJPEG) por câmera, muitos espectadores.
+
+Cada espectador HTTP antes abria o próprio ffmpeg, ou seja, uma sessão RTSP e uma
+transcodificação por pessoa (e câmeras Intelbras recusam sessões além do limite).
+Aqui a primeira inscrição numa câmera sobe o ffmpeg; uma thread lê os JPEGs e os
+guarda num ring buffer (RING_SIZE quadros). Cada inscrito lê no próprio ritmo: se
+ficar para trás mais que o ring, pula para o quadro mais recente. Quando o último
+sai, o ffmpeg ainda fica IDLE_GRACE_SEC no ar (troca de aba, reabrir o modal) antes
+de ser encerrado. Se o ffmpeg cair com gente assistindo, é reiniciado com backoff.
+
+Os inscritos esperam quadros no event loop (asyncio.Event acordado pela thread
+leitora), então um espectador não ocupa uma thread do threadpool.
+
+O stream tem perfis (PROFILES: resolução, fps e qualidade); cada perfil de uma
+câmera é um hub próprio. Para mosaicos há `snapshot`: um JPEG pequeno por câmera em
+cache por SNAPSHOT_REFRESH_SEC. Quem pede nunca espera a câmera: recebe o que está
+no cache (mesmo vencido) e, se venceu, a renovação vai para o background — quadro
+de um hub já aberto da câmera ou um ffmpeg de um quadro só, em até
+MAX_CONCURRENT_GRABS threads, no máximo uma renovação pendente por câmera.
+"""
+import asyncio
+import hashlib
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from app.services.mjpeg import JpegSplitter
+
+RING_SIZE = 30
+IDLE_GRACE_SEC = 15
+RESTART_DELAY_SEC = 2
+FRAME_WAIT_SEC = 10
+READ_SIZE = 64 * 1024
+BOUNDARY = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+CRLF = b"\r\n"
+
+# Perfis do stream ao vivo: largura (altura proporcional), quadros/s e qualidade mjpeg (2 = melhor)
+PROFILES = {
+    "low": {"width": 320, "fps": 2, "q": 8},
+    "medium": {"width": 640, "fps": 10, "q": 5},
+    "high": {"width": 1280, "fps": 15, "q": 4},
+}
+DEFAULT_PROFILE = "medium"
+
+SNAPSHOT_REFRESH_SEC = 10
+SNAPSHOT_WIDTH = 320
+SNAPSHOT_TIMEOUT_SEC = 10
+MAX_CONCURRENT_GRABS = 4
+MAX_SNAPSHOT_ENTRIES = 256
+
+
+def _ffmpeg_cmd(rtsp_url: str, profile: str = DEFAULT_PROFILE) -> list[str]:
+    p = PROFILES[profile]
+    return [
+        "ffmpeg", "-loglevel", "quiet",
+        "-rtsp_transport", "tcp",
+        "-i", rtsp_url,
+        "-vf", f"scale={p['width']}:-2",
+        "-f", "image2pipe",
+        "-vcodec", "mjpeg",
+        "-q:v", str(p["q"]),
+        "-r", str(p["fps"]),
+        "pipe:1",
+    ]
+
+
+def _snapshot_cmd(rtsp_url: str) -> list[str]:
+    return [
+        "ffmpeg", "-loglevel", "quiet",
+        "-rtsp_transport", "tcp",
+        "-i", rtsp_url,
+        "-frames:v", "1",
+        "-vf", f"scale={SNAPSHOT_WIDTH}:-2",
+        "-f", "image2pipe",
+        "-vcodec", "mjpeg",
+        "-q:v", "6",
+        "pipe:1",
+    ]
+
+
+def _iter_parts(stdout):
+    """Lê a saída do ffmpeg e devolve cada quadro já como parte multipart (montada uma vez)."""
+    splitter = JpegSplitter()
+    while True:
+        chunk = stdout.read1(READ_SIZE)
+        if not chunk:
+            return
+        for frame in splitter.feed(chunk):
+            yield b"".join((BOUNDARY, frame, CRLF))
+
+
+class Subscriber:
+    def __init__(self, hub: "CameraHub", loop: asyncio.AbstractEventLoop):
+        self.hub = hub
+        self.loop = loop
+        self.event = asyncio.Event()
+        self.last_seq = 0
+
+    def next_part(self) -> bytes | None:
+        """Próximo quadro ainda não entregue (ou o mais recente, se ficou para trás)."""
+        with self.hub.lock:
+            ring = self.hub.ring
+            if not ring or ring[-1][0] <= self.last_seq:
+                return None
+            oldest = ring[0][0]
+            if self.last_seq < oldest - 1 or self.last_seq == 0:
+                seq, part = ring[-1]
+            else:
+                seq, part = ring[self.last_seq - oldest + 1]
+            self.last_seq = seq
+            return part
+
+
+class CameraHub:
+    def __init__(self, key: tuple, cmd: list[str]):
+        self.key = key
+        self.cmd = cmd
+        self.lock = threading.Lock()
+        # (seq, parte multipart com o JPEG) dos quadros mais recentes, compartilhada pelos inscritos
+        self.ring: deque[tuple[int, bytes]] = deque(maxlen=RING_SIZE)
+        self.seq = 0
+        self.last_frame_at = 0.0
+        self.subscribers: set[Subscriber] = set()
+        self.idle_since: float | None = None
+        self.stopped = False
+        self.proc: subprocess.Popen | None = None
+        # stop() x início do ffmpeg: sem isso um Popen logo após o stop ficaria órfão
+        self.proc_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"camera-{key[0]}")
+
+    def _run(self):
+        while not self.stopped:
+            try:
+                with self.proc_lock:
+                    if self.stopped:
+                        break
+                    self.proc = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                for part in _iter_parts(self.proc.stdout):
+                    self._push(part)
+                    if self.stopped:
+                        break
+            except Exception:
+                pass
+            finally:
+                self._kill()
+            if not self.stopped:
+                time.sleep(RESTART_DELAY_SEC)
+
+    def _push(self, part: bytes):
+        with self.lock:
+            self.seq += 1
+            self.ring.append((self.seq, part))
+            self.last_frame_at = time.monotonic()
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.event.set)
+            except RuntimeError:
+                pass
+
+    def _kill(self):
+        proc = self.proc
+        if proc and proc.poll() is None:
+            try:
+                proc.kill()
+                proc.wait(timeout=5)
+            except Exception:
+                pass
+
+    def latest(self) -> bytes | None:
+        """JPEG do quadro mais recente."""
+        with self.lock:
+            part = self.ring[-1][1] if self.ring else None
+        return part[len(BOUNDARY):-len(CRLF)] if part else None
+
+    def stop(self):
+        with self.proc_lock:
+            self.stopped = True
+        self._kill()
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.event.set)
+            except RuntimeError:
+                pass
+
+
+_lock = threading.Lock()
+# chave (device_id, url, perfil) -> hub
+_hubs: dict[tuple, CameraHub] = {}
+# (device_id, url) -> {"jpeg", "etag", "checked", "refreshing"}
+_snapshots: dict[tuple, dict] = {}
+_grabber: ThreadPoolExecutor | None = None
+
+
+def subscribe(key: tuple, cmd: list[str]) -> Subscriber:
+    """Inscreve no hub da câmera (sobe o ffmpeg se for o primeiro). Chamar no event loop."""
+    with _lock:
+        hub = _hubs.get(key)
+        if hub is None or hub.stopped:
+            hub = _hubs[key] = CameraHub(key, cmd)
+            hub.thread.start()
+        sub = Subscriber(hub, asyncio.get_running_loop())
+        with hub.lock:
+            hub.subscribers.add(sub)
+            hub.idle_since = None
+    return sub
+
+
+def unsubscribe(sub: Subscriber):
+    hub = sub.hub
+    with hub.lock:
+        hub.subscribers.discard(sub)
+        if hub.subscribers:
+            return
+        hub.idle_since = time.monotonic()
+    timer = threading.Timer(IDLE_GRACE_SEC, _stop_if_idle, args=(hub,))
+    timer.daemon = True
+    timer.start()
+
+
+def _stop_if_idle(hub: CameraHub):
+    with _lock:
+        with hub.lock:
+            if hub.subscribers or hub.idle_since is None or time.monotonic() - hub.idle_since < IDLE_GRACE_SEC:
+                return
+        if _hubs.get(hub.key) is hub:
+            del _hubs[hub.key]
+    hub.stop()
+
+
+def stop_all():
+    global _grabber
+    with _lock:
+        hubs = list(_hubs.values())
+        _hubs.clear()
+        grabber, _grabber = _grabber, None
+    for hub in hubs:
+        hub.stop()
+    if grabber is not None:
+        grabber.shutdown(wait=False, cancel_futures=True)
+
+
+async def mjpeg_stream(camera: tuple, rtsp_url: str, profile: str = DEFAULT_PROFILE):
+    """Corpo multipart/x-mixed-replace para um espectador. `camera` = (device_id, url)."""
+    sub = subscribe((*camera, profile), _ffmpeg_cmd(rtsp_url, profile))
+    try:
+        while True:
+            part = sub.next_part()
+            if part is None:
+                if sub.hub.stopped:
+                    return
+                sub.event.clear()
+                part = sub.next_part()
+            if part is None:
+                try:
+                    await asyncio.wait_for(sub.event.wait(), timeout=FRAME_WAIT_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            yield part
+    finally:
+        unsubscribe(sub)
+
+
+def _live_frame(camera: tuple) -> bytes | None:
+    """Quadro recente de um stream já aberto da câmera (qualquer perfil), sem abrir outra sessão RTSP."""
+    with _lock:
+        hubs = [h for k, h in _hubs.items() if k[:2] == camera and not h.stopped]
+    for hub in hubs:
+        if time.monotonic() - hub.last_frame_at < SNAPSHOT_REFRESH_SEC:
+            return hub.latest()
+    return None
+
+
+def _get_grabber() -> ThreadPoolExecutor:
+    global _grabber
+    with _lock:
+        if _grabber is None:
+            _grabber = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_GRABS, thread_name_prefix="camera-snapshot")
+        return _grabber
+
+
+def _grab(rtsp_url: str) -> bytes | None:
+    try:
+        out = subprocess.run(
+            _snapshot_cmd(rtsp_url), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL, timeout=SNAPSHOT_TIMEOUT_SEC,
+        ).stdout
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    return out if out.startswith(b"\xff\xd8") else None
+
+
+def _store(entry: dict, jpeg: bytes | None):
+    with _lock:
+        if jpeg:
+            entry["jpeg"] = jpeg
+            entry["etag"] = '"' + hashlib.sha1(jpeg).hexdigest()[:16] + '"'
+        # Falha também conta: câmera fora do ar não é consultada a cada pedido
+        entry["checked"] = time.monotonic()
+        entry["refreshing"] = False
+
+
+def _refresh(entry: dict, rtsp_url: str):
+    jpeg = None
+    try:
+        jpeg = _grab(rtsp_url)
+    finally:
+        _store(entry, jpeg)
+
+
+def snapshot(camera: tuple, rtsp_url: str) -> tuple[bytes, str] | None:
+    """
+    (JPEG, ETag) em cache da câmera, sem esperar pela câmera. Se o cache venceu,
+    agenda a renovação e devolve o último JPEG bom (None se ainda não há nenhum).
+    """
+    now = time.monotonic()
+    with _lock:
+        if len(_snapshots) > MAX_SNAPSHOT_ENTRIES:
+            for key in [k for k, e in _snapshots.items() if e["checked"] and now - e["checked"] > 600]:
+                del _snapshots[key]
+        entry = _snapshots.setdefault(camera, {"jpeg": None, "etag": None, "checked": None, "refreshing": False})
+        refresh = not entry["refreshing"] and (entry["checked"] is None or now - entry["checked"] >= SNAPSHOT_REFRESH_SEC)
+        if refresh:
+            entry["refreshing"] = True
+    if refresh:
+        live = _live_frame(camera)
+        if live:
+            _store(entry, live)
+        else:
+            try:
+                _get_grabber().submit(_refresh, entry, rtsp_url)
+            except RuntimeError:
+                _store(entry, None)
+    with _lock:
+        if entry["jpeg"] is None:
+            return None
+        return entry["jpeg"], entry["etag"]
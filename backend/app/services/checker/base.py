@@ -4,13 +4,33 @@ from app.models.health_check import HealthCheck, CheckResult
 from datetime import datetime, timedelta
 
 
+# Checks atrás de um nó pai (roteador) fora do ar viram sonda de baixa frequência
+PROBE_INTERVAL_SEC = 300
+# Checks segurados na última rodada; rodam assim que o pai volta
+_held_back: set[int] = set()
+
+
 def run_due_checks():
+    from app.services import dependency_service, incident_service
     with Session(engine) as session:
         checks = session.exec(select(HealthCheck).where(HealthCheck.active == True)).all()
+        down_by_company: dict[int, set[str]] = {}
         for check in checks:
+            if check.company_id not in down_by_company:
+                down_by_company[check.company_id] = incident_service.down_nodes(session, check.company_id)
+            interval = check.interval_sec
+            parents = dependency_service.parents_of(session, check.company_id, dependency_service.node_id_for(check))
+            if parents & down_by_company[check.company_id]:
+                interval = max(interval, PROBE_INTERVAL_SEC)
+                _held_back.add(check.id)
+            elif check.id in _held_back:
+                # Pai voltou: roda já, sem esperar o próximo intervalo
+                _held_back.discard(check.id)
+                execute_check(check, session)
+                continue
             due = (
                 check.last_checked_at is None or
-                datetime.utcnow() >= check.last_checked_at + timedelta(seconds=check.interval_sec)
+                datetime.utcnow() >= check.last_checked_at + timedelta(seconds=interval)
             )
             if due:
                 execute_check(check, session)
@@ -42,10 +62,7 @@ def execute_check(check: HealthCheck, session: Session):
         result = fn(check) if fn else None
     if not result:
         return
-    check.last_checked_at = datetime.utcnow()
-    session.add(result)
-    session.add(check)
-    session.commit()
+    save_result(check, result, session)
     try:
         from app.services.notification_service import evaluate_alerts
         evaluate_alerts(check, result, session)
@@ -56,3 +73,21 @@ def execute_check(check: HealthCheck, session: Session):
         broadcast_check_update(check, result)
     except Exception:
         pass
+
+
+def save_result(check: HealthCheck, result: CheckResult, session: Session):
+    """Grava o resultado, atualiza o último estado do check e os agregados (hora/dia)."""
+    from app.services import rollup_service, dashboard_cache
+    from app.services.checker import flap_detector
+
+    flap_detector.record(check.id, result.status == "OK")
+    previous_checked_at = check.last_checked_at
+    check.last_checked_at = datetime.utcnow()
+    check.last_status = result.status
+    check.last_latency_ms = result.latency_ms
+    check.last_message = result.message
+    session.add(result)
+    session.add(check)
+    rollup_service.record(session, check, result, previous_checked_at)
+    session.commit()
+    dashboard_cache.invalidate(check.company_id)
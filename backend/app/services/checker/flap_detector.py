@@ -0,0 +1,77 @@
+"""
+Detecção de flapping (check alternando OK/falha) com histerese.
+
+Para cada check guarda os últimos WINDOW estados (OK ou não) e calcula o percentual
+de trocas de estado na janela, com peso maior para as trocas mais recentes (como o
+Nagios). Entra em flapping acima de ENTER_PCT e só sai abaixo de EXIT_PCT, para não
+oscilar na fronteira. Enquanto está em flapping os alertas do check ficam congelados
+(ver notification_service.evaluate_alerts).
+
+Estado em memória, alimentado por `checker.base.save_result`; num restart começa vazio.
+"""
+import threading
+from collections import deque
+
+WINDOW = 21
+MIN_SAMPLES = 6
+ENTER_PCT = 50.0
+EXIT_PCT = 25.0
+
+_lock = threading.Lock()
+# check_id -> {"history": deque[bool], "flapping": bool, "pct": float}
+_state: dict[int, dict] = {}
+
+
+def _change_pct(history: deque) -> float:
+    """Percentual ponderado de trocas: peso 0.8 na mais antiga até 1.2 na mais recente."""
+    n = len(history)
+    if n < 2:
+        return 0.0
+    total = 0.0
+    changed = 0.0
+    for i in range(1, n):
+        weight = 0.8 + 0.4 * (i - 1) / max(n - 2, 1)
+        total += weight
+        if history[i] != history[i - 1]:
+            changed += weight
+    return round(changed / total * 100, 1)
+
+
+def record(check_id: int, ok: bool):
+    """Registra um resultado e recalcula o estado de flapping."""
+    with _lock:
+        st = _state.get(check_id)
+        if st is None:
+            st = _state[check_id] = {"history": deque(maxlen=WINDOW), "flapping": False, "pct": 0.0}
+        st["history"].append(ok)
+        if len(st["history"]) < MIN_SAMPLES:
+            return
+        pct = _change_pct(st["history"])
+        st["pct"] = pct
+        if not st["flapping"] and pct >= ENTER_PCT:
+            st["flapping"] = True
+        elif st["flapping"] and pct <= EXIT_PCT:
+            st["flapping"] = False
+
+
+def is_flapping(check_id: int) -> bool:
+    with _lock:
+        st = _state.get(check_id)
+        return bool(st and st["flapping"])
+
+
+def change_pct(check_id: int) -> float | None:
+    """Percentual ponderado de trocas na janela (None se o check ainda não tem resultados)."""
+    with _lock:
+        st = _state.get(check_id)
+        return st["pct"] if st else None
+
+
+def flapping_ids() -> set[int]:
+    with _lock:
+        return {cid for cid, st in _state.items() if st["flapping"]}
+
+
+def forget(check_id: int):
+    with _lock:
+        _state.pop(check_id, None)
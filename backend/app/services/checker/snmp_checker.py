@@ -25,9 +25,9 @@ def check(hc: HealthCheck) -> CheckResult | None:
 
 
 def _check(hc: HealthCheck) -> CheckResult | None:
-    from sqlmodel import Session, select
+    from sqlmodel import Session
     from app.database import engine
-    from app.models.snmp_metric import SnmpMetric
+    from app.services import snmp_latest
 
     target = (hc.target or "").strip()
     parts = target.split(":")
@@ -43,22 +43,20 @@ def _check(hc: HealthCheck) -> CheckResult | None:
 
     with Session(engine) as session:
         cutoff = datetime.utcnow() - timedelta(minutes=10)
-        last = session.exec(
-            select(SnmpMetric).where(
-                SnmpMetric.router_id == router_id,
-                SnmpMetric.metric_type == metric_type,
-                SnmpMetric.collected_at >= cutoff,
-            ).order_by(SnmpMetric.collected_at.desc()).limit(1)
-        ).first()
+        readings = [
+            m for m in snmp_latest.get_latest(session, [router_id], [metric_type])
+            if m["collected_at"] >= cutoff
+        ]
+    last = max(readings, key=lambda m: m["collected_at"]) if readings else None
 
     if not last:
         return CheckResult(check_id=hc.id, status="UNKNOWN", latency_ms=None,
                            message=f"Sem dados SNMP recentes para roteador {router_id} / {metric_type}",
                            checked_at=datetime.utcnow())
 
-    value = last.value
+    value = last["value"]
     status = "OK"
-    msg = f"{metric_type} = {value} {last.unit}"
+    msg = f"{metric_type} = {value} {last['unit']}"
 
     if threshold_op and threshold_val is not None:
         breached = (
@@ -70,7 +68,7 @@ def _check(hc: HealthCheck) -> CheckResult | None:
         )
         if breached:
             status = "FAIL"
-            msg = f"ALERTA: {metric_type} = {value} {last.unit} ({threshold_op} {threshold_val})"
+            msg = f"ALERTA: {metric_type} = {value} {last['unit']} ({threshold_op} {threshold_val})"
 
     return CheckResult(
         check_id=hc.id,
@@ -0,0 +1,30 @@
+"""Cache curto (por empresa) da resposta do dashboard, invalidado a cada novo resultado."""
+import threading
+import time
+
+TTL_SEC = 5
+
+_lock = threading.Lock()
+_cache: dict[int, tuple[float, dict]] = {}  # company_id -> (expira_em, resposta)
+
+
+def get(company_id: int) -> dict | None:
+    with _lock:
+        item = _cache.get(company_id)
+        if not item:
+            return None
+        expires_at, payload = item
+        if time.monotonic() >= expires_at:
+            _cache.pop(company_id, None)
+            return None
+        return payload
+
+
+def put(company_id: int, payload: dict):
+    with _lock:
+        _cache[company_id] = (time.monotonic() + TTL_SEC, payload)
+
+
+def invalidate(company_id: int):
+    with _lock:
+        _cache.pop(company_id, None)
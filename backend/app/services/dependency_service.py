@@ -0,0 +1,75 @@
+"""
+Dependências entre nós da topologia (roteador → servidores/dispositivos).
+
+Derivado de `topology_service.get_graph`: numa aresta entre um roteador (R-*) e um
+servidor ou dispositivo genérico (S-*, G-*), o roteador é o pai. Arestas roteador ↔
+roteador e os nós virtuais INTERNET/VPN não criam dependência (não dá para saber a
+direção). O grafo é caro de montar, então fica em cache por empresa com TTL curto;
+os endpoints de topologia chamam `invalidate`.
+"""
+import threading
+import time
+from sqlmodel import Session
+from app.models.health_check import HealthCheck
+
+TTL_SEC = 60
+
+_lock = threading.Lock()
+# company_id -> (expira_em, {"parents": {nó: {pais}}, "children": {nó: {filhos}}, "labels": {nó: nome}})
+_cache: dict[int, tuple[float, dict]] = {}
+
+
+def node_id_for(check: HealthCheck) -> str | None:
+    if check.server_id:
+        return f"S-{check.server_id}"
+    if check.router_id:
+        return f"R-{check.router_id}"
+    return None
+
+
+def _build(session: Session, company_id: int) -> dict:
+    from app.services.topology_service import get_graph
+    graph = get_graph(session, company_id)
+    parents: dict[str, set[str]] = {}
+    children: dict[str, set[str]] = {}
+    for edge in graph["edges"]:
+        a, b = edge["source"], edge["target"]
+        for parent, child in ((a, b), (b, a)):
+            if parent.startswith("R-") and child[:2] in ("S-", "G-"):
+                parents.setdefault(child, set()).add(parent)
+                children.setdefault(parent, set()).add(child)
+    labels = {n["id"]: n["data"].get("label") for n in graph["nodes"]}
+    return {"parents": parents, "children": children, "labels": labels}
+
+
+def get(session: Session, company_id: int) -> dict:
+    now = time.monotonic()
+    with _lock:
+        item = _cache.get(company_id)
+    if item and now < item[0]:
+        return item[1]
+    deps = _build(session, company_id)
+    with _lock:
+        _cache[company_id] = (now + TTL_SEC, deps)
+    return deps
+
+
+def parents_of(session: Session, company_id: int, node_id: str | None) -> set[str]:
+    if not node_id:
+        return set()
+    return get(session, company_id)["parents"].get(node_id, set())
+
+
+def children_of(session: Session, company_id: int, node_id: str | None) -> set[str]:
+    if not node_id:
+        return set()
+    return get(session, company_id)["children"].get(node_id, set())
+
+
+def label(session: Session, company_id: int, node_id: str) -> str:
+    return get(session, company_id)["labels"].get(node_id) or node_id
+
+
+def invalidate(company_id: int):
+    with _lock:
+        _cache.pop(company_id, None)
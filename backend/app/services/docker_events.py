@@ -0,0 +1,200 @@
+"""
+Estado Docker dirigido por eventos (`docker events`).
+
+Cada host Docker ativo tem uma thread assinando `client.events()` (só eventos de
+container). Ao conectar, faz uma sincronização completa e depois aplica cada evento
+(create, start, die, pause, unpause, rename, destroy) direto no DockerSnapshot e
+avisa o frontend pelo WebSocket. Se o stream cair, reconecta com backoff e sincroniza
+de novo.
+
+Com o stream vivo, o `sync_all_docker` do scheduler só faz a listagem completa a cada
+RECONCILE_SEC (rede de segurança); hosts sem stream continuam no poll de 30s.
+
+`apply_event` / `consume` recebem qualquer iterável de dicts no formato da API de
+eventos, então dá para alimentar com um stream falso.
+"""
+import threading
+from datetime import datetime
+from typing import Callable, Iterable
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+from app.database import engine
+from app.models.server import Server
+from app.models.docker_snapshot import DockerSnapshot
+from app.services import docker_pool
+
+RECONCILE_SEC = 300
+RETRY_MIN_SEC = 5
+RETRY_MAX_SEC = 60
+SHORT_ID_LEN = 12
+IMAGE_LOOKUP_TIMEOUT_SEC = 10
+
+# Ação do evento -> status do container (None: não muda o status)
+ACTIONS = {
+    "create": "created",
+    "start": "running",
+    "die": "exited",
+    "pause": "paused",
+    "unpause": "running",
+    "rename": None,
+    "destroy": None,
+}
+
+
+class _Watcher:
+    def __init__(self, server_id: int):
+        self.server_id = server_id
+        self.stop = threading.Event()
+        self.stream = None
+        self.connected = False
+        self.thread = threading.Thread(target=_watch, args=(self,), daemon=True, name=f"docker-events-{server_id}")
+
+
+_lock = threading.Lock()
+# server_id -> watcher
+_watchers: dict[int, _Watcher] = {}
+
+
+def ensure(server_ids: Iterable[int]):
+    """Mantém um watcher por servidor da lista e para os que saíram dela."""
+    wanted = set(server_ids)
+    with _lock:
+        for server_id in wanted - _watchers.keys():
+            w = _watchers[server_id] = _Watcher(server_id)
+            w.thread.start()
+        removed = [_watchers.pop(sid) for sid in list(_watchers) if sid not in wanted]
+    for w in removed:
+        _stop(w)
+
+
+def is_live(server_id: int) -> bool:
+    with _lock:
+        w = _watchers.get(server_id)
+    return bool(w and w.connected)
+
+
+def stop_all():
+    with _lock:
+        watchers = list(_watchers.values())
+        _watchers.clear()
+    for w in watchers:
+        _stop(w)
+
+
+def _stop(w: _Watcher):
+    w.stop.set()
+    stream = w.stream
+    if stream is not None:
+        try:
+            # Desbloqueia a thread parada na leitura do stream
+            stream.close()
+        except Exception:
+            pass
+
+
+def _watch(w: _Watcher):
+    from app.services.docker_service import SyncInProgress, sync_exclusive
+    delay = RETRY_MIN_SEC
+    while not w.stop.is_set():
+        try:
+            with Session(engine) as session:
+                server = session.get(Server, w.server_id)
+                if not server or not server.active or not server.has_docker:
+                    return
+                with docker_pool.docker_client(server) as client:
+                    w.stream = client.events(decode=True, filters={"type": "container", "event": list(ACTIONS)})
+                    # Assina antes do sync: o que mudar durante a listagem chega como evento.
+                    # Mesma trava do scheduler: não roda junto com um sync completo do servidor
+                    try:
+                        sync_exclusive(server, session)
+                    except SyncInProgress:
+                        # O sync que segurou a trava cobre a listagem; os eventos seguem
+                        pass
+                    w.connected = True
+                    delay = RETRY_MIN_SEC
+                    consume(session, server, w.stream, w.stop)
+        except Exception:
+            pass
+        finally:
+            w.connected = False
+            w.stream = None
+        w.stop.wait(delay)
+        delay = min(delay * 2, RETRY_MAX_SEC)
+
+
+def consume(session: Session, server: Server, events: Iterable[dict], stop: threading.Event | None = None):
+    """Aplica os eventos até o stream acabar (ou `stop`)."""
+    for event in events:
+        if stop is not None and stop.is_set():
+            return
+        change = apply_event(session, server.id, event, lambda cid: _image_of(server, cid))
+        if change:
+            from app.services.ws_manager import broadcast_docker_container
+            broadcast_docker_container(server.company_id, server.id, *change)
+
+
+def _image_of(server: Server, container_id: str) -> str | None:
+    """Imagem no formato do sync completo (ver docker_service.image_label), ou None."""
+    from app.services.docker_service import image_label
+    try:
+        with docker_pool.docker_client(server, IMAGE_LOOKUP_TIMEOUT_SEC) as client:
+            image_id = client.api.inspect_container(container_id)["Image"]
+            return image_label(client.api.inspect_image(image_id).get("RepoTags"))
+    except Exception:
+        return None
+
+
+def apply_event(session: Session, server_id: int, event: dict,
+                resolve_image: Callable[[str], str | None] | None = None) -> tuple[str, str, str | None] | None:
+    """
+    Aplica um evento de container no DockerSnapshot e faz commit.
+    Retorna (container_id, ação, status) ou None se o evento foi ignorado.
+    `resolve_image(container_id)` dá a imagem de um container novo no formato do
+    sync completo; sem ela (ou se falhar) fica a referência do evento.
+    """
+    if event.get("Type") != "container":
+        return None
+    action = (event.get("Action") or event.get("status") or "").split(":", 1)[0]
+    if action not in ACTIONS:
+        return None
+    actor = event.get("Actor") or {}
+    container_id = (actor.get("ID") or event.get("id") or "")[:SHORT_ID_LEN]
+    if not container_id:
+        return None
+    attrs = actor.get("Attributes") or {}
+    snap = session.exec(select(DockerSnapshot).where(DockerSnapshot.server_id == server_id, DockerSnapshot.container_id == container_id)).first()
+    if action == "destroy":
+        if snap is None:
+            return None
+        session.delete(snap)
+        session.commit()
+        return container_id, action, None
+    if snap is None:
+        # Upsert: um sync completo pode inserir o mesmo container ao mesmo tempo
+        status = ACTIONS[action] or "created"
+        stmt = insert(DockerSnapshot).values(
+            server_id=server_id,
+            container_id=container_id,
+            name=attrs.get("name") or container_id,
+            image=(resolve_image and resolve_image(container_id)) or attrs.get("image") or event.get("from") or "",
+            status=status,
+            synced_at=datetime.utcnow(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_docker_snapshots_server_container",
+            set_={
+                "name" if action == "rename" else "status": stmt.excluded.name if action == "rename" else stmt.excluded.status,
+                "synced_at": stmt.excluded.synced_at,
+            },
+        )
+        session.exec(stmt)
+        session.commit()
+        return container_id, action, status
+    if action == "rename":
+        snap.name = attrs.get("name") or snap.name
+    else:
+        snap.status = ACTIONS[action]
+    snap.synced_at = datetime.utcnow()
+    session.add(snap)
+    session.commit()
+    return container_id, action, snap.status
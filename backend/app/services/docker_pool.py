@@ -0,0 +1,393 @@
+"""
+Conexões Docker persistentes por servidor.
+
+Abrir um túnel SSH (processo ssh/sshpass ou sshtunnel) e um DockerClient a cada
+sync e a cada ação de container custa segundos. Aqui cada servidor tem um transporte
+em cache (túnel / certificados TLS), reaproveitado pelo scheduler e pelas rotas:
+
+- túnel com keepalive SSH (ServerAliveInterval / set_keepalive) e espera pela porta
+  local em vez de um sleep fixo;
+- cada bloco `docker_client` recebe um DockerClient só dele sobre o transporte
+  (tirado de uma lista de livres, até MAX_IDLE_CLIENTS): o timeout do bloco não vaza
+  para os outros, e o stream de eventos segura o próprio client sem atrapalhar sync,
+  stats e rotas em paralelo;
+- erro no bloco (timeout de uma requisição, stream fechado...) descarta só o client
+  do bloco; o transporte só cai se estiver morto (processo ssh/túnel encerrado) ou
+  se o ping no daemon falhar. Antes de reusar, se o transporte ficou mais de
+  HEALTH_CHECK_AFTER_SEC sem uso bem-sucedido (ou o último erro foi de conexão),
+  faz o ping;
+- mudou host/credenciais/certificados: o transporte antigo é descartado;
+- ocioso por mais de IDLE_TIMEOUT_SEC e sem client em uso: fechado por prune().
+
+Uso: `with docker_client(server) as client: ...`
+"""
+import hashlib
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import docker
+import requests
+from docker.tls import TLSConfig
+from app.models.server import Server
+
+try:
+    from sshtunnel import SSHTunnelForwarder
+except ImportError:
+    SSHTunnelForwarder = None
+
+DEFAULT_TIMEOUT_SEC = 60
+IDLE_TIMEOUT_SEC = 300
+HEALTH_CHECK_AFTER_SEC = 30
+HEALTH_CHECK_TIMEOUT_SEC = 5
+TUNNEL_READY_TIMEOUT_SEC = 10
+KEEPALIVE_SEC = 15
+MAX_IDLE_CLIENTS = 8
+TUNNEL_API_VERSION = "1.41"
+
+_SSH_KEEPALIVE_OPTS = (
+    "-o", f"ServerAliveInterval={KEEPALIVE_SEC}", "-o", "ServerAliveCountMax=3",
+    "-o", "ExitOnForwardFailure=yes",
+)
+
+
+class _Conn:
+    """Transporte de um servidor (túnel, certificados) e os DockerClients livres sobre ele."""
+
+    def __init__(self, base_url: str, tls: TLSConfig | None = None, version: str | None = None,
+                 proc: subprocess.Popen | None = None, tunnel=None, tmp_files: list[str] | None = None):
+        self.base_url = base_url
+        self.tls = tls
+        self.version = version
+        self.proc = proc
+        self.tunnel = tunnel
+        self.tmp_files = tmp_files or []
+        self.fingerprint = ""
+        self.idle: list[docker.DockerClient] = []
+        self.in_use = 0
+        self.closed = False
+        self.last_used = time.monotonic()
+        self.last_ok = time.monotonic()
+
+    def transport_alive(self) -> bool:
+        if self.proc is not None and self.proc.poll() is not None:
+            return False
+        if self.tunnel is not None and not self.tunnel.is_active:
+            return False
+        return True
+
+
+_lock = threading.Lock()
+# server_id -> conexão em cache
+_conns: dict[int, _Conn] = {}
+# server_id -> lock da abertura/verificação (não abre dois túneis para o mesmo servidor)
+_server_locks: dict[int, threading.Lock] = {}
+
+
+def _fingerprint(server: Server) -> str:
+    fields = (
+        server.ssh_host, server.ssh_port, server.ssh_user, server.ssh_password, server.docker_host,
+        server.docker_tls_ca_cert, server.docker_tls_client_cert, server.docker_tls_client_key,
+    )
+    return hashlib.sha256(repr(fields).encode()).hexdigest()
+
+
+def _checkout(conn: _Conn, timeout: int) -> docker.DockerClient:
+    with _lock:
+        client = conn.idle.pop() if conn.idle else None
+        conn.in_use += 1
+    if client is None:
+        try:
+            client = docker.DockerClient(base_url=conn.base_url, tls=conn.tls, version=conn.version, timeout=timeout)
+        except Exception:
+            with _lock:
+                conn.in_use -= 1
+            raise
+    # Client exclusivo do bloco: mudar o timeout não afeta os outros
+    client.api.timeout = timeout
+    return client
+
+
+def _checkin(conn: _Conn, client: docker.DockerClient, reuse: bool = True):
+    with _lock:
+        conn.in_use -= 1
+        conn.last_used = time.monotonic()
+        keep = reuse and not conn.closed and len(conn.idle) < MAX_IDLE_CLIENTS
+        if keep:
+            conn.idle.append(client)
+    if not keep:
+        _close_quietly(client)
+
+
+def _alive(conn: _Conn) -> bool:
+    if not conn.transport_alive():
+        return False
+    if time.monotonic() - conn.last_ok > HEALTH_CHECK_AFTER_SEC:
+        try:
+            client = _checkout(conn, HEALTH_CHECK_TIMEOUT_SEC)
+        except Exception:
+            return False
+        try:
+            client.ping()
+        except Exception:
+            _checkin(conn, client, reuse=False)
+            return False
+        _checkin(conn, client)
+        conn.last_ok = time.monotonic()
+    return True
+
+
+def _acquire(server: Server) -> _Conn:
+    fingerprint = _fingerprint(server)
+    with _lock:
+        server_lock = _server_locks.setdefault(server.id, threading.Lock())
+    with server_lock:
+        with _lock:
+            conn = _conns.get(server.id)
+        if conn is not None and (conn.fingerprint != fingerprint or not _alive(conn)):
+            _discard(server.id, conn)
+            conn = None
+        if conn is None:
+            conn = _open(server, DEFAULT_TIMEOUT_SEC)
+            conn.fingerprint = fingerprint
+            with _lock:
+                _conns[server.id] = conn
+        conn.last_used = time.monotonic()
+        return conn
+
+
+def _discard(server_id: int, conn: _Conn):
+    with _lock:
+        if _conns.get(server_id) is conn:
+            del _conns[server_id]
+    _close_conn(conn)
+
+
+@contextmanager
+def docker_client(server: Server, timeout: int = DEFAULT_TIMEOUT_SEC):
+    """DockerClient do servidor, exclusivo do bloco; `timeout` vale para cada requisição feita nele."""
+    conn = _acquire(server)
+    client = _checkout(conn, timeout)
+    try:
+        yield client
+    except docker.errors.APIError:
+        # O daemon respondeu (404, 409...): a conexão está boa
+        conn.last_ok = time.monotonic()
+        _checkin(conn, client)
+        raise
+    except Exception as e:
+        # O client pode ter ficado com uma resposta pela metade: vai fora. O transporte é
+        # compartilhado e só cai se estiver morto de fato.
+        _checkin(conn, client, reuse=False)
+        if not conn.transport_alive():
+            _discard(server.id, conn)
+        elif isinstance(e, requests.exceptions.ConnectionError):
+            # Próximo uso confirma com ping antes de confiar no transporte
+            conn.last_ok = 0.0
+        raise
+    conn.last_ok = time.monotonic()
+    _checkin(conn, client)
+
+
+def close_server(server_id: int):
+    """Fecha a conexão do servidor (editado ou removido)."""
+    with _lock:
+        conn = _conns.pop(server_id, None)
+    if conn is not None:
+        _close_conn(conn)
+
+
+def prune(keep: set[int] = frozenset()):
+    """Fecha conexões ociosas além do IDLE_TIMEOUT_SEC (exceto em uso ou dos servidores em `keep`)."""
+    now = time.monotonic()
+    with _lock:
+        stale = [
+            (sid, c) for sid, c in _conns.items()
+            if sid not in keep and not c.in_use and now - c.last_used > IDLE_TIMEOUT_SEC
+        ]
+        for sid, _ in stale:
+            del _conns[sid]
+    for _, c in stale:
+        _close_conn(c)
+
+
+def close_all():
+    """Fecha todas as conexões (shutdown: não deixa processos ssh órfãos)."""
+    with _lock:
+        conns = list(_conns.values())
+        _conns.clear()
+    for c in conns:
+        _close_conn(c)
+
+
+def _ssh_process_tunnel(server: Server):
+    """Túnel via ssh -L (método nativo, mais confiável)."""
+    port = _find_free_port()
+    env = os.environ.copy()
+    if server.ssh_password:
+        env["SSHPASS"] = server.ssh_password
+        cmd = [
+            "sshpass", "-e",
+            "ssh", "-o", "StrictHostKeyChecking=no", "-o", "UserKnownHostsFile=/dev/null",
+            *_SSH_KEEPALIVE_OPTS,
+            "-N", "-L", f"127.0.0.1:{port}:127.0.0.1:2375",
+            "-p", str(server.ssh_port or 22),
+            f"{server.ssh_user}@{server.ssh_host}",
+        ]
+    else:
+        cmd = [
+            "ssh", "-o", "StrictHostKeyChecking=no", "-o", "UserKnownHostsFile=/dev/null",
+            *_SSH_KEEPALIVE_OPTS,
+            "-N", "-L", f"127.0.0.1:{port}:127.0.0.1:2375",
+            "-p", str(server.ssh_port or 22),
+            f"{server.ssh_user}@{server.ssh_host}",
+        ]
+    proc = subprocess.Popen(
+        cmd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_port(proc, port)
+    except Exception:
+        _stop_proc(proc)
+        raise
+    return proc, port
+
+
+def _wait_port(proc: subprocess.Popen, port: int):
+    """Espera o ssh abrir a porta local do túnel (em vez de um sleep fixo)."""
+    deadline = time.monotonic() + TUNNEL_READY_TIMEOUT_SEC
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("SSH tunnel exited immediately")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise RuntimeError("SSH tunnel not ready")
+            time.sleep(0.05)
+
+
+def _find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _open(server: Server, timeout: int) -> _Conn:
+    """Abre o transporte do servidor; o primeiro client (que negocia a versão da API) fica livre na conexão."""
+    if server.ssh_host and server.ssh_user:
+        if server.ssh_password:
+            try:
+                proc, port = _ssh_process_tunnel(server)
+                return _Conn(f"tcp://127.0.0.1:{port}", version=TUNNEL_API_VERSION, proc=proc)
+            except Exception:
+                pass
+        if SSHTunnelForwarder:
+            tunnel = SSHTunnelForwarder(
+                (server.ssh_host, server.ssh_port or 22),
+                ssh_username=server.ssh_user,
+                ssh_password=server.ssh_password or None,
+                remote_bind_address=("127.0.0.1", 2375),
+                local_bind_address=("127.0.0.1", 0),
+                allow_agent=False,
+                set_keepalive=KEEPALIVE_SEC,
+            )
+            tunnel.start()
+            return _Conn(f"tcp://127.0.0.1:{tunnel.local_bind_port}", version=TUNNEL_API_VERSION, tunnel=tunnel)
+    host = server.docker_host or "unix:///var/run/docker.sock"
+    tls_config = None
+    tmp_files = []
+    if server.docker_tls_ca_cert or (server.docker_tls_client_cert and server.docker_tls_client_key):
+        try:
+            ca_path = cert_path = key_path = None
+            if server.docker_tls_ca_cert:
+                f = tempfile.NamedTemporaryFile(mode="w", suffix=".pem", delete=False)
+                f.write(server.docker_tls_ca_cert)
+                f.close()
+                ca_path = f.name
+                tmp_files.append(ca_path)
+            if server.docker_tls_client_cert:
+                f = tempfile.NamedTemporaryFile(mode="w", suffix=".pem", delete=False)
+                f.write(server.docker_tls_client_cert)
+                f.close()
+                cert_path = f.name
+                tmp_files.append(cert_path)
+            if server.docker_tls_client_key:
+                f = tempfile.NamedTemporaryFile(mode="w", suffix=".pem", delete=False)
+                f.write(server.docker_tls_client_key)
+                f.close()
+                key_path = f.name
+                tmp_files.append(key_path)
+            tls_kw = {}
+            if ca_path:
+                tls_kw["ca_cert"] = ca_path
+                tls_kw["verify"] = True
+            if cert_path and key_path:
+                tls_kw["client_cert"] = (cert_path, key_path)
+            tls_config = TLSConfig(**tls_kw)
+            if host.startswith("tcp://"):
+                host = host.replace("tcp://", "https://", 1).replace(":2375", ":2376")
+        except Exception:
+            for p in tmp_files:
+                try:
+                    os.unlink(p)
+                except OSError:
+                    pass
+            raise
+    conn = _Conn(host, tls=tls_config, tmp_files=tmp_files)
+    try:
+        client = docker.DockerClient(base_url=host, tls=tls_config, timeout=timeout)
+    except Exception:
+        _close_conn(conn)
+        raise
+    conn.version = client.api._version
+    conn.idle.append(client)
+    return conn
+
+
+def _close_quietly(client: docker.DockerClient):
+    try:
+        client.close()
+    except Exception:
+        pass
+
+
+def _close_conn(conn: _Conn):
+    with _lock:
+        conn.closed = True
+        idle, conn.idle = conn.idle, []
+    for client in idle:
+        _close_quietly(client)
+    if conn.tunnel is not None:
+        try:
+            conn.tunnel.stop()
+        except Exception:
+            pass
+    if conn.proc is not None:
+        _stop_proc(conn.proc)
+    for p in conn.tmp_files:
+        try:
+            os.unlink(p)
+        except OSError:
+            pass
+
+
+def _stop_proc(proc: subprocess.Popen):
+    if proc.poll() is not None:
+        return
+    try:
+        proc.terminate()
+        proc.wait(timeout=5)
+    except Exception:
+        try:
+            proc.kill()
+        except Exception:
+            pass
@@ -1,208 +1,223 @@
-import os
-import socket
-import subprocess
-import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from sqlalchemy import bindparam, delete, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import Session, select
 from app.database import engine
 from app.models.server import Server
 from app.models.docker_snapshot import DockerSnapshot
-import docker
-from docker.tls import TLSConfig
+from app.services import docker_events, docker_pool
 from datetime import datetime
 
-try:
-    from sshtunnel import SSHTunnelForwarder
-except ImportError:
-    SSHTunnelForwarder = None
-
-
-def _ssh_process_tunnel(server: Server):
-    """Túnel via ssh -L (método nativo, mais confiável)."""
-    port = _find_free_port()
-    env = os.environ.copy()
-    if server.ssh_password:
-        env["SSHPASS"] = server.ssh_password
-        cmd = [
-            "sshpass", "-e",
-            "ssh", "-o", "StrictHostKeyChecking=no", "-o", "UserKnownHostsFile=/dev/null",
-            "-N", "-L", f"127.0.0.1:{port}:127.0.0.1:2375",
-            "-p", str(server.ssh_port or 22),
-            f"{server.ssh_user}@{server.ssh_host}",
-        ]
-    else:
-        cmd = [
-            "ssh", "-o", "StrictHostKeyChecking=no", "-o", "UserKnownHostsFile=/dev/null",
-            "-N", "-L", f"127.0.0.1:{port}:127.0.0.1:2375",
-            "-p", str(server.ssh_port or 22),
-            f"{server.ssh_user}@{server.ssh_host}",
-        ]
-    proc = subprocess.Popen(
-        cmd,
-        env=env,
-        stdin=subprocess.DEVNULL,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    time.sleep(1)  # aguardar túnel estabilizar
-    if proc.poll() is not None:
-        raise RuntimeError("SSH tunnel exited immediately")
-    return proc, port
-
-
-def _find_free_port():
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(("127.0.0.1", 0))
-        return s.getsockname()[1]
-
-
-def _get_docker_client(server: Server):
-    if server.ssh_host and server.ssh_user:
-        if server.ssh_password:
-            try:
-                proc, port = _ssh_process_tunnel(server)
-                host = f"tcp://127.0.0.1:{port}"
-                client = docker.DockerClient(base_url=host, version="1.41", timeout=60)
-                client._ssh_proc = proc
-                return client
-            except Exception:
-                pass
-        if SSHTunnelForwarder:
-            tunnel = SSHTunnelForwarder(
-                (server.ssh_host, server.ssh_port or 22),
-                ssh_username=server.ssh_user,
-                ssh_password=server.ssh_password or None,
-                remote_bind_address=("127.0.0.1", 2375),
-                local_bind_address=("127.0.0.1", 0),
-                allow_agent=False,
-            )
-            tunnel.start()
-            host = f"tcp://127.0.0.1:{tunnel.local_bind_port}"
-            client = docker.DockerClient(base_url=host, version="1.41", timeout=60)
-            client._ssh_tunnel = tunnel
-            return client
-    host = server.docker_host or "unix:///var/run/docker.sock"
-    tls_config = None
-    tmp_files = []
-    if server.docker_tls_ca_cert or (server.docker_tls_client_cert and server.docker_tls_client_key):
-        try:
-            ca_path = cert_path = key_path = None
-            if server.docker_tls_ca_cert:
-                f = tempfile.NamedTemporaryFile(mode="w", suffix=".pem", delete=False)
-                f.write(server.docker_tls_ca_cert)
-                f.close()
-                ca_path = f.name
-                tmp_files.append(ca_path)
-            if server.docker_tls_client_cert:
-                f = tempfile.NamedTemporaryFile(mode="w", suffix=".pem", delete=False)
-                f.write(server.docker_tls_client_cert)
-                f.close()
-                cert_path = f.name
-                tmp_files.append(cert_path)
-            if server.docker_tls_client_key:
-                f = tempfile.NamedTemporaryFile(mode="w", suffix=".pem", delete=False)
-                f.write(server.docker_tls_client_key)
-                f.close()
-                key_path = f.name
-                tmp_files.append(key_path)
-            tls_kw = {}
-            if ca_path:
-                tls_kw["ca_cert"] = ca_path
-                tls_kw["verify"] = True
-            if cert_path and key_path:
-                tls_kw["client_cert"] = (cert_path, key_path)
-            tls_config = TLSConfig(**tls_kw)
-            if host.startswith("tcp://"):
-                host = host.replace("tcp://", "https://", 1).replace(":2375", ":2376")
-        except Exception:
-            for p in tmp_files:
-                try:
-                    os.unlink(p)
-                except OSError:
-                    pass
-            raise
-    client = docker.DockerClient(base_url=host, tls=tls_config)
-    if tmp_files:
-        client._tmp_cert_files = tmp_files
-    return client
-
-
-def get_docker_client(server: Server) -> docker.DockerClient:
-    return _get_docker_client(server)
-
-
-def _close_client(client):
-    try:
-        client.close()
-    except Exception:
-        pass
-    tunnel = getattr(client, "_ssh_tunnel", None)
-    if tunnel:
-        try:
-            tunnel.stop()
-        except Exception:
-            pass
-    proc = getattr(client, "_ssh_proc", None)
-    if proc and proc.poll() is None:
-        try:
-            proc.terminate()
-            proc.wait(timeout=5)
-        except Exception:
-            try:
-                proc.kill()
-            except Exception:
-                pass
-    for p in getattr(client, "_tmp_cert_files", []):
-        try:
-            os.unlink(p)
-        except OSError:
-            pass
+# Sincronização em paralelo: servidores lentos não atrasam os outros nem estouram o
+# intervalo de 30s do scheduler
+SYNC_WORKERS = 8
+# Timeout das chamadas à API Docker durante o sync (por requisição)
+SYNC_TIMEOUT_SEC = 20
+# Quanto sync_all_docker espera a rodada; o que passar disso termina em background
+ROUND_DEADLINE_SEC = 25
+MAX_ERROR_LEN = 500
+# Acima disso, um sync publica um único docker_sync em vez de um evento por container
+MAX_CONTAINER_EVENTS = 50
+
+class SyncInProgress(RuntimeError):
+    """Outro sync do servidor não terminou dentro do prazo de sync_exclusive."""
+
+
+_pool: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+# Servidores com sync em andamento: a próxima rodada não empilha outro para eles
+_in_flight: set[int] = set()
+# Avisado quando um servidor sai de _in_flight (sync_exclusive espera por ele)
+_sync_done = threading.Condition(_lock)
+# server_id -> monotonic do último sync completo bem-sucedido
+_last_full: dict[int, float] = {}
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix="docker-sync")
+        return _pool
 
 
 def sync_all_docker():
+    """
+    Executado pelo scheduler: sincroniza os servidores com Docker em paralelo. Com o
+    stream de eventos vivo, a listagem completa só roda a cada RECONCILE_SEC.
+    """
     with Session(engine) as session:
-        servers = session.exec(
-            select(Server).where(Server.has_docker == True)
+        server_ids = session.exec(
+            select(Server.id).where(Server.has_docker == True, Server.active == True)
         ).all()
-        for srv in servers:
-            try:
-                _sync_server(srv, session)
-            except Exception:
-                pass
-        session.commit()
+    docker_events.ensure(server_ids)
+    live = {sid for sid in server_ids if docker_events.is_live(sid)}
+    docker_pool.prune(keep=live)
+    pool = _get_pool()
+    futures = []
+    now = time.monotonic()
+    for server_id in server_ids:
+        if server_id in live and now - _last_full.get(server_id, 0) < docker_events.RECONCILE_SEC:
+            continue
+        with _lock:
+            if server_id in _in_flight:
+                continue
+            _in_flight.add(server_id)
+        futures.append(pool.submit(_sync_one, server_id))
+    if futures:
+        wait(futures, timeout=ROUND_DEADLINE_SEC)
+
+
+def _sync_one(server_id: int):
+    """Sincroniza um servidor na própria sessão e grava último sucesso/erro."""
+    try:
+        with Session(engine) as session:
+            server = session.get(Server, server_id)
+            if not server or not server.has_docker:
+                return
+            sync_server(server, session)
+    except Exception:
+        pass
+    finally:
+        with _sync_done:
+            _in_flight.discard(server_id)
+            _sync_done.notify_all()
 
 
-def _sync_server(server: Server, session: Session):
-    client = _get_docker_client(server)
+def sync_exclusive(server: Server, session: Session, timeout: int = SYNC_TIMEOUT_SEC):
+    """
+    sync_server sob a trava de _in_flight do scheduler (watcher de eventos, sync
+    manual): espera o sync em andamento do servidor, se houver, e então faz o seu.
+    Se o outro não terminar em `timeout` segundos, levanta SyncInProgress.
+    """
+    deadline = time.monotonic() + timeout
+    with _sync_done:
+        while server.id in _in_flight:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SyncInProgress("Sincronização já em andamento")
+            _sync_done.wait(remaining)
+        _in_flight.add(server.id)
     try:
-        containers = client.containers.list(all=True)
-        existing_ids = set()
-        for c in containers:
-            short_id = c.short_id
-            existing_ids.add(short_id)
-            cpu = mem_pct = mem_mb = None
-            old = session.exec(select(DockerSnapshot).where(DockerSnapshot.server_id == server.id, DockerSnapshot.container_id == short_id)).first()
-            if old:
-                old.name = c.name
-                old.image = c.image.tags[0] if c.image.tags else str(c.image)
-                old.status = c.status
-                old.cpu_percent = cpu
-                old.mem_percent = mem_pct
-                old.mem_usage_mb = mem_mb
-                old.synced_at = datetime.utcnow()
-            else:
-                session.add(DockerSnapshot(
-                    server_id=server.id,
-                    container_id=short_id,
-                    name=c.name,
-                    image=c.image.tags[0] if c.image.tags else str(c.image),
-                    status=c.status,
-                    cpu_percent=cpu,
-                    mem_percent=mem_pct,
-                    mem_usage_mb=mem_mb,
-                ))
-        for snap in session.exec(select(DockerSnapshot).where(DockerSnapshot.server_id == server.id)).all():
-            if snap.container_id not in existing_ids:
-                session.delete(snap)
+        sync_server(server, session, timeout)
     finally:
-        _close_client(client)
+        with _sync_done:
+            _in_flight.discard(server.id)
+            _sync_done.notify_all()
+
+
+def sync_server(server: Server, session: Session, timeout: int = SYNC_TIMEOUT_SEC):
+    """
+    Sincroniza e faz commit só deste servidor. Em erro desfaz os snapshots, grava
+    docker_last_error e relança a exceção. Só publica evento se algo mudou.
+    """
+    try:
+        changes = _sync_server(server, session, timeout)
+        _last_full[server.id] = time.monotonic()
+        server.docker_last_sync_at = datetime.utcnow()
+        server.docker_last_error = None
+        session.add(server)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        server.docker_last_error = (str(e) or type(e).__name__)[:MAX_ERROR_LEN]
+        server.docker_last_error_at = datetime.utcnow()
+        session.add(server)
+        session.commit()
+        raise
+    from app.services.ws_manager import broadcast_docker_container, broadcast_docker_sync
+    if len(changes) > MAX_CONTAINER_EVENTS:
+        broadcast_docker_sync(server.company_id, server.id)
+        return
+    for container_id, action, status in changes:
+        broadcast_docker_container(server.company_id, server.id, container_id, action, status)
+
+
+def list_containers(client) -> dict[str, dict]:
+    """
+    Containers do host em duas chamadas (GET /containers/json e /images/json).
+    `containers.list()` faria um inspect por container, e `container.image` mais uma
+    chamada cada.
+    """
+    tags = {img["Id"]: image_label(img.get("RepoTags")) for img in client.api.images()}
+    out = {}
+    for c in client.api.containers(all=True):
+        container_id = c["Id"][:docker_events.SHORT_ID_LEN]
+        names = c.get("Names") or []
+        out[container_id] = {
+            "name": names[0].lstrip("/") if names else container_id,
+            "image": tags.get(c.get("ImageID")) or c.get("Image") or "",
+            "status": c.get("State") or "",
+        }
+    return out
+
+
+def image_label(repo_tags: list[str] | None) -> str:
+    """
+    Imagem como é gravada no snapshot: mesmo formato de antes (`image.tags[0]`, ou
+    `str(image)` sem tag), e não o "Image" do container, que guarda o nome usado no
+    run (ex.: "nginx" ou um sha256).
+    """
+    tags = [t for t in repo_tags or [] if t != "<none>:<none>"]
+    return tags[0] if tags else "<Image: ''>"
+
+
+def diff_snapshots(existing: dict[str, DockerSnapshot], current: dict[str, dict]) -> tuple[list, list, list]:
+    """(novos, alterados [(snapshot, campos)], removidos) entre o banco e o host."""
+    inserts = [(cid, fields) for cid, fields in current.items() if cid not in existing]
+    updates = []
+    for cid, snap in existing.items():
+        fields = current.get(cid)
+        if fields is None:
+            continue
+        changed = {k: v for k, v in fields.items() if getattr(snap, k) != v}
+        if changed:
+            updates.append((snap, changed))
+    deletes = [snap for cid, snap in existing.items() if cid not in current]
+    return inserts, updates, deletes
+
+
+def _sync_server(server: Server, session: Session, timeout: int = docker_pool.DEFAULT_TIMEOUT_SEC) -> list[tuple]:
+    """
+    Aplica no banco só o que mudou (insert/update/delete em lote). Não faz commit.
+    Retorna [(container_id, ação, status)] das mudanças.
+    """
+    # Só a chamada ao daemon fica no bloco: erro de banco não derruba a conexão
+    with docker_pool.docker_client(server, timeout) as client:
+        current = list_containers(client)
+    existing = {
+        snap.container_id: snap
+        for snap in session.exec(select(DockerSnapshot).where(DockerSnapshot.server_id == server.id)).all()
+    }
+    inserts, updates, deletes = diff_snapshots(existing, current)
+    now = datetime.utcnow()
+    table = DockerSnapshot.__table__
+    conn = session.connection()
+    if inserts:
+        # Um evento pode ter criado a linha depois da leitura acima
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_docker_snapshots_server_container",
+            set_={"name": stmt.excluded.name, "image": stmt.excluded.image,
+                  "status": stmt.excluded.status, "synced_at": stmt.excluded.synced_at},
+        )
+        conn.execute(stmt, [
+            {"server_id": server.id, "container_id": cid, "synced_at": now, **fields} for cid, fields in inserts
+        ])
+    if updates:
+        conn.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(
+                name=bindparam("b_name"), image=bindparam("b_image"), status=bindparam("b_status"), synced_at=now,
+            ),
+            [{"b_id": snap.id, **{f"b_{k}": v for k, v in current[snap.container_id].items()}} for snap, _ in updates],
+        )
+    if deletes:
+        conn.execute(delete(table).where(table.c.id.in_([snap.id for snap in deletes])))
+    return (
+        [(cid, "create", fields["status"]) for cid, fields in inserts]
+        + [(snap.container_id, "rename" if "name" in changed else "update", current[snap.container_id]["status"])
+           for snap, changed in updates]
+        + [(snap.container_id, "destroy", None) for snap in deletes]
+    )
@@ -0,0 +1,212 @@
+"""
+Coleta de CPU/memória dos containers em execução.
+
+`container.stats()` por container, em série, custa ~1-2s cada (o daemon espera uma
+segunda leitura para calcular a CPU). Aqui cada rodada pede `stats(stream=False,
+one_shot=True)` (resposta imediata, uma leitura só) para todos os containers
+rodando, em paralelo (STATS_WORKERS), e calcula a CPU% pela diferença para a leitura
+da rodada anterior, guardada em memória. Na primeira amostra de um container
+(ou depois de um restart do processo) a CPU fica vazia.
+
+Cada amostra vai para `docker_stats` (bruto, 7 dias), atualiza os campos de
+CPU/memória do DockerSnapshot e soma nos buckets horário e diário de
+`docker_stat_rollups` (mesmo esquema de services/rollup_service.py), que servem
+os gráficos de períodos longos.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import bindparam, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, func
+from app.database import engine
+from app.models.server import Server
+from app.models.docker_snapshot import DockerSnapshot
+from app.models.docker_stat import DockerStat, DockerStatRollup
+from app.services import docker_pool
+from app.services.rollup_service import HOUR, DAY, hour_bucket, day_bucket
+
+STATS_WORKERS = 16
+STATS_TIMEOUT_SEC = 10
+RAW_RETENTION_DAYS = 7
+
+_lock = threading.Lock()
+_pool: ThreadPoolExecutor | None = None
+# (server_id, container_id) -> (cpu total_usage, system_cpu_usage) da última leitura
+_prev_cpu: dict[tuple[int, str], tuple[int, int]] = {}
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=STATS_WORKERS, thread_name_prefix="docker-stats")
+        return _pool
+
+
+def cpu_percent(stats: dict, prev: tuple[int, int] | None) -> float | None:
+    """CPU% como o `docker stats`: delta do container / delta do sistema × CPUs online."""
+    cpu = stats.get("cpu_stats") or {}
+    total = (cpu.get("cpu_usage") or {}).get("total_usage")
+    system = cpu.get("system_cpu_usage")
+    if total is None or system is None:
+        return None
+    if prev is None:
+        # Sem leitura anterior: usa precpu_stats se o daemon mandou (stats sem one_shot)
+        pre = stats.get("precpu_stats") or {}
+        pre_total = (pre.get("cpu_usage") or {}).get("total_usage")
+        pre_system = pre.get("system_cpu_usage")
+        if not pre_total or not pre_system:
+            return None
+        prev = (pre_total, pre_system)
+    cpu_delta = total - prev[0]
+    system_delta = system - prev[1]
+    if system_delta <= 0 or cpu_delta < 0:
+        return None
+    online = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    return round(cpu_delta / system_delta * online * 100, 2)
+
+
+def memory(stats: dict) -> tuple[float | None, float | None]:
+    """(mem%, MB usados) descontando cache de página (cgroup v1 "cache", v2 "inactive_file")."""
+    mem = stats.get("memory_stats") or {}
+    usage = mem.get("usage")
+    limit = mem.get("limit")
+    if usage is None:
+        return None, None
+    detail = mem.get("stats") or {}
+    used = usage - (detail.get("inactive_file") or detail.get("total_inactive_file") or detail.get("cache") or 0)
+    used = max(used, 0)
+    pct = round(used / limit * 100, 2) if limit else None
+    return pct, round(used / 1024 / 1024, 1)
+
+
+def _cpu_reading(stats: dict) -> tuple[int, int] | None:
+    cpu = stats.get("cpu_stats") or {}
+    total = (cpu.get("cpu_usage") or {}).get("total_usage")
+    system = cpu.get("system_cpu_usage")
+    if total is None or system is None:
+        return None
+    return total, system
+
+
+def _fetch(server: Server, container_id: str) -> dict | None:
+    try:
+        with docker_pool.docker_client(server, STATS_TIMEOUT_SEC) as client:
+            return client.api.stats(container_id, stream=False, one_shot=True)
+    except Exception:
+        return None
+
+
+def collect_all_stats():
+    """Executado pelo scheduler: uma amostra de cada container rodando nos hosts saudáveis."""
+    with Session(engine) as session:
+        servers = {
+            s.id: s for s in session.exec(
+                select(Server).where(Server.has_docker == True, Server.active == True)
+            ).all()
+            # Host com o último sync falhando: não vale abrir N conexões para errar N vezes
+            if not (s.docker_last_error_at and (s.docker_last_sync_at is None or s.docker_last_error_at > s.docker_last_sync_at))
+        }
+        if not servers:
+            return
+        running = session.exec(
+            select(DockerSnapshot.server_id, DockerSnapshot.container_id)
+            .where(DockerSnapshot.server_id.in_(list(servers)), DockerSnapshot.status == "running")
+        ).all()
+    pool = _get_pool()
+    futures = {(sid, cid): pool.submit(_fetch, servers[sid], cid) for sid, cid in running}
+    samples = []
+    for (sid, cid), fut in futures.items():
+        stats = fut.result()
+        if not stats:
+            continue
+        key = (sid, cid)
+        cpu = cpu_percent(stats, _prev_cpu.get(key))
+        reading = _cpu_reading(stats)
+        if reading:
+            _prev_cpu[key] = reading
+        mem_pct, mem_mb = memory(stats)
+        samples.append(DockerStat(server_id=sid, container_id=cid, cpu_percent=cpu, mem_percent=mem_pct, mem_usage_mb=mem_mb))
+    # Leituras de containers que pararam não servem mais
+    for key in set(_prev_cpu) - set(futures):
+        _prev_cpu.pop(key, None)
+    if samples:
+        with Session(engine) as session:
+            record(session, samples)
+            session.commit()
+
+
+def record(session: Session, samples: list[DockerStat]):
+    """Grava as amostras, o último valor no DockerSnapshot e os buckets hora/dia. Não faz commit."""
+    session.add_all(samples)
+    snapshots = DockerSnapshot.__table__
+    session.connection().execute(
+        update(snapshots)
+        .where(snapshots.c.server_id == bindparam("b_server_id"), snapshots.c.container_id == bindparam("b_container_id"))
+        .values(cpu_percent=bindparam("b_cpu"), mem_percent=bindparam("b_mem"), mem_usage_mb=bindparam("b_mem_mb")),
+        [{"b_server_id": s.server_id, "b_container_id": s.container_id, "b_cpu": s.cpu_percent,
+          "b_mem": s.mem_percent, "b_mem_mb": s.mem_usage_mb} for s in samples],
+    )
+    rows = []
+    for s in samples:
+        base = {
+            "server_id": s.server_id,
+            "container_id": s.container_id,
+            "sample_count": 1,
+            "cpu_count": 1 if s.cpu_percent is not None else 0,
+            "cpu_sum": s.cpu_percent or 0,
+            "cpu_max": s.cpu_percent,
+            "mem_count": 1 if s.mem_percent is not None else 0,
+            "mem_sum": s.mem_percent or 0,
+            "mem_max": s.mem_percent,
+            "mem_usage_mb_max": s.mem_usage_mb,
+        }
+        rows.append({**base, "period": HOUR, "bucket_start": hour_bucket(s.collected_at)})
+        rows.append({**base, "period": DAY, "bucket_start": day_bucket(s.collected_at)})
+    stmt = insert(DockerStatRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_docker_stat_rollups_container_period_bucket",
+        set_={
+            "sample_count": DockerStatRollup.sample_count + stmt.excluded.sample_count,
+            "cpu_count": DockerStatRollup.cpu_count + stmt.excluded.cpu_count,
+            "cpu_sum": DockerStatRollup.cpu_sum + stmt.excluded.cpu_sum,
+            "cpu_max": func.greatest(DockerStatRollup.cpu_max, stmt.excluded.cpu_max),
+            "mem_count": DockerStatRollup.mem_count + stmt.excluded.mem_count,
+            "mem_sum": DockerStatRollup.mem_sum + stmt.excluded.mem_sum,
+            "mem_max": func.greatest(DockerStatRollup.mem_max, stmt.excluded.mem_max),
+            "mem_usage_mb_max": func.greatest(DockerStatRollup.mem_usage_mb_max, stmt.excluded.mem_usage_mb_max),
+        },
+    )
+    session.exec(stmt)
+
+
+def series(session: Session, server_id: int, since: datetime, container_id: str | None = None, hourly: bool = False) -> dict:
+    """Série por container: amostras brutas ou, com `hourly`, médias/máximos por hora."""
+    out: dict[str, list] = {}
+    if not hourly:
+        q = select(DockerStat).where(DockerStat.server_id == server_id, DockerStat.collected_at >= since)
+        if container_id:
+            q = q.where(DockerStat.container_id == container_id)
+        for s in session.exec(q.order_by(DockerStat.collected_at)).all():
+            out.setdefault(s.container_id, []).append({
+                "t": s.collected_at, "cpu": s.cpu_percent, "mem": s.mem_percent, "mem_mb": s.mem_usage_mb,
+            })
+        return out
+    q = select(DockerStatRollup).where(
+        DockerStatRollup.server_id == server_id,
+        DockerStatRollup.period == HOUR,
+        DockerStatRollup.bucket_start >= hour_bucket(since),
+    )
+    if container_id:
+        q = q.where(DockerStatRollup.container_id == container_id)
+    for r in session.exec(q.order_by(DockerStatRollup.bucket_start)).all():
+        out.setdefault(r.container_id, []).append({
+            "t": r.bucket_start,
+            "cpu": round(r.cpu_sum / r.cpu_count, 2) if r.cpu_count else None,
+            "cpu_max": r.cpu_max,
+            "mem": round(r.mem_sum / r.mem_count, 2) if r.mem_count else None,
+            "mem_max": r.mem_max,
+            "mem_mb": r.mem_usage_mb_max,
+        })
+    return out
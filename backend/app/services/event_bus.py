@@ -0,0 +1,73 @@
+"""
+Ponte de eventos entre as threads (scheduler, checkers, SNMP, Docker) e o event loop
+do uvicorn, onde vivem os WebSockets.
+
+`publish` pode ser chamado de qualquer thread: só faz `deque.append` (atômico no
+CPython) e, se ainda não houver um dreno agendado, agenda um com
+`loop.call_soon_threadsafe`. O dreno roda no loop, tira tudo o que acumulou (até
+MAX_BATCH por rodada) e entrega ao ws_manager, que codifica cada evento uma vez. Uma
+rajada de eventos custa um wakeup do loop, não um por evento.
+
+Se o loop ficar parado, a fila guarda no máximo MAX_PENDING eventos (descarta os
+mais antigos). Sem loop registrado (scripts, testes), os eventos são descartados.
+"""
+import asyncio
+import threading
+from collections import deque
+
+MAX_PENDING = 50_000
+MAX_BATCH = 5_000
+
+_pending: deque = deque(maxlen=MAX_PENDING)
+_loop: asyncio.AbstractEventLoop | None = None
+_scheduled = threading.Event()
+_stats = {"delivered": 0, "drains": 0, "max_batch": 0}
+
+
+def attach(loop: asyncio.AbstractEventLoop):
+    """Registra o event loop que entrega os eventos (chamado no startup da app)."""
+    global _loop
+    _loop = loop
+
+
+def detach():
+    global _loop
+    _loop = None
+    _pending.clear()
+    _scheduled.clear()
+
+
+def publish(company_id: int, event: str, data: dict):
+    """Publica um evento para os clientes WebSocket da empresa. Seguro de qualquer thread."""
+    loop = _loop
+    if loop is None:
+        return
+    _pending.append((company_id, event, data))
+    if not _scheduled.is_set():
+        _scheduled.set()
+        try:
+            loop.call_soon_threadsafe(_drain)
+        except RuntimeError:
+            # Loop fechado (shutdown)
+            _scheduled.clear()
+
+
+def _drain():
+    from app.services import ws_manager
+    # Limpa antes de drenar: o que chegar durante o dreno agenda outra rodada
+    _scheduled.clear()
+    batch = []
+    while _pending and len(batch) < MAX_BATCH:
+        batch.append(_pending.popleft())
+    if _pending and not _scheduled.is_set():
+        _scheduled.set()
+        _loop.call_soon(_drain)
+    for company_id, event, data in batch:
+        ws_manager.publish_event(company_id, event, data)
+    _stats["drains"] += 1
+    _stats["delivered"] += len(batch)
+    _stats["max_batch"] = max(_stats["max_batch"], len(batch))
+
+
+def stats() -> dict:
+    return {**_stats, "pending": len(_pending)}
@@ -0,0 +1,196 @@
+"""
+Incidentes: agrupa falhas pela dependência na topologia (ver dependency_service).
+
+Quando todos os checks de um nó pai (roteador com filhos) estão falhando, abre-se
+um incidente para ele. Alertas de checks do próprio nó ou de seus filhos:
+
+- saem da outbox com WINDOW_SEC de atraso, para dar tempo do pai ser detectado;
+- na hora do envio (`absorb`), se houver incidente aberto para o nó ou um pai, o
+  primeiro alerta de cada canal vira a notificação de causa raiz, com a lista de
+  checks afetados, e os demais ficam SUPPRESSED enquanto o pai estiver fora.
+
+O estado dos checks (falhas seguidas por nó) fica em memória, carregado do
+`last_status` no primeiro uso; `note_result` é chamado a cada resultado.
+"""
+import threading
+from datetime import datetime
+from sqlmodel import Session, select
+from app.models.health_check import HealthCheck, CheckResult
+from app.models.incident import Incident
+from app.models.notification import NotificationOutbox
+from app.services import dependency_service
+
+OPEN = "OPEN"
+RESOLVED = "RESOLVED"
+SUPPRESSED = "SUPPRESSED"
+
+# Atraso dos alertas de nós com dependência (janela de agrupamento)
+WINDOW_SEC = 60
+# Falhas seguidas para um check contar como "fora" no cálculo do nó
+DOWN_AFTER_FAILURES = 2
+
+_lock = threading.Lock()
+# Serializa abertura/fechamento e a escolha da notificação de causa raiz por canal
+_incident_lock = threading.Lock()
+# company_id -> {check_id: {"node": str | None, "name": str, "failures": int}}
+_checks: dict[int, dict[int, dict]] = {}
+# company_id -> {nó raiz: incident_id}
+_open: dict[int, dict[str, int]] = {}
+
+
+def _ensure_loaded(session: Session, company_id: int):
+    with _lock:
+        if company_id in _checks:
+            return
+    checks = {
+        c.id: {
+            "node": dependency_service.node_id_for(c),
+            "name": c.name,
+            "failures": DOWN_AFTER_FAILURES if c.last_status not in (None, "OK") else 0,
+        }
+        for c in session.exec(
+            select(HealthCheck).where(HealthCheck.company_id == company_id, HealthCheck.active == True)
+        ).all()
+    }
+    open_incidents = {
+        i.root_node: i.id
+        for i in session.exec(select(Incident).where(Incident.company_id == company_id, Incident.status == OPEN)).all()
+    }
+    with _lock:
+        _checks.setdefault(company_id, checks)
+        _open.setdefault(company_id, open_incidents)
+
+
+def _node_down(company_id: int, node: str) -> bool:
+    states = [s for s in _checks[company_id].values() if s["node"] == node]
+    return bool(states) and all(s["failures"] >= DOWN_AFTER_FAILURES for s in states)
+
+
+def _affected(session: Session, company_id: int, root: str) -> list[int]:
+    nodes = {root} | dependency_service.children_of(session, company_id, root)
+    with _lock:
+        return sorted(cid for cid, s in _checks[company_id].items() if s["node"] in nodes and s["failures"] > 0)
+
+
+def note_result(session: Session, check: HealthCheck, result: CheckResult) -> bool:
+    """
+    Atualiza o estado do check e abre/fecha o incidente do nó quando ele cai/volta.
+    Retorna True se alterou algo na sessão (o chamador faz o commit). O mapa de
+    incidentes abertos já reflete a mudança; se o commit não acontecer, o chamador
+    deve chamar `invalidate` para não ficar um incidente fantasma em memória.
+    """
+    company_id = check.company_id
+    _ensure_loaded(session, company_id)
+    node = dependency_service.node_id_for(check)
+    with _lock:
+        state = _checks[company_id].setdefault(check.id, {"node": node, "name": check.name, "failures": 0})
+        state["node"] = node
+        state["name"] = check.name
+        state["failures"] = 0 if result.status == "OK" else state["failures"] + 1
+    if not dependency_service.children_of(session, company_id, node):
+        return False
+
+    with _incident_lock:
+        with _lock:
+            down = _node_down(company_id, node)
+            incident_id = _open[company_id].get(node)
+        if down and incident_id is None:
+            title = f"{dependency_service.label(session, company_id, node)} fora do ar"
+            incident = Incident(company_id=company_id, root_node=node, title=title,
+                                affected_check_ids=_affected(session, company_id, node))
+            session.add(incident)
+            session.flush()
+            with _lock:
+                _open[company_id][node] = incident.id
+            return True
+        if not down and incident_id is not None:
+            with _lock:
+                _open[company_id].pop(node, None)
+            incident = session.get(Incident, incident_id)
+            if incident and incident.status == OPEN:
+                incident.status = RESOLVED
+                incident.resolved_at = datetime.utcnow()
+                session.add(incident)
+                return True
+    return False
+
+
+def down_nodes(session: Session, company_id: int) -> set[str]:
+    """Nós com todos os checks falhando (estado em memória)."""
+    _ensure_loaded(session, company_id)
+    with _lock:
+        nodes = {st["node"] for st in _checks[company_id].values() if st["node"]}
+        return {n for n in nodes if _node_down(company_id, n)}
+
+
+def hold_sec(session: Session, check: HealthCheck) -> int:
+    """Atraso do alerta: só checks que participam de alguma dependência esperam a janela."""
+    node = dependency_service.node_id_for(check)
+    if dependency_service.parents_of(session, check.company_id, node) or dependency_service.children_of(session, check.company_id, node):
+        return WINDOW_SEC
+    return 0
+
+
+def absorb(session: Session, item: NotificationOutbox) -> str | None:
+    """
+    Decide, na hora do envio, o que fazer com um alerta da outbox. Retorna None para
+    enviar como está ou SUPPRESSED. Quando o alerta é o primeiro do canal num incidente
+    aberto, `subject`/`message` são reescritos com a causa raiz e ele segue para envio.
+    Pode fazer commit da sessão.
+    """
+    if item.check_id is None:
+        return None
+    company_id = item.company_id
+    _ensure_loaded(session, company_id)
+    with _lock:
+        state = _checks[company_id].get(item.check_id)
+    if not state or not state["node"]:
+        return None
+    candidates = [state["node"], *sorted(dependency_service.parents_of(session, company_id, state["node"]))]
+    with _lock:
+        incident_id = next((_open[company_id][n] for n in candidates if n in _open[company_id]), None)
+    if incident_id is None:
+        return None
+
+    with _incident_lock:
+        incident = session.get(Incident, incident_id)
+        if not incident or incident.status != OPEN:
+            return None
+        affected = sorted(set(incident.affected_check_ids) | set(_affected(session, company_id, incident.root_node)) | {item.check_id})
+        incident.affected_check_ids = affected
+        item.incident_id = incident.id
+        item.payload = {**(item.payload or {}), "incident": {
+            "id": incident.id,
+            "title": incident.title,
+            "root_node": incident.root_node,
+            "opened_at": incident.opened_at.isoformat(),
+            "affected_check_ids": affected,
+        }}
+        if item.channel_id in incident.notified_channel_ids:
+            outcome = SUPPRESSED
+        else:
+            incident.notified_channel_ids = [*incident.notified_channel_ids, item.channel_id]
+            item.subject = incident.title
+            item.message = _root_message(session, incident, affected)
+            outcome = None
+        session.add(incident)
+        session.add(item)
+        session.commit()
+    return outcome
+
+
+def _root_message(session: Session, incident: Incident, affected: list[int]) -> str:
+    root = dependency_service.label(session, incident.company_id, incident.root_node)
+    with _lock:
+        states = _checks.get(incident.company_id, {})
+        names = [states[cid]["name"] for cid in affected if cid in states]
+    lines = [f"*[ServerWatch]* Incidente: {incident.title}", f"Causa provável: {root}", f"Checks afetados ({len(names)}):"]
+    lines += [f"- {n}" for n in names]
+    return "\n".join(lines)
+
+
+def invalidate(company_id: int):
+    """Descarta o estado em memória (ex.: checks alterados/removidos); recarrega no próximo uso."""
+    with _lock:
+        _checks.pop(company_id, None)
+        _open.pop(company_id, None)
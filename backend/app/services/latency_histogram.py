@@ -0,0 +1,88 @@
+"""
+Histograma de latência log-linear (estilo HDR), mesclável entre buckets e checks.
+
+Valores < 16ms são exatos; acima disso há 16 sub-buckets por potência de 2, o que
+limita o erro relativo dos percentis a 1/16. A forma serializada é um dict esparso
+{índice: contagem} — é o que fica em `check_rollups.latency_hist`.
+"""
+import math
+
+_SUB_BITS = 4
+_SUB = 1 << _SUB_BITS
+
+
+def bucket_index(ms: int) -> int:
+    """Índice do bucket para uma latência em ms."""
+    ms = max(int(ms), 0)
+    if ms < _SUB:
+        return ms
+    exp = ms.bit_length() - 1 - _SUB_BITS
+    return _SUB + exp * _SUB + ((ms >> exp) - _SUB)
+
+
+def bucket_bounds(idx: int) -> tuple[int, int]:
+    """Faixa [de, até] em ms coberta por um índice."""
+    if idx < _SUB:
+        return idx, idx
+    exp, sub = divmod(idx - _SUB, _SUB)
+    low = (_SUB + sub) << exp
+    return low, low + (1 << exp) - 1
+
+
+class LatencyHistogram:
+    def __init__(self, counts: dict[int, int] | None = None, max_ms: int | None = None):
+        self.counts: dict[int, int] = dict(counts or {})
+        self.max_ms = max_ms
+
+    @classmethod
+    def from_dict(cls, data: dict | None, max_ms: int | None = None) -> "LatencyHistogram":
+        return cls({int(k): int(v) for k, v in (data or {}).items()}, max_ms)
+
+    def to_dict(self) -> dict[str, int]:
+        return {str(k): v for k, v in self.counts.items()}
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, ms: int, count: int = 1):
+        idx = bucket_index(ms)
+        self.counts[idx] = self.counts.get(idx, 0) + count
+        if self.max_ms is None or ms > self.max_ms:
+            self.max_ms = int(ms)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        for idx, count in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + count
+        if other.max_ms is not None and (self.max_ms is None or other.max_ms > self.max_ms):
+            self.max_ms = other.max_ms
+        return self
+
+    def quantile(self, q: float) -> int | None:
+        """Valor (limite superior do bucket) abaixo do qual estão q*100% das amostras."""
+        total = self.total
+        if not total:
+            return None
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                high = bucket_bounds(idx)[1]
+                return min(high, self.max_ms) if self.max_ms is not None else high
+        return self.max_ms
+
+    def percentiles(self) -> dict:
+        return {
+            "p50": self.quantile(0.50),
+            "p90": self.quantile(0.90),
+            "p99": self.quantile(0.99),
+            "max": self.max_ms if self.total else None,
+        }
+
+    def buckets(self) -> list[dict]:
+        return [
+            {"from_ms": lo, "to_ms": hi, "count": self.counts[idx]}
+            for idx in sorted(self.counts)
+            for lo, hi in [bucket_bounds(idx)]
+        ]
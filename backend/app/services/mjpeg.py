@@ -0,0 +1,74 @@
+"""
+Separador de quadros JPEG para a saída do ffmpeg em `image2pipe` (JPEGs concatenados).
+
+Os dados entram num `bytearray`; a busca de SOI (FF D8) e EOI (FF D9) continua de
+onde parou na chamada anterior, então cada byte é examinado uma vez, sem re-varrer
+o buffer desde o início nem fatiar cópias a cada quadro. Os quadros saem como
+`memoryview` sobre o buffer (sem cópia); depois de emitir quadros o resto parcial
+vai para um buffer novo, e o antigo continua vivo enquanto alguém segurar as views.
+
+Dentro dos dados comprimidos de um JPEG todo 0xFF é seguido de 0x00 (byte
+stuffing), então FF D9 só aparece no fim do quadro. Lixo antes de um SOI é
+descartado; um quadro que passa de `max_frame` bytes sem EOI é descartado (stream
+corrompido) para o buffer não crescer sem limite.
+"""
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+
+
+class JpegSplitter:
+    def __init__(self, max_frame: int = MAX_FRAME_BYTES):
+        self.max_frame = max_frame
+        self.buf = bytearray()
+        # Início do quadro atual (-1: ainda procurando SOI)
+        self.start = -1
+        # Onde a próxima busca começa
+        self.scan = 0
+        self.dropped = 0
+
+    def feed(self, chunk: bytes) -> list[memoryview]:
+        """Acrescenta bytes e devolve os quadros completos (views válidas até o caller soltá-las)."""
+        buf = self.buf
+        buf += chunk
+        frames = []
+        view = None
+        consumed = 0
+        while True:
+            if self.start < 0:
+                i = buf.find(SOI, self.scan)
+                if i < 0:
+                    # Guarda o último byte: pode ser o FF de um SOI partido entre chunks
+                    consumed = max(consumed, len(buf) - 1, 0)
+                    self.scan = max(len(buf) - 1, 0)
+                    break
+                self.start = i
+                self.scan = i + 2
+            j = buf.find(EOI, self.scan)
+            if j < 0:
+                if len(buf) - self.start > self.max_frame:
+                    self.dropped += 1
+                    consumed = len(buf)
+                    self.start = -1
+                    self.scan = len(buf)
+                else:
+                    consumed = self.start
+                    self.scan = max(len(buf) - 1, self.scan, 0)
+                break
+            if view is None:
+                view = memoryview(buf)
+            frames.append(view[self.start:j + 2])
+            consumed = j + 2
+            self.start = -1
+            self.scan = j + 2
+        if consumed:
+            if view is not None:
+                # Há views exportadas: o resto vai para um buffer novo (o antigo fica com as views)
+                self.buf = bytearray(view[consumed:])
+                view.release()
+            else:
+                del buf[:consumed]
+            if self.start >= 0:
+                self.start -= consumed
+            self.scan = max(self.scan - consumed, 0)
+        return frames
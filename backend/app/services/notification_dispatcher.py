@@ -0,0 +1,260 @@
+"""
+Entrega assíncrona de notificações via outbox.
+
+`evaluate_alerts` só grava a mensagem em `notification_outbox` e acorda o
+dispatcher; o envio (Z-API, SMTP, webhook) acontece numa thread própria, com um pool
+de workers por tipo de canal. Assim um provedor lento ou fora do ar não trava a
+thread dos checks.
+
+O item entra na outbox na transação do estado das regras (falhas seguidas,
+last_notified_at), que é commitada depois do resultado (`save_result` já fez o
+commit dele). Se o processo cair entre os dois commits o alerta daquele resultado
+se perde, mas a regra também não ficou marcada como notificada: a próxima falha do
+check enfileira de novo.
+
+Falhas voltam para PENDING com backoff exponencial até MAX_ATTEMPTS; depois ficam
+FAILED com o último erro. Itens presos em SENDING (processo reiniciado no meio do
+envio) voltam para a fila no start.
+
+Com `email_digest_sec` nas configurações da empresa (e-mail) ou `batch_sec` no canal
+(webhook), os alertas esperam essa janela e os que caem nela para o mesmo canal saem
+num único envio.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlmodel import Session, select, update
+from app.database import engine
+from app.models.notification import NotificationChannel, NotificationOutbox
+from app.services import alert_rule_cache, incident_service, smtp_pool
+
+PENDING = "PENDING"
+SENDING = "SENDING"
+SENT = "SENT"
+FAILED = "FAILED"
+SUPPRESSED = "SUPPRESSED"
+
+POLL_INTERVAL_SEC = 5
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SEC = 30
+BACKOFF_MAX_SEC = 3600
+
+# Workers por tipo de canal: um provedor lento não segura a fila dos outros
+POOL_SIZES = {"WHATSAPP": 2, "EMAIL": 2, "WEBHOOK": 4}
+DEFAULT_POOL_SIZE = 1
+
+_wake = threading.Event()
+_lock = threading.Lock()
+_pools: dict[str, ThreadPoolExecutor] = {}
+_thread: threading.Thread | None = None
+
+
+def enqueue(session: Session, channel: NotificationChannel, subject: str, message: str,
+            check_id: int | None = None, delay_sec: int = 0, payload: dict | None = None) -> NotificationOutbox:
+    """
+    Grava a notificação na outbox. Não faz commit; chame wake() depois do commit.
+    `delay_sec` segura o envio (janela de lote/digest).
+    """
+    item = NotificationOutbox(
+        company_id=channel.company_id,
+        channel_id=channel.id,
+        channel_type=channel.channel_type,
+        check_id=check_id,
+        subject=subject,
+        message=message,
+        payload=payload,
+        next_attempt_at=datetime.utcnow() + timedelta(seconds=delay_sec),
+    )
+    session.add(item)
+    return item
+
+
+def wake():
+    """Antecipa a próxima rodada do dispatcher (ex.: logo após enfileirar)."""
+    _wake.set()
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_SEC * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SEC))
+
+
+def start():
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _requeue_stuck()
+        _thread = threading.Thread(target=_run, name="notification-dispatcher", daemon=True)
+        _thread.start()
+
+
+def _run():
+    while True:
+        _wake.wait(POLL_INTERVAL_SEC)
+        _wake.clear()
+        try:
+            while _dispatch_due() == BATCH_SIZE:
+                pass
+        except Exception:
+            pass
+        smtp_pool.prune()
+
+
+def _requeue_stuck():
+    with Session(engine) as session:
+        session.exec(update(NotificationOutbox).where(NotificationOutbox.status == SENDING).values(status=PENDING))
+        session.commit()
+
+
+def _pool(channel_type: str) -> ThreadPoolExecutor:
+    with _lock:
+        pool = _pools.get(channel_type)
+        if pool is None:
+            pool = ThreadPoolExecutor(
+                max_workers=POOL_SIZES.get(channel_type, DEFAULT_POOL_SIZE),
+                thread_name_prefix=f"notify-{channel_type.lower()}",
+            )
+            _pools[channel_type] = pool
+        return pool
+
+
+def _dispatch_due() -> int:
+    """Reserva os itens vencidos (SENDING) e distribui nos pools. Retorna quantos pegou."""
+    with Session(engine) as session:
+        items = session.exec(
+            select(NotificationOutbox)
+            .where(NotificationOutbox.status == PENDING, NotificationOutbox.next_attempt_at <= datetime.utcnow())
+            .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+            .limit(BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).all()
+        count = len(items)
+        windows = {it.channel_id: w for it in items if (w := _batch_window(session, it))}
+        batch_channels = set(windows)
+        now = datetime.utcnow()
+        for channel_id, window in windows.items():
+            # A janela do lote abre com o primeiro alerta: os que chegaram depois vão junto.
+            # Só os que vencem dentro da janela — um alerta ainda segurado pelo incidente
+            # (atraso = espera do incidente + janela, ver evaluate_alerts) fica na fila.
+            items += session.exec(
+                select(NotificationOutbox)
+                .where(
+                    NotificationOutbox.status == PENDING,
+                    NotificationOutbox.attempts == 0,
+                    NotificationOutbox.channel_id == channel_id,
+                    NotificationOutbox.next_attempt_at <= now + timedelta(seconds=window),
+                    NotificationOutbox.id.not_in([it.id for it in items]),
+                )
+                .with_for_update(skip_locked=True)
+            ).all()
+        jobs: dict = {}
+        for item in items:
+            item.status = SENDING
+            item.attempts += 1
+            session.add(item)
+            key = ("batch", item.channel_id) if item.channel_id in batch_channels else ("single", item.id)
+            jobs.setdefault(key, (item.channel_type, []))[1].append(item.id)
+        session.commit()
+    for channel_type, item_ids in jobs.values():
+        _pool(channel_type).submit(_deliver, item_ids)
+    return count
+
+
+def _batch_window(session: Session, item: NotificationOutbox) -> int:
+    channel = alert_rule_cache.get_channel(session, item.company_id, item.channel_id)
+    return batch_sec(session, channel) if channel else 0
+
+
+def batch_sec(session: Session, channel: NotificationChannel) -> int:
+    """
+    Janela para juntar alertas do canal num só envio (0 = envia cada um na hora):
+    digest de e-mail da empresa ou lote configurado no webhook.
+    """
+    if channel.channel_type == "EMAIL":
+        settings = alert_rule_cache.get_settings(session, channel.company_id)
+        return (settings.email_digest_sec or 0) if settings else 0
+    if channel.channel_type == "WEBHOOK":
+        return channel.batch_sec or 0
+    return 0
+
+
+def _deliver(item_ids: list[int]):
+    try:
+        _deliver_items(item_ids)
+    except Exception as e:
+        # Erro fora do envio (banco, absorb...): o future engoliria a exceção e os itens
+        # ficariam em SENDING até o próximo restart. Voltam para a fila com backoff.
+        _release(item_ids, str(e)[:500] or e.__class__.__name__)
+
+
+def _deliver_items(item_ids: list[int]):
+    from app.services.notification_service import deliver, deliver_batch
+    with Session(engine) as session:
+        items = [
+            it for it in (session.get(NotificationOutbox, i) for i in item_ids)
+            if it and it.status == SENDING
+        ]
+        # Alertas cobertos por um incidente aberto não saem (ou viram a causa raiz)
+        for item in list(items):
+            if incident_service.absorb(session, item) == SUPPRESSED:
+                item.status = SUPPRESSED
+                session.add(item)
+                items.remove(item)
+        if not items:
+            session.commit()
+            return
+        first = items[0]
+        error = None
+        try:
+            channel = alert_rule_cache.get_channel(session, first.company_id, first.channel_id)
+            if not channel or not channel.active:
+                raise RuntimeError("Canal removido ou inativo")
+            settings = alert_rule_cache.get_settings(session, first.company_id)
+            if len(items) == 1:
+                deliver(channel, settings, first.subject, first.message, first.payload)
+            else:
+                deliver_batch(channel, settings, [(it.subject, it.message, it.payload) for it in items])
+        except Exception as e:
+            error = str(e)[:500] or e.__class__.__name__
+        _finish(session, items, error)
+        session.commit()
+
+
+def _finish(session: Session, items: list[NotificationOutbox], error: str | None):
+    """SENT, ou de volta a PENDING com backoff (FAILED após MAX_ATTEMPTS). Não faz commit."""
+    now = datetime.utcnow()
+    for item in items:
+        if error is None:
+            item.status = SENT
+            item.sent_at = now
+            item.last_error = None
+        else:
+            item.last_error = error
+            if item.attempts >= MAX_ATTEMPTS:
+                item.status = FAILED
+            else:
+                item.status = PENDING
+                item.next_attempt_at = now + backoff(item.attempts)
+        session.add(item)
+
+
+def _release(item_ids: list[int], error: str):
+    try:
+        with Session(engine) as session:
+            items = session.exec(
+                select(NotificationOutbox).where(NotificationOutbox.id.in_(item_ids), NotificationOutbox.status == SENDING)
+            ).all()
+            _finish(session, items, error)
+            session.commit()
+    except Exception:
+        # Banco fora: ficam em SENDING e voltam pelo _requeue_stuck no próximo start
+        pass
+
+
+def retry(session: Session, item: NotificationOutbox):
+    """Recoloca um item FAILED na fila com tentativas zeradas. Não faz commit."""
+    item.status = PENDING
+    item.attempts = 0
+    item.next_attempt_at = datetime.utcnow()
+    session.add(item)
@@ -1,52 +1,138 @@
-from sqlmodel import Session, select
+from sqlmodel import Session, update
 from app.models.notification import AlertRule, NotificationChannel
 from app.models.company_settings import CompanySettings
 from app.models.health_check import HealthCheck, CheckResult
+from app.services.checker import flap_detector
+from app.services import alert_rule_cache, incident_service, notification_dispatcher, smtp_pool, webhook_service
 import httpx
-import smtplib
 from email.message import EmailMessage
 from datetime import datetime
 
 
 def evaluate_alerts(check: HealthCheck, result: CheckResult, session: Session):
-    rules = session.exec(
-        select(AlertRule).where(AlertRule.check_id == check.id, AlertRule.active == True)
-    ).all()
-    settings = session.exec(
-        select(CompanySettings).where(CompanySettings.company_id == check.company_id)
-    ).first()
+    try:
+        queued = _evaluate(check, result, session)
+    except Exception:
+        # Nada foi commitado: o estado em memória (regras, incidentes abertos) pode ter
+        # divergido do banco e é recarregado no próximo uso
+        session.rollback()
+        alert_rule_cache.invalidate(check.company_id)
+        incident_service.invalidate(check.company_id)
+        raise
+    if queued:
+        notification_dispatcher.wake()
+
+
+def _evaluate(check: HealthCheck, result: CheckResult, session: Session) -> bool:
+    """Atualiza incidentes e regras e enfileira os alertas; faz commit. Retorna se enfileirou."""
+    changed = incident_service.note_result(session, check, result)
+    # Em flapping o estado das regras fica congelado: nem alerta, nem reset a cada OK
+    if flap_detector.is_flapping(check.id):
+        rules = []
+    else:
+        rules = alert_rule_cache.rules_for_check(session, check.company_id, check.id)
+    queued = False
     for rule in rules:
         if result.status != "OK":
-            rule.consecutive_failures = (rule.consecutive_failures or 0) + 1
+            # Acima do limite o valor exato não importa; limitar evita uma escrita por falha
+            failures = min(rule["consecutive_failures"] + 1, rule["fail_threshold"])
+            last_notified_at = rule["last_notified_at"]
         else:
-            rule.consecutive_failures = 0
-            rule.last_notified_at = None
-        if (rule.consecutive_failures or 0) >= rule.fail_threshold:
-            channel = session.get(NotificationChannel, rule.channel_id)
-            if channel and channel.active and not rule.last_notified_at:
-                try:
-                    send_notification(channel, check, result, settings)
-                    rule.last_notified_at = datetime.utcnow()
-                except Exception:
-                    pass
-        session.add(rule)
-    session.commit()
-
-
-def send_notification(channel: NotificationChannel, check: HealthCheck, result: CheckResult, settings: CompanySettings | None):
-    msg = f"*[ServerWatch]* {check.name}\nStatus: {result.status}\n{result.message or ''}"
-    if channel.channel_type == "WHATSAPP" and settings and settings.zapi_instance_id:
+            failures = 0
+            last_notified_at = None
+        if failures >= rule["fail_threshold"] and not last_notified_at:
+            channel = alert_rule_cache.get_channel(session, check.company_id, rule["channel_id"])
+            if channel and channel.active:
+                # Só enfileira: o envio é feito pelo notification_dispatcher
+                # Espera a janela do incidente (dependências) e depois a do lote do canal: a
+                # varredura do lote só junta itens que vencem dentro da janela, então um
+                # alerta segurado não sai antes do fim da espera do incidente
+                delay = incident_service.hold_sec(session, check) + notification_dispatcher.batch_sec(session, channel)
+                notification_dispatcher.enqueue(
+                    session, channel, check.name, format_message(check, result), check.id, delay,
+                    payload=format_payload(check, result),
+                )
+                last_notified_at = datetime.utcnow()
+                queued = True
+        if (failures, last_notified_at) == (rule["consecutive_failures"], rule["last_notified_at"]):
+            continue
+        rule["consecutive_failures"] = failures
+        rule["last_notified_at"] = last_notified_at
+        session.exec(
+            update(AlertRule)
+            .where(AlertRule.id == rule["id"])
+            .values(consecutive_failures=failures, last_notified_at=last_notified_at)
+        )
+        changed = True
+    if changed:
+        session.commit()
+    return queued
+
+
+def format_message(check: HealthCheck, result: CheckResult) -> str:
+    return f"*[ServerWatch]* {check.name}\nStatus: {result.status}\n{result.message or ''}"
+
+
+def format_payload(check: HealthCheck, result: CheckResult) -> dict:
+    """Evento estruturado para webhooks (o incidente é preenchido na entrega, se houver)."""
+    return {
+        "event": "check.alert",
+        "company_id": check.company_id,
+        "check": {
+            "id": check.id,
+            "name": check.name,
+            "type": check.check_type,
+            "target": check.target,
+            "server_id": check.server_id,
+            "router_id": check.router_id,
+        },
+        "result": {
+            "status": result.status,
+            "latency_ms": result.latency_ms,
+            "message": result.message,
+            "checked_at": (result.checked_at or datetime.utcnow()).isoformat(),
+        },
+        "incident": None,
+    }
+
+
+def deliver(channel: NotificationChannel, settings: CompanySettings | None, subject: str, msg: str,
+            payload: dict | None = None):
+    """Envia uma mensagem pelo canal. Levanta exceção em falha (o dispatcher faz o retry)."""
+    if channel.channel_type == "WHATSAPP":
+        if not settings or not settings.zapi_instance_id:
+            raise RuntimeError("Z-API não configurada")
         _send_whatsapp_zapi(settings, channel.target, msg)
-    elif channel.channel_type == "EMAIL" and settings and settings.smtp_host:
-        _send_email_smtp(settings, channel.target, check.name, msg)
+    elif channel.channel_type == "EMAIL":
+        if not settings or not settings.smtp_host:
+            raise RuntimeError("SMTP não configurado")
+        _send_email_smtp(settings, channel.target, subject, msg)
     elif channel.channel_type == "WEBHOOK":
-        httpx.post(channel.target, json={"text": msg}, timeout=10)
+        webhook_service.post(channel, [(msg, payload)])
+    else:
+        raise RuntimeError(f"Tipo de canal desconhecido: {channel.channel_type}")
 
 
 def _send_whatsapp_zapi(settings: CompanySettings, phone: str, msg: str):
     url = f"https://api.z-api.io/instances/{settings.zapi_instance_id}/token/{settings.zapi_token}/send-text"
     headers = {"Client-Token": settings.zapi_client_token} if settings.zapi_client_token else {}
-    httpx.post(url, json={"phone": phone, "message": msg}, headers=headers, timeout=10)
+    httpx.post(url, json={"phone": phone, "message": msg}, headers=headers, timeout=10).raise_for_status()
+
+
+def deliver_batch(channel: NotificationChannel, settings: CompanySettings | None,
+                  items: list[tuple[str, str, dict | None]]):
+    """Vários alertas (assunto, mensagem, payload) do mesmo canal num único envio."""
+    if channel.channel_type == "WEBHOOK":
+        webhook_service.post(channel, [(msg, payload) for _, msg, payload in items])
+        return
+    if channel.channel_type != "EMAIL":
+        raise RuntimeError(f"Envio em lote não suportado para {channel.channel_type}")
+    if not settings or not settings.smtp_host:
+        raise RuntimeError("SMTP não configurado")
+    names = sorted({subject for subject, _, _ in items})
+    subject = f"{len(items)} alertas: {', '.join(names[:3])}{'…' if len(names) > 3 else ''}"
+    body = "\n\n".join(msg for _, msg, _ in items)
+    _send_email_smtp(settings, channel.target, subject, body)
 
 
 def _send_email_smtp(settings: CompanySettings, to: str, subject: str, body: str):
@@ -55,9 +141,4 @@ def _send_email_smtp(settings: CompanySettings, to: str, subject: str, body: str
     email["From"] = settings.smtp_from or settings.smtp_user or "serverwatch@local"
     email["To"] = to
     email.set_content(body)
-    with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as s:
-        if settings.smtp_tls:
-            s.starttls()
-        if settings.smtp_user:
-            s.login(settings.smtp_user, settings.smtp_password or "")
-        s.send_message(email)
+    smtp_pool.send(settings, email)
@@ -0,0 +1,32 @@
+"""
+Paginação por cursor (keyset). O cursor é opaco para o cliente e volta no header
+`X-Next-Cursor`; o corpo das respostas continua sendo a lista de itens.
+"""
+import base64
+from datetime import datetime
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*parts) -> str:
+    raw = "|".join(p.isoformat() if isinstance(p, datetime) else str(p) for p in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Decodifica o cursor nos tipos informados (int, datetime...). 400 se inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        parts = raw.split("|")
+        if len(parts) != len(types):
+            raise ValueError(raw)
+        return tuple(datetime.fromisoformat(p) if t is datetime else t(p) for p, t in zip(parts, types))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Cursor inválido")
+
+
+def set_next_cursor(response: Response, items: list, limit: int, key) -> None:
+    """Publica o cursor da próxima página quando a página veio cheia."""
+    if len(items) >= limit and items:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(items[-1]))
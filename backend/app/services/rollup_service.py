@@ -0,0 +1,215 @@
+"""
+Agregados incrementais dos resultados de checks (uptime, downtime e latência).
+
+Cada resultado gravado soma 1 no bucket horário e no diário do check via upsert;
+dashboard e SLA leem os buckets em vez de varrer `check_results`.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, cast, or_, Integer
+from sqlalchemy.dialects.postgresql import array, insert, JSONB
+from sqlmodel import Session, select, func
+from app.models.check_rollup import CheckRollup
+from app.models.health_check import HealthCheck, CheckResult
+from app.services.latency_histogram import LatencyHistogram, bucket_index
+
+HOUR = "HOUR"
+DAY = "DAY"
+
+# Retenção dos buckets (ver scheduler.cleanup_old_results)
+HOURLY_RETENTION = timedelta(days=35)
+DAILY_RETENTION = timedelta(days=400)
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _downtime_sec(check: HealthCheck, result: CheckResult, previous_checked_at: datetime | None) -> int:
+    """Tempo fora do ar atribuído a um resultado não-OK: desde o resultado anterior, até 2 intervalos."""
+    if result.status == "OK":
+        return 0
+    interval = check.interval_sec or 60
+    if previous_checked_at is None:
+        return interval
+    elapsed = (result.checked_at - previous_checked_at).total_seconds()
+    return int(max(0, min(elapsed, interval * 2)))
+
+
+def record(session: Session, check: HealthCheck, result: CheckResult, previous_checked_at: datetime | None = None):
+    """Soma o resultado nos buckets horário e diário do check. Não faz commit."""
+    checked_at = result.checked_at or datetime.utcnow()
+    has_latency = result.latency_ms is not None
+    hist_key = str(bucket_index(result.latency_ms)) if has_latency else None
+    base = {
+        "check_id": check.id,
+        "company_id": check.company_id,
+        "ok_count": 1 if result.status == "OK" else 0,
+        "total_count": 1,
+        "downtime_sec": _downtime_sec(check, result, previous_checked_at),
+        "latency_sum": result.latency_ms if has_latency else 0,
+        "latency_count": 1 if has_latency else 0,
+        "latency_hist": {hist_key: 1} if has_latency else None,
+        "latency_max": result.latency_ms if has_latency else None,
+    }
+    stmt = insert(CheckRollup).values([
+        {**base, "period": HOUR, "bucket_start": hour_bucket(checked_at)},
+        {**base, "period": DAY, "bucket_start": day_bucket(checked_at)},
+    ])
+    update = {
+        "ok_count": CheckRollup.ok_count + stmt.excluded.ok_count,
+        "total_count": CheckRollup.total_count + stmt.excluded.total_count,
+        "downtime_sec": CheckRollup.downtime_sec + stmt.excluded.downtime_sec,
+        "latency_sum": CheckRollup.latency_sum + stmt.excluded.latency_sum,
+        "latency_count": CheckRollup.latency_count + stmt.excluded.latency_count,
+    }
+    if has_latency:
+        update["latency_max"] = func.greatest(CheckRollup.latency_max, stmt.excluded.latency_max)
+        hist = func.coalesce(CheckRollup.latency_hist, cast("{}", JSONB), type_=JSONB)
+        update["latency_hist"] = func.jsonb_set(
+            hist,
+            array([hist_key]),
+            func.to_jsonb(func.coalesce(cast(hist[hist_key].astext, Integer), 0) + 1),
+        )
+    stmt = stmt.on_conflict_do_update(constraint="uq_check_rollups_check_period_bucket", set_=update)
+    session.exec(stmt)
+
+
+def company_summary(session: Session, company_id: int, uptime_hours: int = 24, latency_hours: int = 1) -> dict:
+    """Uptime (% OK), latência média e p99 dos checks ativos da empresa."""
+    now = datetime.utcnow()
+    uptime_since = hour_bucket(now - timedelta(hours=uptime_hours))
+    latency_since = hour_bucket(now - timedelta(hours=latency_hours))
+    recent = CheckRollup.bucket_start >= latency_since
+    row = session.exec(
+        select(
+            func.coalesce(func.sum(CheckRollup.ok_count), 0),
+            func.coalesce(func.sum(CheckRollup.total_count), 0),
+            func.coalesce(func.sum(case((recent, CheckRollup.latency_sum), else_=0)), 0),
+            func.coalesce(func.sum(case((recent, CheckRollup.latency_count), else_=0)), 0),
+        )
+        .join(HealthCheck, HealthCheck.id == CheckRollup.check_id)
+        .where(
+            CheckRollup.company_id == company_id,
+            CheckRollup.period == HOUR,
+            CheckRollup.bucket_start >= uptime_since,
+            HealthCheck.active == True,
+        )
+    ).one()
+    ok, total, lat_sum, lat_count = (int(v or 0) for v in row)
+    hist = LatencyHistogram()
+    for h, max_ms in session.exec(
+        select(CheckRollup.latency_hist, CheckRollup.latency_max)
+        .join(HealthCheck, HealthCheck.id == CheckRollup.check_id)
+        .where(
+            CheckRollup.company_id == company_id,
+            CheckRollup.period == HOUR,
+            recent,
+            CheckRollup.latency_hist != None,
+            HealthCheck.active == True,
+        )
+    ).all():
+        hist.merge(LatencyHistogram.from_dict(h, max_ms))
+    return {
+        "uptime_pct": round((ok / total) * 100, 1) if total else None,
+        "avg_latency_ms": round(lat_sum / lat_count) if lat_count else None,
+        "p99_latency_ms": hist.quantile(0.99),
+    }
+
+
+def _window_condition(since: datetime, until: datetime):
+    """
+    Cobre [since, until) com o menor número de buckets: dias inteiros no meio,
+    horas nas bordas. Bordas além da retenção horária usam o dia inteiro.
+    """
+    hourly_floor = datetime.utcnow() - HOURLY_RETENTION
+    start = hour_bucket(since)
+    first_day = day_bucket(since)
+    if since >= hourly_floor and start != first_day:
+        first_day += timedelta(days=1)
+    last_day = day_bucket(until)
+    if until < hourly_floor and until != last_day:
+        last_day += timedelta(days=1)
+
+    def hours(a: datetime, b: datetime):
+        return and_(CheckRollup.period == HOUR, CheckRollup.bucket_start >= a, CheckRollup.bucket_start < b)
+
+    if first_day >= last_day:
+        return hours(start, until)
+    return or_(
+        hours(start, first_day),
+        and_(CheckRollup.period == DAY, CheckRollup.bucket_start >= first_day, CheckRollup.bucket_start < last_day),
+        hours(last_day, until),
+    )
+
+
+def sla(session: Session, company_id: int, since: datetime, until: datetime,
+        check_id: int | None = None, server_id: int | None = None) -> dict:
+    """SLA agregado (e por check) para um check, um servidor ou a empresa toda."""
+    q = (
+        select(
+            CheckRollup.check_id,
+            func.sum(CheckRollup.ok_count),
+            func.sum(CheckRollup.total_count),
+            func.sum(CheckRollup.downtime_sec),
+            func.sum(CheckRollup.latency_sum),
+            func.sum(CheckRollup.latency_count),
+        )
+        .where(CheckRollup.company_id == company_id, _window_condition(since, until))
+        .group_by(CheckRollup.check_id)
+    )
+    hist_q = select(CheckRollup.check_id, CheckRollup.latency_hist, CheckRollup.latency_max).where(
+        CheckRollup.company_id == company_id,
+        CheckRollup.latency_hist != None,
+        _window_condition(since, until),
+    )
+    if check_id is not None:
+        q = q.where(CheckRollup.check_id == check_id)
+        hist_q = hist_q.where(CheckRollup.check_id == check_id)
+    if server_id is not None:
+        server_checks = select(HealthCheck.id).where(HealthCheck.server_id == server_id)
+        q = q.where(CheckRollup.check_id.in_(server_checks))
+        hist_q = hist_q.where(CheckRollup.check_id.in_(server_checks))
+
+    check_hists: dict[int, LatencyHistogram] = {}
+    for cid, h, max_ms in session.exec(hist_q).all():
+        check_hists.setdefault(cid, LatencyHistogram()).merge(LatencyHistogram.from_dict(h, max_ms))
+    hist = LatencyHistogram()
+    for h in check_hists.values():
+        hist.merge(h)
+
+    per_check = []
+    totals = {"ok_count": 0, "total_count": 0, "downtime_sec": 0, "latency_sum": 0, "latency_count": 0}
+    for cid, ok, total, down, lat_sum, lat_count in session.exec(q).all():
+        row = {"ok_count": int(ok or 0), "total_count": int(total or 0), "downtime_sec": int(down or 0),
+               "latency_sum": int(lat_sum or 0), "latency_count": int(lat_count or 0)}
+        for k, v in row.items():
+            totals[k] += v
+        per_check.append({
+            "check_id": cid,
+            **_sla_numbers(row),
+            "latency_percentiles": check_hists.get(cid, LatencyHistogram()).percentiles(),
+        })
+
+    return {
+        "since": since,
+        "until": until,
+        **_sla_numbers(totals),
+        "latency_percentiles": hist.percentiles(),
+        "latency_histogram": hist.buckets(),
+        "checks": per_check,
+    }
+
+
+def _sla_numbers(row: dict) -> dict:
+    total = row["total_count"]
+    return {
+        "uptime_pct": round((row["ok_count"] / total) * 100, 3) if total else None,
+        "ok_count": row["ok_count"],
+        "total_count": total,
+        "downtime_sec": row["downtime_sec"],
+        "avg_latency_ms": round(row["latency_sum"] / row["latency_count"]) if row["latency_count"] else None,
+    }
@@ -0,0 +1,135 @@
+"""
+Pool de conexões SMTP autenticadas por empresa.
+
+Abrir conexão + STARTTLS + login custa mais que o envio em si; num incidente com
+dezenas de alertas por e-mail isso vira dezenas de handshakes. As conexões ficam
+ociosas no pool (por empresa e configuração de servidor) e são reaproveitadas;
+passado IDLE_TIMEOUT_SEC são descartadas, e uma conexão derrubada pelo servidor é
+refeita uma vez antes de desistir.
+
+Host e porta vêm de CompanySettings, então aponta para qualquer SMTP local (ex.:
+`python -m aiosmtpd -n -l localhost:8025` com smtp_tls desligado) para testes.
+"""
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from app.models.company_settings import CompanySettings
+
+MAX_IDLE_PER_KEY = 2
+IDLE_TIMEOUT_SEC = 60
+CONNECT_TIMEOUT_SEC = 10
+
+_lock = threading.Lock()
+# (company_id, host, port, user, tls) -> [(ultimo_uso, conexão)]
+_idle: dict[tuple, list[tuple[float, smtplib.SMTP]]] = {}
+
+
+def _key(settings: CompanySettings) -> tuple:
+    # Mudou host/usuário/TLS nas configurações: as conexões antigas não servem mais
+    return (settings.company_id, settings.smtp_host, settings.smtp_port, settings.smtp_user, settings.smtp_tls)
+
+
+def _connect(settings: CompanySettings) -> smtplib.SMTP:
+    conn = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=CONNECT_TIMEOUT_SEC)
+    try:
+        if settings.smtp_tls:
+            conn.starttls()
+        if settings.smtp_user:
+            conn.login(settings.smtp_user, settings.smtp_password or "")
+    except Exception:
+        _close(conn)
+        raise
+    return conn
+
+
+def _close(conn: smtplib.SMTP):
+    try:
+        conn.quit()
+    except Exception:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _acquire(key: tuple) -> smtplib.SMTP | None:
+    now = time.monotonic()
+    stale = []
+    conn = None
+    with _lock:
+        idle = _idle.get(key, [])
+        while idle:
+            last_used, c = idle.pop()
+            if now - last_used > IDLE_TIMEOUT_SEC:
+                stale.append(c)
+                continue
+            conn = c
+            break
+    for c in stale:
+        _close(c)
+    return conn
+
+
+def _release(key: tuple, conn: smtplib.SMTP):
+    with _lock:
+        idle = _idle.setdefault(key, [])
+        if len(idle) < MAX_IDLE_PER_KEY:
+            idle.append((time.monotonic(), conn))
+            return
+    _close(conn)
+
+
+def send(settings: CompanySettings, message: EmailMessage):
+    """Envia usando uma conexão do pool; refaz a conexão uma vez se o servidor a derrubou."""
+    key = _key(settings)
+    conn = _acquire(key)
+    reused = conn is not None
+    if conn is None:
+        conn = _connect(settings)
+    try:
+        conn.send_message(message)
+    except Exception as e:
+        if not _is_connection_error(e):
+            # Erro de protocolo (destinatário recusado etc.): a sessão continua válida
+            _release(key, conn)
+            raise
+        _close(conn)
+        if not reused:
+            raise
+        conn = _connect(settings)
+        try:
+            conn.send_message(message)
+        except Exception:
+            _close(conn)
+            raise
+    _release(key, conn)
+
+
+def _is_connection_error(e: Exception) -> bool:
+    # SMTPException herda de OSError; só desconexão/erro de socket invalida a sessão
+    return isinstance(e, smtplib.SMTPServerDisconnected) or (
+        isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)
+    )
+
+
+def close_company(company_id: int):
+    """Fecha as conexões ociosas da empresa (ex.: configurações SMTP alteradas)."""
+    with _lock:
+        keys = [k for k in _idle if k[0] == company_id]
+        conns = [c for k in keys for _, c in _idle.pop(k)]
+    for c in conns:
+        _close(c)
+
+
+def prune():
+    """Fecha conexões ociosas além do IDLE_TIMEOUT_SEC."""
+    now = time.monotonic()
+    stale = []
+    with _lock:
+        for key, idle in _idle.items():
+            keep = [(t, c) for t, c in idle if now - t <= IDLE_TIMEOUT_SEC]
+            stale.extend(c for t, c in idle if now - t > IDLE_TIMEOUT_SEC)
+            _idle[key] = keep
+    for c in stale:
+        _close(c)
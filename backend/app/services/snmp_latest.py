@@ -0,0 +1,103 @@
+"""
+Última leitura de cada série SNMP (roteador, tipo, interface).
+
+O coletor chama `record` a cada amostra (upsert em `snmp_metric_latest`) e, depois do
+commit, `apply` com o retorno para atualizar o cache em memória — um rollback não
+deixa no cache valores que nunca foram gravados. As leituras (`get_latest`, `get_one`) usam o cache e só vão ao banco
+na primeira consulta de cada roteador — O(séries), nunca O(histórico).
+"""
+import threading
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+from app.models.snmp_metric_latest import SnmpMetricLatest
+
+_lock = threading.Lock()
+# router_id -> {(metric_type, interface_name): leitura}
+_cache: dict[int, dict[tuple[str, str], dict]] = {}
+
+
+def _entry(metric_type: str, interface_name: str, value: float, unit: str, collected_at) -> dict:
+    return {
+        "metric_type": metric_type,
+        "interface_name": interface_name or None,
+        "value": value,
+        "unit": unit,
+        "collected_at": collected_at,
+    }
+
+
+def record(session: Session, metrics: list) -> dict[tuple, dict]:
+    """
+    Registra amostras (SnmpMetric) como última leitura da série. Não faz commit;
+    devolve as linhas para o caller passar a `apply` depois do commit.
+    """
+    rows: dict[tuple, dict] = {}
+    for m in metrics:
+        key = (m.router_id, m.metric_type, m.interface_name or "")
+        rows[key] = {
+            "router_id": m.router_id,
+            "metric_type": m.metric_type,
+            "interface_name": m.interface_name or "",
+            "value": m.value,
+            "unit": m.unit,
+            "collected_at": m.collected_at,
+        }
+    if not rows:
+        return rows
+    stmt = insert(SnmpMetricLatest).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_snmp_metric_latest_series",
+        set_={"value": stmt.excluded.value, "unit": stmt.excluded.unit, "collected_at": stmt.excluded.collected_at},
+        where=stmt.excluded.collected_at >= SnmpMetricLatest.collected_at,
+    )
+    session.exec(stmt)
+    return rows
+
+
+def apply(rows: dict[tuple, dict]):
+    """Atualiza o cache com as linhas de `record` (chamar só após o commit)."""
+    with _lock:
+        for (router_id, metric_type, iface), r in rows.items():
+            series = _cache.get(router_id)
+            if series is None:
+                continue  # roteador ainda não carregado: a próxima leitura busca do banco
+            current = series.get((metric_type, iface))
+            if current and current["collected_at"] > r["collected_at"]:
+                continue
+            series[(metric_type, iface)] = _entry(metric_type, iface, r["value"], r["unit"], r["collected_at"])
+
+
+def get_latest(session: Session, router_ids: list[int], metric_types: list[str] | None = None) -> list[dict]:
+    """Última leitura de cada série dos roteadores informados (dict com router_id incluso)."""
+    _load_missing(session, router_ids)
+    result = []
+    with _lock:
+        for rid in router_ids:
+            for entry in _cache.get(rid, {}).values():
+                if metric_types and entry["metric_type"] not in metric_types:
+                    continue
+                result.append({"router_id": rid, **entry})
+    return result
+
+
+def get_one(session: Session, router_id: int, metric_type: str, interface_name: str | None = None) -> dict | None:
+    """Última leitura de uma série específica, ou None."""
+    _load_missing(session, [router_id])
+    with _lock:
+        entry = _cache.get(router_id, {}).get((metric_type, interface_name or ""))
+        return dict(entry) if entry else None
+
+
+def _load_missing(session: Session, router_ids: list[int]):
+    with _lock:
+        missing = [rid for rid in set(router_ids) if rid not in _cache]
+    if not missing:
+        return
+    loaded: dict[int, dict[tuple[str, str], dict]] = {rid: {} for rid in missing}
+    for row in session.exec(select(SnmpMetricLatest).where(SnmpMetricLatest.router_id.in_(missing))).all():
+        loaded[row.router_id][(row.metric_type, row.interface_name)] = _entry(
+            row.metric_type, row.interface_name, row.value, row.unit, row.collected_at
+        )
+    with _lock:
+        for rid, series in loaded.items():
+            _cache.setdefault(rid, series)
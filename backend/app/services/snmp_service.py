@@ -3,6 +3,7 @@ import asyncio
 import concurrent.futures
 from datetime import datetime, timedelta
 from app.services.snmp_oids import OIDS_INFO, OIDS_INTERFACES, OIDS_CPU, OIDS_MEMORY
+from app.services import snmp_latest
 
 _BASIC_OIDS = {k: v for k, v in OIDS_INFO.items()}
 
@@ -72,14 +73,14 @@ def run_snmp_collection():
                 continue
             community = (router.snmp_community or "public").strip() or "public"
             port = router.snmp_port or 161
-            _collect_monitor(monitor, host, community, port, session)
+            _collect_monitor(monitor, host, community, port, session, company_id=router.company_id)
 
 
 # ---------------------------------------------------------------------------
 # Coleta por tipo de monitor
 # ---------------------------------------------------------------------------
 
-def _collect_monitor(monitor, host: str, community: str, port: int, session):
+def _collect_monitor(monitor, host: str, community: str, port: int, session, company_id: int | None = None):
     from app.models.snmp_metric import SnmpMetric
 
     try:
@@ -98,7 +99,9 @@ def _collect_monitor(monitor, host: str, community: str, port: int, session):
         for m in metrics:
             session.add(m)
         if metrics:
+            latest = snmp_latest.record(session, metrics)
             session.commit()
+            snmp_latest.apply(latest)
 
         # Verifica threshold e sincroniza health check vinculado ao roteador
         if metrics and monitor.threshold_warn is not None:
@@ -106,10 +109,9 @@ def _collect_monitor(monitor, host: str, community: str, port: int, session):
             if value_metrics:
                 _sync_snmp_health_check(monitor, value_metrics[0], session)
 
-        try:
-            from app.services.ws_manager import broadcast_check_update
-        except Exception:
-            pass
+        if metrics and company_id is not None:
+            from app.services.ws_manager import broadcast_snmp_update
+            broadcast_snmp_update(company_id, monitor.router_id, monitor.metric_type)
     except Exception:
         pass
 
@@ -170,10 +172,8 @@ def _sync_snmp_health_check(monitor, metric, session):
         message=msg,
         checked_at=datetime.utcnow(),
     )
-    existing.last_checked_at = datetime.utcnow()
-    session.add(result)
-    session.add(existing)
-    session.commit()
+    from app.services.checker.base import save_result
+    save_result(existing, result, session)
 
     # Dispara notificações se configurado
     try:
@@ -423,28 +423,24 @@ async def _walk(host: str, community: str, port: int, base_oid: str, timeout: in
 
 def _calc_rate(session, router_id: int, metric_type: str, interface_name: str, current: float, now: datetime) -> float | None:
     """Calcula bytes/s usando a diferença entre coleta atual e anterior."""
-    from sqlmodel import select
     from app.models.snmp_metric import SnmpMetric
 
-    last = session.exec(
-        select(SnmpMetric).where(
-            SnmpMetric.router_id == router_id,
-            SnmpMetric.metric_type == "TRAFFIC_RAW_" + metric_type.split("_")[-1],
-            SnmpMetric.interface_name == interface_name,
-        ).order_by(SnmpMetric.collected_at.desc()).limit(1)
-    ).first()
+    raw_type = "TRAFFIC_RAW_" + metric_type.split("_")[-1]
+    last = snmp_latest.get_one(session, router_id, raw_type, interface_name)
 
     # Salva valor bruto para próxima coleta (commit imediato)
-    raw_type = "TRAFFIC_RAW_" + metric_type.split("_")[-1]
-    session.add(SnmpMetric(router_id=router_id, metric_type=raw_type, interface_name=interface_name, value=current, unit="bytes", collected_at=now))
+    raw = SnmpMetric(router_id=router_id, metric_type=raw_type, interface_name=interface_name, value=current, unit="bytes", collected_at=now)
+    session.add(raw)
+    latest = snmp_latest.record(session, [raw])
     session.commit()
+    snmp_latest.apply(latest)
 
     if not last:
         return None
-    elapsed = (now - last.collected_at).total_seconds()
+    elapsed = (now - last["collected_at"]).total_seconds()
     if elapsed <= 0 or elapsed > 600:
         return None
-    delta = current - last.value
+    delta = current - last["value"]
     if delta < 0:
         delta = current  # counter reset
     return round(delta / elapsed, 2)
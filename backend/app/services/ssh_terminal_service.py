@@ -1,11 +1,15 @@
 """
 Proxy WebSocket <-> SSH. Recebe dados do browser, envia ao canal SSH;
 recebe do canal SSH, envia ao browser.
+
+A ponte roda no event loop (ver SshBridge): por sessão sobra só a thread de
+transporte do próprio paramiko.
 """
 import asyncio
-import queue
+import json
 import socket
-import threading
+import time
+from fastapi import WebSocket, WebSocketDisconnect
 from jose import jwt, JWTError
 from sqlmodel import Session, select
 import paramiko
@@ -41,16 +45,10 @@ def _verify_ws_token(token: str, company_id: int) -> User | None:
         return None
 
 
-def run_ssh_bridge(
-    server: Server,
-    out_queue: queue.Queue,
-    in_queue: queue.Queue,
-    closed: threading.Event,
-):
-    """Thread: conecta SSH, bridge in_queue -> channel, channel -> out_queue."""
+def _open_channel(server: Server) -> tuple[paramiko.SSHClient, paramiko.Channel]:
+    """Bloqueante (roda no executor): conecta e abre o shell com PTY."""
     client = paramiko.SSHClient()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    chan = None
     try:
         client.connect(
             hostname=server.ssh_host,
@@ -62,33 +60,164 @@ def run_ssh_bridge(
         chan = client.get_transport().open_session()
         chan.get_pty()
         chan.invoke_shell()
-        chan.settimeout(0.1)
-        while not closed.is_set():
-            while not in_queue.empty():
-                try:
-                    data = in_queue.get_nowait()
-                    if data is None:
-                        break
-                    chan.send(data)
-                except queue.Empty:
-                    break
-            try:
-                data = chan.recv(4096)
-                if data:
-                    out_queue.put(data.decode("utf-8", errors="replace"))
-                else:
+    except Exception:
+        client.close()
+        raise
+    return client, chan
+
+
+class SshBridge:
+    """
+    Liga um canal SSH a um WebSocket no event loop.
+
+    O canal do paramiko expõe um fd (`chan.fileno()`) que fica legível quando há dados
+    no buffer dele ou o canal fecha; `loop.add_reader` acorda o callback só nessas horas,
+    sem thread dedicada nem poll com timeout. O callback junta tudo que chegou em
+    `pending`; a task de envio espera COALESCE_SEC depois do primeiro byte e manda o
+    acumulado num frame binário (até FRAME_SIZE). Os bytes vão crus: um caractere
+    multibyte partido entre frames é remontado pelo decoder do xterm no browser.
+
+    Se o browser não dá conta e `pending` passa de HIGH_WATER, a leitura do canal é
+    suspensa (o paramiko para de abrir a janela SSH e o host remoto espera) até o buffer
+    descer abaixo de LOW_WATER. O envio também é limitado a MAX_BYTES_PER_SEC por
+    sessão (token bucket com rajada de 1s): um `cat` de log gigante fica preso na mesma
+    contrapressão em vez de saturar o backend.
+    """
+
+    READ_SIZE = 32 * 1024
+    FRAME_SIZE = 64 * 1024
+    HIGH_WATER = 256 * 1024
+    LOW_WATER = 64 * 1024
+    COALESCE_SEC = 0.01
+    MAX_BYTES_PER_SEC = 2 * 1024 * 1024
+
+    def __init__(self, ws: WebSocket, chan: paramiko.Channel):
+        self.ws = ws
+        self.chan = chan
+        self.loop = asyncio.get_running_loop()
+        self.fd = chan.fileno()
+        self.pending = bytearray()
+        self.ready = asyncio.Event()
+        self.eof = False
+        self.reading = False
+        self.budget = float(self.MAX_BYTES_PER_SEC)
+        self.budget_at = time.monotonic()
+
+    def _resume_reading(self):
+        if not self.reading and not self.eof:
+            self.loop.add_reader(self.fd, self._on_readable)
+            self.reading = True
+
+    def _pause_reading(self):
+        if self.reading:
+            self.loop.remove_reader(self.fd)
+            self.reading = False
+
+    def _on_readable(self):
+        chan = self.chan
+        try:
+            while chan.recv_ready() and len(self.pending) < self.HIGH_WATER:
+                data = chan.recv(self.READ_SIZE)
+                if not data:
                     break
-            except (socket.timeout, paramiko.SSHException):
-                pass
+                self.pending += data
+            # Sem PTY o stderr vem separado (o fd do canal cobre os dois buffers)
+            while chan.recv_stderr_ready() and len(self.pending) < self.HIGH_WATER:
+                self.pending += chan.recv_stderr(self.READ_SIZE)
+            if not chan.recv_ready() and (chan.closed or chan.eof_received):
+                self.eof = True
+        except (socket.timeout, paramiko.SSHException, OSError):
+            self.eof = True
+        if self.eof or len(self.pending) >= self.HIGH_WATER:
+            self._pause_reading()
+        self.ready.set()
+
+    async def _throttle(self, sent: int):
+        now = time.monotonic()
+        self.budget = min(self.MAX_BYTES_PER_SEC, self.budget + (now - self.budget_at) * self.MAX_BYTES_PER_SEC)
+        self.budget_at = now
+        self.budget -= sent
+        if self.budget < 0:
+            await asyncio.sleep(-self.budget / self.MAX_BYTES_PER_SEC)
+
+    async def _send_output(self):
+        while True:
+            await self.ready.wait()
+            if not self.eof and len(self.pending) < self.FRAME_SIZE:
+                # Junta o que chegar na janela (eco de tecla, linhas de um comando) num frame só
+                await asyncio.sleep(self.COALESCE_SEC)
+            self.ready.clear()
+            while self.pending:
+                data = bytes(self.pending[:self.FRAME_SIZE])
+                del self.pending[:self.FRAME_SIZE]
+                await self.ws.send_bytes(data)
+                await self._throttle(len(data))
+                if len(self.pending) < self.LOW_WATER:
+                    self._resume_reading()
+            if self.eof:
+                return
+
+    async def _send_input(self, data: str):
+        raw = data.encode("utf-8")
+        # Com janela SSH disponível `send` não bloqueia; janela cheia (colagem grande) vai para o executor
+        while raw and self.chan.send_ready():
+            n = self.chan.send(raw)
+            raw = raw[n:]
+        if raw:
+            await self.loop.run_in_executor(None, self.chan.sendall, raw)
+
+    async def _receive_input(self):
+        try:
+            while True:
+                msg = await self.ws.receive_text()
+                try:
+                    obj = json.loads(msg)
+                    if obj.get("type") == "input":
+                        await self._send_input(obj.get("data", ""))
+                except (ValueError, TypeError, AttributeError):
+                    await self._send_input(msg)
+        except WebSocketDisconnect:
+            pass
+
+    async def run(self):
+        """Até o shell terminar ou o WebSocket fechar."""
+        self._resume_reading()
+        output = asyncio.ensure_future(self._send_output())
+        inputs = asyncio.ensure_future(self._receive_input())
+        try:
+            await asyncio.wait({output, inputs}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._pause_reading()
+            for task in (output, inputs):
+                task.cancel()
+            await asyncio.gather(output, inputs, return_exceptions=True)
+
+
+async def run_ssh_bridge(ws: WebSocket, server: Server):
+    """Conecta no SSH do servidor e faz a ponte com o WebSocket já aceito."""
+    loop = asyncio.get_running_loop()
+    try:
+        client, chan = await loop.run_in_executor(None, _open_channel, server)
     except (socket.timeout, paramiko.SSHException, OSError):
-        pass
+        return
     except Exception as e:
         try:
-            out_queue.put(f"\r\n\r\n*** SSH error: {e} ***\r\n")
+            await ws.send_text(f"\r\n\r\n*** SSH error: {e} ***\r\n")
         except Exception:
             pass
+        return
+    try:
+        await SshBridge(ws, chan).run()
+    except Exception:
+        pass
     finally:
-        if chan:
-            chan.close()
-        client.close()
-        out_queue.put(None)
+        # close() do transport espera a thread do paramiko terminar
+        await loop.run_in_executor(None, _close, client, chan)
+
+
+def _close(client: paramiko.SSHClient, chan: paramiko.Channel):
+    try:
+        chan.close()
+    except Exception:
+        pass
+    client.close()
@@ -0,0 +1,62 @@
+"""
+Entrega de webhooks: cliente HTTP compartilhado, corpo JSON estruturado e assinatura HMAC.
+
+O cliente mantém conexões keep-alive por host e é usado pelos workers WEBHOOK do
+notification_dispatcher (retry/backoff ficam na outbox). Com `secret` no canal, o
+corpo é assinado: X-ServerWatch-Signature = "sha256=" + HMAC-SHA256(secret,
+"<timestamp>.<corpo>"), com o timestamp em X-ServerWatch-Timestamp, para o receptor
+validar origem e rejeitar replays.
+"""
+import hashlib
+import hmac
+import json
+import threading
+import time
+import httpx
+from app.models.notification import NotificationChannel
+
+TIMEOUT_SEC = 10
+SIGNATURE_HEADER = "X-ServerWatch-Signature"
+TIMESTAMP_HEADER = "X-ServerWatch-Timestamp"
+
+_lock = threading.Lock()
+_client: httpx.Client | None = None
+
+
+def _get_client() -> httpx.Client:
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(
+                timeout=TIMEOUT_SEC,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+                headers={"User-Agent": "ServerWatch-Webhook/1.0"},
+            )
+        return _client
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    mac = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256)
+    return f"sha256={mac.hexdigest()}"
+
+
+def build_body(events: list[tuple[str, dict | None]]) -> dict:
+    """
+    Um evento: o próprio evento + "text" (compatível com Slack/Discord/Teams).
+    Vários: {"event": "batch", "text": ..., "events": [...]}.
+    """
+    payloads = [{**(payload or {}), "text": text} for text, payload in events]
+    if len(payloads) == 1:
+        return payloads[0]
+    return {"event": "batch", "text": "\n\n".join(text for text, _ in events), "events": payloads}
+
+
+def post(channel: NotificationChannel, events: list[tuple[str, dict | None]]):
+    """Envia um POST com os eventos (texto, payload). Levanta exceção em erro/HTTP != 2xx."""
+    body = json.dumps(build_body(events), default=str, separators=(",", ":")).encode()
+    headers = {"Content-Type": "application/json"}
+    if channel.secret:
+        timestamp = str(int(time.time()))
+        headers[TIMESTAMP_HEADER] = timestamp
+        headers[SIGNATURE_HEADER] = sign(channel.secret, timestamp, body)
+    _get_client().post(channel.target, content=body, headers=headers).raise_for_status()
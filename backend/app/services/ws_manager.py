@@ -1,35 +1,230 @@
+"""
+Hub de eventos WebSocket com canais por empresa.
+
+Cada conexão é registrada na empresa validada no connect. Dois modos:
+
+- "events" (padrão): uma mensagem por evento. O JSON é codificado uma vez por
+  evento e enfileirado na fila limitada de cada cliente; uma task escritora por
+  cliente envia. Se a fila enche, a conexão é fechada (1013) e o frontend reconecta.
+- "batched": os eventos do cliente são acumulados e saem num único frame a cada
+  `interval_ms`, mantendo só o estado mais recente por chave (check, servidor,
+  monitor SNMP). Um cliente lento só recebe frames maiores, não mais frames.
+
+Todo evento recebe um `seq` crescente por empresa, e a empresa guarda o último
+estado de cada chave (até HISTORY_KEYS). Ao reconectar com `resume=<epoch>.<seq>`
+(epoch e seq vêm no "hello" e nos eventos), o cliente recebe só o que mudou desde
+então; se o token for de outro processo ou antigo demais, recebe "resync" e deve
+recarregar os dados.
+"""
+from collections import OrderedDict
 from fastapi import WebSocket
 import json
 import asyncio
+import uuid
+from app.services import event_bus
+from app.services.checker import flap_detector
+
+QUEUE_SIZE = 256
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+MODE_EVENTS = "events"
+MODE_BATCHED = "batched"
+DEFAULT_INTERVAL_MS = 250
+# Eventos sem chave (não coalescíveis) acumulados por cliente em modo batched
+MAX_UNKEYED_PENDING = 1000
+HISTORY_KEYS = 5000
+
+# Identifica este processo: seq de outro processo não serve para resume
+EPOCH = uuid.uuid4().hex[:8]
+
+
+class Client:
+    def __init__(self, ws: WebSocket, company_id: int, mode: str = MODE_EVENTS, interval_ms: int = DEFAULT_INTERVAL_MS):
+        self.ws = ws
+        self.company_id = company_id
+        self.mode = mode
+        self.interval = max(interval_ms, 50) / 1000
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=QUEUE_SIZE)
+        # Modo batched: chave -> (seq, evento, dados), na ordem de chegada
+        self.pending: OrderedDict = OrderedDict()
+        self.unkeyed = 0
+        self.writer: asyncio.Task | None = None
+        self.closed = False
+
+
+# company_id -> clientes conectados
+subscribers: dict[int, set[Client]] = {}
+# company_id -> último seq emitido
+_seq: dict[int, int] = {}
+# company_id -> OrderedDict(chave -> (seq, evento, dados)), do mais antigo ao mais novo
+_history: dict[int, OrderedDict] = {}
+# company_id -> maior seq já descartado do histórico (resume abaixo disso não é possível)
+_floor: dict[int, int] = {}
+
+
+def _event_key(event: str, data: dict, seq: int) -> tuple:
+    if event == "check_update":
+        return ("check", data.get("check_id"))
+    if event == "docker_sync":
+        return ("docker", data.get("server_id"))
+    if event == "docker_container":
+        return ("docker_container", data.get("server_id"), data.get("container_id"))
+    if event == "snmp_update":
+        return ("snmp", data.get("router_id"), data.get("metric_type"))
+    return ("seq", seq)
+
+
+def _encode(obj) -> str:
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
 
-connections: list[WebSocket] = []
+async def connect(ws: WebSocket, company_id: int, mode: str = MODE_EVENTS,
+                  interval_ms: int = DEFAULT_INTERVAL_MS, resume: str | None = None) -> Client:
+    """Registra uma conexão já aceita e autenticada no canal da empresa."""
+    client = Client(ws, company_id, mode, interval_ms)
+    hello = {"epoch": EPOCH, "seq": _seq.get(company_id, 0), "mode": mode, "resumed": False}
+    replay = _replay(company_id, resume) if resume else None
+    hello["resumed"] = replay is not None
+    # Registra antes de qualquer await: nada publicado a partir daqui se perde; a
+    # task escritora só começa depois do hello, então ele sai primeiro
+    subscribers.setdefault(company_id, set()).add(client)
+    for seq, event, data in replay or []:
+        _deliver(client, seq, event, data, None)
+    try:
+        await ws.send_text(_encode({"event": "hello", "data": hello}))
+        if resume and replay is None:
+            await ws.send_text(_encode({"event": "resync", "data": {"seq": hello["seq"]}}))
+    except Exception:
+        disconnect(client)
+        raise
+    target = _batch_writer if mode == MODE_BATCHED else _writer
+    client.writer = asyncio.create_task(target(client))
+    return client
 
 
-async def connect(ws: WebSocket):
-    await ws.accept()
-    connections.append(ws)
+def _replay(company_id: int, token: str) -> list | None:
+    """Eventos (último estado por chave) depois do token, ou None se não der para retomar."""
+    try:
+        epoch, seq = token.split(".", 1)
+        seq = int(seq)
+    except ValueError:
+        return None
+    if epoch != EPOCH or seq < _floor.get(company_id, 0) or seq > _seq.get(company_id, 0):
+        return None
+    return sorted((v for v in _history.get(company_id, {}).values() if v[0] > seq), key=lambda v: v[0])
 
 
-def disconnect(ws: WebSocket):
-    if ws in connections:
-        connections.remove(ws)
+def disconnect(client: Client):
+    if client.closed:
+        return
+    client.closed = True
+    clients = subscribers.get(client.company_id)
+    if clients is not None:
+        clients.discard(client)
+        if not clients:
+            subscribers.pop(client.company_id, None)
+    if client.writer and client.writer is not asyncio.current_task():
+        client.writer.cancel()
 
 
-async def broadcast(event: str, data: dict):
-    msg = json.dumps({"event": event, "data": data})
-    dead = []
-    for ws in connections:
-        try:
-            await ws.send_text(msg)
-        except Exception:
-            dead.append(ws)
-    for ws in dead:
-        disconnect(ws)
+async def _writer(client: Client):
+    try:
+        while True:
+            msg = await client.queue.get()
+            await client.ws.send_text(msg)
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        disconnect(client)
+
+
+async def _batch_writer(client: Client):
+    try:
+        while True:
+            await asyncio.sleep(client.interval)
+            if not client.pending:
+                continue
+            events = list(client.pending.values())
+            client.pending.clear()
+            client.unkeyed = 0
+            await client.ws.send_text(_encode({
+                "event": "batch",
+                "seq": events[-1][0],
+                "events": [{"event": e, "data": d, "seq": s} for s, e, d in events],
+            }))
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        disconnect(client)
+
+
+def _drop_slow(client: Client):
+    disconnect(client)
+    asyncio.create_task(_close(client.ws, SLOW_CONSUMER_CLOSE_CODE))
+
+
+async def _close(ws: WebSocket, code: int):
+    try:
+        await ws.close(code=code)
+    except Exception:
+        pass
+
+
+def _deliver(client: Client, seq: int, event: str, data: dict, encoded: str | None) -> str | None:
+    """Entrega um evento a um cliente; devolve o JSON (reaproveitado entre clientes do modo events)."""
+    if client.mode == MODE_BATCHED:
+        key = _event_key(event, data, seq)
+        if key[0] == "seq":
+            client.unkeyed += 1
+            if client.unkeyed > MAX_UNKEYED_PENDING:
+                _drop_slow(client)
+                return encoded
+        client.pending.pop(key, None)
+        client.pending[key] = (seq, event, data)
+        return encoded
+    if encoded is None:
+        encoded = _encode({"event": event, "data": data, "seq": seq})
+    try:
+        client.queue.put_nowait(encoded)
+    except asyncio.QueueFull:
+        _drop_slow(client)
+    return encoded
+
+
+def publish_event(company_id: int, event: str, data: dict):
+    """Numera, guarda no histórico e entrega o evento aos clientes da empresa. Só no event loop."""
+    seq = _seq.get(company_id, 0) + 1
+    _seq[company_id] = seq
+    history = _history.setdefault(company_id, OrderedDict())
+    key = _event_key(event, data, seq)
+    history.pop(key, None)
+    history[key] = (seq, event, data)
+    while len(history) > HISTORY_KEYS:
+        _, (old_seq, _, _) = history.popitem(last=False)
+        _floor[company_id] = old_seq
+
+    encoded = None
+    for client in list(subscribers.get(company_id, ())):
+        encoded = _deliver(client, seq, event, data, encoded)
 
 
 def broadcast_check_update(check, result):
-    asyncio.create_task(broadcast("check_update", {"check_id": check.id, "status": result.status, "message": result.message}))
+    """Chamado das threads do scheduler: entrega via event_bus."""
+    event_bus.publish(check.company_id, "check_update", {
+        "check_id": check.id, "status": result.status, "message": result.message,
+        "flapping": flap_detector.is_flapping(check.id),
+    })
+
+
+def broadcast_docker_sync(company_id: int, server_id: int):
+    event_bus.publish(company_id, "docker_sync", {"server_id": server_id})
+
+
+def broadcast_docker_container(company_id: int, server_id: int, container_id: str, action: str, status: str | None):
+    event_bus.publish(company_id, "docker_container", {
+        "server_id": server_id, "container_id": container_id, "action": action, "status": status,
+    })
 
 
-def broadcast_docker_sync(server_id: int):
-    asyncio.create_task(broadcast("docker_sync", {"server_id": server_id}))
+def broadcast_snmp_update(company_id: int, router_id: int, metric_type: str):
+    event_bus.publish(company_id, "snmp_update", {"router_id": router_id, "metric_type": metric_type})
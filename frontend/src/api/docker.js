@@ -1,6 +1,7 @@
 import client from './client'
 
 export const listContainers = (serverId) => client.get(`/docker/servers/${serverId}/containers`)
+export const containerStats = (serverId, hours = 1) => client.get(`/docker/servers/${serverId}/stats`, { params: { hours } })
 export const syncServer = (serverId) => client.post(`/docker/servers/${serverId}/sync`)
 export const startContainer = (serverId, containerId) => client.post(`/docker/servers/${serverId}/containers/${containerId}/start`)
 export const stopContainer = (serverId, containerId) => client.post(`/docker/servers/${serverId}/containers/${containerId}/stop`)
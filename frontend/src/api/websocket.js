@@ -1,28 +1,107 @@
+import { watch } from 'vue'
 import { useAuthStore } from '../stores/auth'
 import { toast } from 'vue-sonner'
 
 let ws = null
+let stopped = false
+let stopWatch = null
+// Posição no stream (vem no "hello" e em cada evento); usada para retomar sem perder eventos
+let epoch = null
+let lastSeq = 0
+let resumeCompany = null
+
+// Acima disso, um lote de check_update vira um único toast resumido
+const MAX_CHECK_TOASTS = 3
+// check_id -> último status visto; só mudança de status vira toast (o resto as páginas consomem)
+const lastCheckStatus = new Map()
+
+function handleChecks(all) {
+  const updates = all.filter((d) => {
+    const prev = lastCheckStatus.get(d.check_id)
+    lastCheckStatus.set(d.check_id, d.status)
+    // Primeira vez que o check aparece: só avisa se já está falhando
+    return prev === undefined ? d.status !== 'OK' : prev !== d.status
+  })
+  if (!updates.length) return
+  if (updates.length > MAX_CHECK_TOASTS) {
+    const failing = updates.filter(d => d.status !== 'OK').length
+    toast.info(`${updates.length} checks mudaram de status`, { description: `${failing} com falha` })
+    return
+  }
+  for (const data of updates) {
+    toast.info(`Check #${data.check_id}: ${data.status}`, { description: data.message })
+  }
+}
+
+function handleEvents(events) {
+  const checks = []
+  for (const { event, data, seq } of events) {
+    if (seq) lastSeq = Math.max(lastSeq, seq)
+    if (event === 'check_update') checks.push(data)
+    // Páginas abertas escutam os eventos que interessam (ex.: Docker)
+    window.dispatchEvent(new CustomEvent('serverwatch:event', { detail: { event, data } }))
+  }
+  if (checks.length) handleChecks(checks)
+}
 
 export function connectWebSocket() {
   const auth = useAuthStore()
+  stopped = false
+  // Eventos são por empresa: ao trocar de empresa, reconecta no canal novo
+  if (!stopWatch) {
+    stopWatch = watch(() => auth.companyId, () => {
+      if (ws) {
+        ws.onclose = null
+        ws.close()
+        ws = null
+      }
+      lastCheckStatus.clear()
+      connectWebSocket()
+    })
+  }
   if (!auth.token || !auth.companyId) return
   const proto = location.protocol === 'https:' ? 'wss:' : 'ws:'
   const host = location.host
-  ws = new WebSocket(`${proto}//${host}/api/ws/events`)
+  const params = new URLSearchParams({
+    token: auth.token,
+    company_id: auth.companyId,
+    mode: 'batched',
+    interval_ms: 250,
+  })
+  if (epoch && resumeCompany === auth.companyId) params.set('resume', `${epoch}.${lastSeq}`)
+  ws = new WebSocket(`${proto}//${host}/api/ws/events?${params}`)
   ws.onmessage = (e) => {
     try {
-      const { event, data } = JSON.parse(e.data)
-      if (event === 'check_update') {
-        toast.info(`Check #${data.check_id}: ${data.status}`, { description: data.message })
+      const msg = JSON.parse(e.data)
+      if (msg.event === 'hello') {
+        if (!msg.data.resumed) lastSeq = msg.data.seq
+        epoch = msg.data.epoch
+        resumeCompany = auth.companyId
+      } else if (msg.event === 'batch') {
+        handleEvents(msg.events)
+      } else if (msg.event === 'resync') {
+        // Eventos perdidos não podem ser reenviados: as páginas recarregam ao receber isto
+        window.dispatchEvent(new CustomEvent('serverwatch:resync'))
+      } else {
+        handleEvents([msg])
       }
     } catch {}
   }
   ws.onclose = () => {
-    setTimeout(connectWebSocket, 5000)
+    ws = null
+    if (!stopped) setTimeout(connectWebSocket, 5000)
   }
 }
 
 export function closeWebSocket() {
+  stopped = true
+  epoch = null
+  lastSeq = 0
+  lastCheckStatus.clear()
+  if (stopWatch) {
+    stopWatch()
+    stopWatch = null
+  }
   if (ws) {
     ws.close()
     ws = null
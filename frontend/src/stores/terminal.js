@@ -75,12 +75,14 @@ export const useTerminalStore = defineStore('terminal', {
       const proto = location.protocol === 'https:' ? 'wss:' : 'ws:'
       const url = `${proto}//${location.host}/api/ws/ssh/${serverId}?token=${encodeURIComponent(auth.token)}&company_id=${auth.companyId}`
       const ws = new WebSocket(url)
+      // Saída do terminal chega em frames binários (UTF-8 cru); o xterm decodifica entre frames
+      ws.binaryType = 'arraybuffer'
       s.ws = ws
       ws.onopen = () => {
         s.status = 'connected'
       }
       ws.onmessage = (e) => {
-        const data = e.data
+        const data = e.data instanceof ArrayBuffer ? new Uint8Array(e.data) : e.data
         if (typeof data === 'string' && data.startsWith('{')) {
           try {
             const obj = JSON.parse(data)
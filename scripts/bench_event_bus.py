@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: entrega de eventos de threads produtoras para clientes WebSocket.
+
+Compara um `call_soon_threadsafe` por evento com o event_bus (deque + um dreno por
+rajada). Os clientes são falsos (só contam mensagens), então mede o custo da ponte
+thread → loop → filas dos clientes, sem rede.
+
+Uso: cd backend && python ../scripts/bench_event_bus.py [produtores] [eventos_por_produtor] [clientes]
+Ex:  python ../scripts/bench_event_bus.py 8 20000 20
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services import event_bus, ws_manager  # noqa: E402
+
+COMPANY_ID = 1
+
+
+class FakeWS:
+    def __init__(self):
+        self.received = 0
+
+    async def send_text(self, msg: str):
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def _naive_publish(loop, company_id: int, event: str, data: dict):
+    loop.call_soon_threadsafe(ws_manager.publish_event, company_id, event, data)
+
+
+async def _run(mode: str, producers: int, per_producer: int, clients: int) -> dict:
+    loop = asyncio.get_running_loop()
+    ws_manager.QUEUE_SIZE = producers * per_producer + 1
+    fakes = [FakeWS() for _ in range(clients)]
+    conns = [await ws_manager.connect(ws, COMPANY_ID) for ws in fakes]
+    if mode == "event_bus":
+        event_bus.attach(loop)
+        publish = event_bus.publish
+    else:
+        def publish(company_id, event, data):
+            _naive_publish(loop, company_id, event, data)
+
+    def produce(worker: int):
+        for i in range(per_producer):
+            publish(COMPANY_ID, "check_update", {"check_id": worker * per_producer + i, "status": "OK", "message": None})
+
+    total = producers * per_producer
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(w,)) for w in range(producers)]
+    for t in threads:
+        t.start()
+    while min(ws.received for ws in fakes) < total:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    for t in threads:
+        t.join()
+    for c in conns:
+        ws_manager.disconnect(c)
+    stats = event_bus.stats() if mode == "event_bus" else {}
+    event_bus.detach()
+    return {"elapsed": elapsed, "events_per_sec": total / elapsed, "drains": stats.get("drains", total),
+            "max_batch": stats.get("max_batch", 1)}
+
+
+def main():
+    producers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_producer = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    print(f"{producers} threads x {per_producer} eventos, {clients} clientes na empresa\n")
+    print(f"{'modo':<28} {'tempo s':>9} {'eventos/s':>12} {'wakeups':>9} {'lote máx':>9}")
+    for mode in ("call_soon_threadsafe/evento", "event_bus"):
+        r = asyncio.run(_run(mode, producers, per_producer, clients))
+        print(f"{mode:<28} {r['elapsed']:>9.2f} {r['events_per_sec']:>12,.0f} {r['drains']:>9} {r['max_batch']:>9}")
+
+
+if __name__ == "__main__":
+    main()
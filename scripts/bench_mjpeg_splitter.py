@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: separação de quadros JPEG da saída do ffmpeg (image2pipe).
+
+Compara o parser antigo do stream de câmeras (`buf += chunk` + `find` desde o início
+do buffer a cada quadro) com o JpegSplitter (bytearray, busca incremental, quadros
+como memoryview), lendo o mesmo stream em chunks de vários tamanhos.
+
+Use streams gravados de câmeras reais (mesmos parâmetros do camera_hub):
+  ffmpeg -rtsp_transport tcp -i 'rtsp://user:senha@IP:554/cam/realmonitor?channel=1&subtype=0' \\
+         -t 30 -vf scale=640:-1 -f image2pipe -vcodec mjpeg -q:v 5 -r 10 camera1.mjpeg
+Sem arquivos, gera um stream sintético (quadros de 30-80 KB, com byte stuffing).
+
+Uso: cd backend && python ../scripts/bench_mjpeg_splitter.py [stream.mjpeg ...]
+"""
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.mjpeg import JpegSplitter  # noqa: E402
+
+CHUNK_SIZES = (4096, 65536)
+REPEAT = 3
+
+
+def _synthetic(frames: int = 600) -> bytes:
+    rnd = random.Random(42)
+    out = []
+    for _ in range(frames):
+        body = rnd.randbytes(rnd.randint(30_000, 80_000)).replace(b"\xff", b"\xff\x00")
+        out.append(b"\xff\xd8" + body + b"\xff\xd9")
+    return b"".join(out)
+
+
+def _old_parser(stdout, chunk_size: int):
+    """O parser que existia em topology._mjpeg_generator."""
+    buf = b""
+    while True:
+        chunk = stdout.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        start = buf.find(b"\xff\xd8")
+        end = buf.find(b"\xff\xd9")
+        while start != -1 and end != -1 and end > start:
+            frame = buf[start:end + 2]
+            buf = buf[end + 2:]
+            yield frame
+            start = buf.find(b"\xff\xd8")
+            end = buf.find(b"\xff\xd9")
+
+
+def _new_parser(stdout, chunk_size: int):
+    splitter = JpegSplitter()
+    while True:
+        chunk = stdout.read1(chunk_size)
+        if not chunk:
+            break
+        yield from splitter.feed(chunk)
+
+
+def _measure(parser, data: bytes, chunk_size: int) -> tuple[float, int]:
+    best = None
+    frames = 0
+    for _ in range(REPEAT):
+        stdout = io.BufferedReader(io.BytesIO(data))
+        start = time.perf_counter()
+        frames = sum(1 for _ in parser(stdout, chunk_size))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, frames
+
+
+def main():
+    streams = [(p, open(p, "rb").read()) for p in sys.argv[1:]] or [("sintético", _synthetic())]
+    print(f"{'stream':<20} {'chunk':>7} {'parser':<14} {'quadros':>8} {'tempo ms':>9} {'MB/s':>8}")
+    for name, data in streams:
+        for chunk_size in CHUNK_SIZES:
+            for label, parser in (("antigo", _old_parser), ("JpegSplitter", _new_parser)):
+                elapsed, frames = _measure(parser, data, chunk_size)
+                mb_s = len(data) / elapsed / 1e6
+                print(f"{os.path.basename(name)[:20]:<20} {chunk_size:>7} {label:<14} {frames:>8} {elapsed * 1000:>9.1f} {mb_s:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()